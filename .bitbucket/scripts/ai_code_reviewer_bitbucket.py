@@ -6,14 +6,141 @@ This script analyzes pull request changes and provides intelligent code review s
 
 import os
 import sys
-import json
+import asyncio
 import subprocess
+import linecache
 import re
-from typing import List, Dict, Optional
+from collections import Counter
+from typing import List, Dict, Iterable, Optional
 from dataclasses import dataclass
-import requests
-from openai import OpenAI
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+import httpx
+import orjson
+from tenacity import retry, retry_if_exception_type, retry_if_result, stop_after_attempt, wait_exponential_jitter
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
 from jira_service import JiraService
+from bitbucket_auth import auth_attempts
+
+# Approximate input-token budget for the diffs packed into one review request
+_BATCH_TOKEN_BUDGET = 6000
+
+def _batch_entry_key(filename: str) -> str:
+    """Normalize a filename from a batched review reply for matching ('./src/x.php', '`src/x.php`' -> 'src/x.php')"""
+    filename = filename.strip().strip('`').strip()
+    while filename.startswith('./'):
+        filename = filename[2:]
+    return filename.lstrip('/')
+
+# Diff lines that start a file or change its status; everything else is patch content
+_DIFF_HEADER_PREFIXES = ('diff --git', 'new file mode', 'deleted file mode')
+
+# Hunk header: "@@ -a[,b] +c[,d] @@" (counts are omitted when they equal 1)
+_HUNK_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@', re.M)
+
+# File extension -> code block language for syntax highlighting
+_EXT_MAP = {
+    'php': 'php',
+    'js': 'javascript',
+    'jsx': 'javascript',
+    'ts': 'typescript',
+    'tsx': 'typescript',
+    'py': 'python',
+    'java': 'java',
+    'go': 'go',
+    'rs': 'rust',
+    'cpp': 'cpp',
+    'c': 'c',
+    'cs': 'csharp',
+    'rb': 'ruby',
+    'sql': 'sql',
+    'html': 'html',
+    'css': 'css',
+    'scss': 'scss',
+    'json': 'json',
+    'xml': 'xml',
+    'yaml': 'yaml',
+    'yml': 'yaml'
+}
+
+# Lock files, minified bundles, binaries, build output, env files and pipeline config
+_SKIP_RE = re.compile(
+    r'(?:\.lock$|(?:^|/)package-lock\.json$|\.min\.(?:js|css)$'
+    r'|\.(?:png|jpe?g|gif|svg|ico|pdf|zip|tar|gz)$'
+    r'|(?:^|/)(?:dist|build|node_modules|__pycache__)/'
+    r'|(?:^|/)\.env(?:\.local|\.production)?$'
+    r'|(?:^|/)bitbucket-pipelines\.yml$|(?:^|/)\.bitbucket/)'
+)
+
+# Emoji shown for an issue's category and severity in comments and the summary
+_CATEGORY_EMOJI = MappingProxyType({
+    'security': '🔒',
+    'bug': '🐛',
+    'performance': '⚡',
+    'architecture': '🏗️'
+})
+_SEVERITY_EMOJI = MappingProxyType({
+    'critical': '🔴',
+    'error': '🔴',
+    'high': '🔴'
+})
+
+# Bitbucket responses worth retrying (rate limiting and transient server errors)
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_BACKOFF = wait_exponential_jitter(initial=1, max=30)
+
+def _wait_retry_after(retry_state) -> float:
+    """Honor Retry-After on throttled responses, otherwise back off exponentially with jitter"""
+    outcome = retry_state.outcome
+    if not outcome.failed:
+        retry_after = outcome.result().headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+    return _BACKOFF(retry_state)
+
+def _last_response(retry_state):
+    """Once retries are exhausted, hand back the last response (or re-raise the last error)"""
+    return retry_state.outcome.result()
+
+# Attempts per OpenAI request when it is rejected with a 429
+_RATE_LIMIT_ATTEMPTS = 3
+
+def _header_float(headers, name: str) -> Optional[float]:
+    """Read a numeric response header, or None if missing or not a number"""
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+class _AdaptiveLimiter:
+    """Async concurrency limit for OpenAI calls: grows by one per success, halves on 429 (AIMD)"""
+    
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self._active = 0
+        self._cond = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+    
+    async def __aexit__(self, *exc_info):
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+    
+    def on_success(self, remaining_requests: Optional[int]):
+        """Additive increase, capped by the requests OpenAI says are left in the window"""
+        if remaining_requests is not None and remaining_requests < self.limit:
+            self.limit = max(1, remaining_requests)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+    
+    def on_rate_limit(self):
+        """Multiplicative decrease after a 429"""
+        self.limit = max(1, self.limit // 2)
 
 @dataclass
 class FileDiff:
@@ -57,9 +184,6 @@ class AICodeReviewerBitbucket:
         else:
             print("❌ ERROR: BITBUCKET_APP_PASSWORD is not set")
         
-        # Track which auth method works
-        self._use_basic_auth = False
-        self._auth_username = None
         self.workspace = os.getenv('BITBUCKET_WORKSPACE')
         self.repo_slug = os.getenv('BITBUCKET_REPO_SLUG')
         
@@ -133,12 +257,26 @@ class AICodeReviewerBitbucket:
             print("   Create at: Repository Settings → Access tokens")
         
         
+        # Auth schemes to try, the one implied by the token prefix first (see bitbucket_auth)
+        self._auth_attempts = auth_attempts(self.bitbucket_app_password, self.bitbucket_username, self.workspace)
+        self._use_auth_attempt(*self._auth_attempts[0])
+        
         if not self.workspace or not self.repo_slug:
             raise ValueError("Bitbucket environment variables (BITBUCKET_WORKSPACE, BITBUCKET_REPO_SLUG) are required")
         
         # Bitbucket API base URL
         self.bitbucket_api_base = f"https://api.bitbucket.org/2.0/repositories/{self.workspace}/{self.repo_slug}"
         
+        # Shared HTTP client: keep-alive + HTTP/2 so every Bitbucket call reuses one connection.
+        # Redirects are followed like requests does (e.g. the PR diff 302s to the repository diff).
+        self._http = httpx.Client(
+            http2=True,
+            timeout=10,
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=64, max_connections=64),
+            headers={'Accept': 'application/json'}
+        )
+        
         # Get PR ID - try environment variable first, then find via API
         self.pr_id = os.getenv('BITBUCKET_PR_ID')
         if not self.pr_id:
@@ -159,15 +297,39 @@ class AICodeReviewerBitbucket:
                 # This should have been caught earlier, but just in case
                 raise ValueError("Cannot find PR ID when running on destination branch directly")
         
-        self.client = OpenAI(api_key=self.openai_api_key)
+        # SDK retries are off: a retry inside create() would sleep while holding a limiter slot, so every
+        # 429 and transient failure goes back to _complete_json, which retries with the sleep outside the limiter
+        self.client = AsyncOpenAI(api_key=self.openai_api_key, max_retries=0)
+        # Bound concurrent OpenAI requests, shrinking the limit when rate limits get close
+        self._limiter = _AdaptiveLimiter(int(os.getenv('OPENAI_MAX_CONCURRENCY', '8')))
+        # Small files are reviewed together, at most this many per request
+        self._batch_max_files = max(1, int(os.getenv('OPENAI_BATCH_MAX_FILES', '4')))
         self.review_comments: List[ReviewComment] = []
         
-        # Initialize JIRA service
-        self.jira_service = JiraService()
+        # JIRA service is created lazily, once a JIRA key has been found (see jira_service)
         self.jira_issue = None
         self.jira_key = None
         self.pr_title = None
     
+    @cached_property
+    def jira_service(self) -> JiraService:
+        """JIRA client, only constructed once there is an issue to fetch"""
+        return JiraService()
+    
+    def close(self):
+        """Close the shared HTTP client"""
+        self._http.close()
+    
+    @retry(
+        wait=_wait_retry_after,
+        stop=stop_after_attempt(6),
+        retry=retry_if_exception_type(httpx.TransportError) | retry_if_result(lambda r: r.status_code in _RETRY_STATUSES),
+        retry_error_callback=_last_response
+    )
+    def _http_get(self, url: str, **kwargs) -> httpx.Response:
+        """GET a Bitbucket API URL, retrying transport errors, 429s and 5xx responses"""
+        return self._http.get(url, **kwargs)
+    
     def _get_auth_headers(self, use_basic_auth=None, use_username=None, prefer_bearer=False):
         """Get authentication headers for Bitbucket API
         
@@ -212,6 +374,11 @@ class AICodeReviewerBitbucket:
                 'Accept': 'application/json'
             }
     
+    def _use_auth_attempt(self, scheme: str, username: Optional[str]):
+        """Make an auth_attempts entry the scheme used by _get_auth_headers"""
+        self._use_basic_auth = scheme == 'basic'
+        self._auth_username = username
+    
     def _find_pr_id(self) -> Optional[str]:
         """Find PR ID by querying Bitbucket API using branch name"""
         if not self.branch:
@@ -223,67 +390,36 @@ class AICodeReviewerBitbucket:
             return None
         
         try:
-            test_url = f"{self.bitbucket_api_base}"
-            headers = None
-            
-            # Try Bearer token first
-            headers = self._get_auth_headers(use_basic_auth=False)
-            test_response = requests.get(test_url, headers=headers, timeout=10)
+            # Let Bitbucket filter to the open PR from this branch into 'qa' and return only its id
+            prs_url = f"{self.bitbucket_api_base}/pullrequests"
+            params = {
+                'state': 'OPEN',
+                'q': f'source.branch.name="{self.branch}" AND destination.branch.name="qa"',
+                'fields': 'values.id'
+            }
             
-            # If Bearer fails, try Basic Auth with different usernames
-            if test_response.status_code == 401:
-                token_check = self.bitbucket_app_password.strip() if self.bitbucket_app_password else ""
-                
-                # Try Basic Auth with username
-                if self.bitbucket_username:
-                    headers = self._get_auth_headers(use_basic_auth=True)
-                    test_response = requests.get(test_url, headers=headers, timeout=10)
-                    if test_response.status_code == 200:
-                        self._use_basic_auth = True
-                
-                # Try with workspace
-                if test_response.status_code != 200:
-                    headers = self._get_auth_headers(use_basic_auth=True, use_username=self.workspace)
-                    test_response = requests.get(test_url, headers=headers, timeout=10)
-                    if test_response.status_code == 200:
-                        self._use_basic_auth = True
-                        self._auth_username = self.workspace
-                
-                # Try with x-token-auth (for some Atlassian tokens)
-                if test_response.status_code != 200 and token_check.startswith('ATATT'):
-                    headers = self._get_auth_headers(use_basic_auth=True, use_username='x-token-auth')
-                    test_response = requests.get(test_url, headers=headers, timeout=10)
-                    if test_response.status_code == 200:
-                        self._use_basic_auth = True
-                        self._auth_username = 'x-token-auth'
-                
-                if test_response.status_code != 200:
-                    return None
-            elif test_response.status_code != 200:
+            # The PR query doubles as the auth probe: the token prefix's scheme first, then the others
+            for scheme, username in self._auth_attempts:
+                headers = self._get_auth_headers(use_basic_auth=scheme == 'basic', use_username=username)
+                response = self._http_get(prs_url, headers=headers, params=params)
+                if response.status_code not in (401, 403):
+                    self._use_auth_attempt(scheme, username)
+                    break
+            else:
+                print(f"❌ Authentication failed while fetching PRs ({response.status_code}) with every auth scheme")
                 return None
             
-            # Get all open PRs
-            prs_url = f"{self.bitbucket_api_base}/pullrequests?state=OPEN&pagelen=50"
-            response = requests.get(prs_url, headers=headers, timeout=10)
-            
             if response.status_code != 200:
                 print(f"❌ Failed to fetch PRs: {response.status_code}")
                 return None
             
-            prs_data = response.json()
-            prs = prs_data.get('values', [])
-            
-            # Find PR where source branch matches current branch AND destination is 'qa'
-            for pr in prs:
-                source_branch = pr.get('source', {}).get('branch', {}).get('name', '')
-                destination_branch = pr.get('destination', {}).get('branch', {}).get('name', '')
-                
-                if source_branch == self.branch and destination_branch == 'qa':
-                    return str(pr.get('id'))
+            prs = orjson.loads(response.content).get('values', [])
+            if prs:
+                return str(prs[0].get('id'))
             
             return None
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"⚠️  Network error finding PR ID: {str(e)}")
             return None
         except Exception as e:
@@ -300,10 +436,10 @@ class AICodeReviewerBitbucket:
         try:
             headers = self._get_auth_headers()
             pr_url = f"{self.bitbucket_api_base}/pullrequests/{self.pr_id}"
-            response = requests.get(pr_url, headers=headers)
+            response = self._http_get(pr_url, headers=headers)
             
             if response.status_code == 200:
-                pr_data = response.json()
+                pr_data = orjson.loads(response.content)
                 if not self.base_sha:
                     self.base_sha = pr_data.get('destination', {}).get('commit', {}).get('hash', '')
                 if not self.head_sha:
@@ -318,13 +454,11 @@ class AICodeReviewerBitbucket:
             try:
                 headers = self._get_auth_headers(prefer_bearer=True)
                 diff_url = f"{self.bitbucket_api_base}/pullrequests/{self.pr_id}/diff"
-                response = requests.get(diff_url, headers=headers, timeout=30)
-                
-                if response.status_code == 200:
-                    # Parse the diff response
-                    diff_text = response.text
-                    return self._parse_api_diff(diff_text)
-                else:
+                # Stream the diff so only the current file's patch is held in memory.
+                # One line of context is enough: the prompt adds numbered file lines around each hunk.
+                with self._http.stream('GET', diff_url, headers=headers, params={'context': 1}, timeout=30) as response:
+                    if response.status_code == 200:
+                        return self._parse_api_diff_lines(response.iter_lines())
                     print(f"⚠️  API diff failed ({response.status_code}), falling back to git diff")
             except Exception as e:
                 print(f"⚠️  API diff error: {str(e)}, falling back to git diff")
@@ -332,21 +466,26 @@ class AICodeReviewerBitbucket:
         # Fallback: Use git diff with merge base (only changes in PR branch)
         return self._get_pr_diff_from_git()
     
-    def _parse_api_diff(self, diff_text: str) -> List[FileDiff]:
-        """Parse Bitbucket API diff response"""
+    def _parse_api_diff_lines(self, line_iter: Iterable[str]) -> List[FileDiff]:
+        """Parse Bitbucket API diff response from an iterator of lines"""
         file_diffs = []
         current_file = None
         current_patch = []
         current_status = 'modified'
         
-        for line in diff_text.split('\n'):
+        for line in line_iter:
+            # Fast path: almost every line is patch content, so one C-level tuple check skips the header chain
+            if not line.startswith(_DIFF_HEADER_PREFIXES):
+                if current_file:
+                    current_patch.append(line)
+                continue
+            
             # Bitbucket API diff format: "diff --git a/path/to/file b/path/to/file"
             if line.startswith('diff --git'):
                 # Save previous file if exists
                 if current_file and current_patch:
                     patch_text = '\n'.join(current_patch)
-                    additions = len([l for l in patch_text.split('\n') if l.startswith('+') and not l.startswith('+++')])
-                    deletions = len([l for l in patch_text.split('\n') if l.startswith('-') and not l.startswith('---')])
+                    additions, deletions = self._count_changes(patch_text)
                     
                     if not self._should_skip_file(current_file):
                         file_diffs.append(FileDiff(
@@ -370,18 +509,15 @@ class AICodeReviewerBitbucket:
                 current_status = 'added'
                 if current_patch:
                     current_patch.append(line)
-            elif line.startswith('deleted file mode'):
+            else:
                 current_status = 'deleted'
                 if current_patch:
                     current_patch.append(line)
-            elif current_file:
-                current_patch.append(line)
         
         # Save last file
         if current_file and current_patch:
             patch_text = '\n'.join(current_patch)
-            additions = len([l for l in patch_text.split('\n') if l.startswith('+') and not l.startswith('+++')])
-            deletions = len([l for l in patch_text.split('\n') if l.startswith('-') and not l.startswith('---')])
+            additions, deletions = self._count_changes(patch_text)
             
             if not self._should_skip_file(current_file):
                 file_diffs.append(FileDiff(
@@ -394,140 +530,135 @@ class AICodeReviewerBitbucket:
         
         return file_diffs
     
+    def _count_changes(self, patch_text: str) -> tuple:
+        """Count added/removed lines in a patch, excluding the +++/--- file headers"""
+        # Count from the first hunk header on, so only the headers are excluded (a removed
+        # "-- comment" line is still a deletion); str.count with a start offset runs in C without copying
+        start = 0 if patch_text.startswith('@@') else patch_text.find('\n@@')
+        if start < 0:
+            return 0, 0
+        return patch_text.count('\n+', start), patch_text.count('\n-', start)
+    
     def _get_pr_diff_from_git(self) -> List[FileDiff]:
         """Fallback: Get PR diff using git (only changes in PR branch)"""
-        # Verify commits exist
-        if self.base_sha:
-            check_base = subprocess.run(
-                f"git cat-file -e {self.base_sha}",
-                shell=True, capture_output=True
+        # Verify both commits exist with one batched probe, then fetch whatever is missing in one go
+        shas = [sha for sha in (self.base_sha, self.head_sha) if sha]
+        if shas:
+            probe = subprocess.run(
+                ["git", "cat-file", "--batch-check"],
+                input="".join(f"{sha}\n" for sha in shas),
+                capture_output=True, text=True, close_fds=False
             )
-            if check_base.returncode != 0:
-                subprocess.run(f"git fetch origin {self.base_sha}", shell=True, capture_output=True)
-        
-        if self.head_sha:
-            check_head = subprocess.run(
-                f"git cat-file -e {self.head_sha}",
-                shell=True, capture_output=True
-            )
-            if check_head.returncode != 0:
-                subprocess.run(f"git fetch origin {self.head_sha}", shell=True, capture_output=True)
+            missing = [line.split()[0] for line in probe.stdout.splitlines() if line.endswith(" missing")]
+            if probe.returncode != 0:
+                missing = shas
+            if missing:
+                subprocess.run(["git", "fetch", "--no-tags", "--quiet", "origin", *missing], capture_output=True, close_fds=False)
         
         # Use three-dot diff to get only changes in PR branch (not all changes between commits)
-        # This finds the merge base and only shows changes in the PR branch
-        cmd = f"git diff --name-status {self.base_sha}...{self.head_sha}"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        # This finds the merge base and only shows changes in the PR branch.
+        # One git process emits both the NUL-separated numstat records and every patch.
+        # (argv lists + close_fds=False let CPython spawn git via posix_spawn without a shell)
+        cmd = ["git", "diff", "--patch", "--numstat", "-z", "-U1", f"{self.base_sha}...{self.head_sha}"]
+        result = subprocess.run(cmd, capture_output=True, text=True, close_fds=False)
         
         if result.returncode != 0:
             # Fallback to two-dot diff if three-dot fails
-            cmd = f"git diff --name-status {self.base_sha} {self.head_sha}"
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+            cmd = ["git", "diff", "--patch", "--numstat", "-z", "-U1", self.base_sha, self.head_sha]
+            result = subprocess.run(cmd, capture_output=True, text=True, close_fds=False)
             if result.returncode != 0:
                 raise ValueError(f"Failed to get PR diff: {result.stderr}")
         
+        numstat, patch_text = self._split_numstat_output(result.stdout)
+        if not patch_text:
+            return []
+        
+        # Patches come out in the same order as the numstat records
+        patches = patch_text.split('\ndiff --git ')
         file_diffs = []
-        for line in result.stdout.strip().split('\n'):
-            if not line:
-                continue
-                
-            parts = line.split('\t')
-            if len(parts) < 2:
-                continue
-                
-            status = parts[0]
-            filename = parts[1]
+        for index, (filename, additions, deletions) in enumerate(numstat):
+            if index >= len(patches):
+                break
             
             # Skip certain file types
             if self._should_skip_file(filename):
                 continue
             
-            # Get the diff for this file using three-dot diff
-            diff_cmd = f"git diff {self.base_sha}...{self.head_sha} -- {filename}"
-            diff_result = subprocess.run(diff_cmd, shell=True, capture_output=True, text=True)
-            
-            if diff_result.returncode != 0:
-                # Fallback to two-dot diff
-                diff_cmd = f"git diff {self.base_sha} {self.head_sha} -- {filename}"
-                diff_result = subprocess.run(diff_cmd, shell=True, capture_output=True, text=True)
-                if diff_result.returncode != 0:
-                    continue
-            
-            # Count additions and deletions
-            additions = len([l for l in diff_result.stdout.split('\n') if l.startswith('+') and not l.startswith('+++')])
-            deletions = len([l for l in diff_result.stdout.split('\n') if l.startswith('-') and not l.startswith('---')])
+            patch = patches[index] if index == 0 else 'diff --git ' + patches[index]
+            header = patch.split('\n@@', 1)[0]
+            if '\nnew file mode' in header:
+                status = 'added'
+            elif '\ndeleted file mode' in header:
+                status = 'deleted'
+            else:
+                status = 'modified'
             
             file_diffs.append(FileDiff(
                 filename=filename,
                 status=status,
-                patch=diff_result.stdout,
+                patch=patch,
                 additions=additions,
                 deletions=deletions
             ))
         
         return file_diffs
     
+    def _split_numstat_output(self, output: str) -> tuple:
+        """Split `git diff --patch --numstat -z` output into numstat entries and the patch text"""
+        numstat = []
+        records = output.split('\0')
+        index = 0
+        while index < len(records) and records[index]:
+            added, deleted, path = records[index].split('\t', 2)
+            if not path:
+                # Renames/copies carry an empty path followed by the old and new paths
+                path = records[index + 2]
+                index += 2
+            index += 1
+            # Binary files report '-' for both counts
+            numstat.append((path, int(added) if added != '-' else 0, int(deleted) if deleted != '-' else 0))
+        
+        # An empty record separates the numstat block from the patches
+        patch_text = '\0'.join(records[index + 1:])
+        return numstat, patch_text
+    
     def _should_skip_file(self, filename: str) -> bool:
         """Determine if a file should be skipped from review"""
-        skip_patterns = [
-            '.lock', 'package-lock.json', 'yarn.lock',
-            '.min.js', '.min.css',
-            '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico',
-            '.pdf', '.zip', '.tar', '.gz',
-            'dist/', 'build/', 'node_modules/', '__pycache__/',
-            '.env', '.env.local', '.env.production',
-            'bitbucket-pipelines.yml', '.bitbucket/'
-        ]
-        
-        return any(pattern in filename for pattern in skip_patterns)
+        return bool(_SKIP_RE.search(filename))
     
-    def _get_file_extension(self, filename: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _get_file_extension(filename: str) -> str:
         """Get file extension for code block syntax highlighting"""
         if '.' in filename:
-            ext = filename.split('.')[-1].lower()
-            # Map common extensions
-            ext_map = {
-                'php': 'php',
-                'js': 'javascript',
-                'jsx': 'javascript',
-                'ts': 'typescript',
-                'tsx': 'typescript',
-                'py': 'python',
-                'java': 'java',
-                'go': 'go',
-                'rs': 'rust',
-                'cpp': 'cpp',
-                'c': 'c',
-                'cs': 'csharp',
-                'rb': 'ruby',
-                'sql': 'sql',
-                'html': 'html',
-                'css': 'css',
-                'scss': 'scss',
-                'json': 'json',
-                'xml': 'xml',
-                'yaml': 'yaml',
-                'yml': 'yaml'
-            }
-            return ext_map.get(ext, ext)
+            ext = filename.rpartition('.')[2].lower()
+            return _EXT_MAP.get(ext, ext)
         return 'text'
     
+    def _load(self, filepath: str) -> List[str]:
+        """Get a working-tree file's lines from the process-wide linecache"""
+        # Absolute path so linecache never falls back to searching sys.path for deleted files
+        lines = linecache.getlines(os.path.abspath(filepath))
+        if not lines and not os.path.isfile(filepath):
+            raise FileNotFoundError(filepath)
+        return lines
+    
     def _get_code_snippet(self, filepath: str, line_number: int, context_lines: int = 3) -> Optional[str]:
         """Extract code snippet around a specific line"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            total_lines = len(self._load(filepath))
             
-            if line_number < 1 or line_number > len(lines):
+            if line_number < 1 or line_number > total_lines:
                 return None
             
-            start = max(0, line_number - context_lines - 1)
-            end = min(len(lines), line_number + context_lines)
+            start = max(1, line_number - context_lines)
+            end = min(total_lines, line_number + context_lines)
+            abs_path = os.path.abspath(filepath)
             
             snippet_lines = []
-            for i in range(start, end):
-                line_num = i + 1
+            for line_num in range(start, end + 1):
                 prefix = ">>> " if line_num == line_number else "    "
-                snippet_lines.append(f"{prefix}Line {line_num:04d}: {lines[i]}")
+                snippet_lines.append(f"{prefix}Line {line_num:04d}: {linecache.getline(abs_path, line_num)}")
             
             return "".join(snippet_lines)
         except:
@@ -536,41 +667,105 @@ class AICodeReviewerBitbucket:
     def _validate_line_number(self, filepath: str, line_number: int) -> bool:
         """Validate that a line number exists in the file"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            return 1 <= line_number <= len(lines)
+            return 1 <= line_number <= len(self._load(filepath))
         except:
             return False
     
-    def _build_enhanced_prompt(self, file_diff: FileDiff, file_content: str) -> str:
-        """Build AI prompt with JIRA context if available"""
+    def _extract_hunk_context(self, file_diff: FileDiff, context_lines: int = 10) -> Optional[str]:
+        """Extract numbered file lines around each hunk of the patch"""
+        try:
+            lines = self._load(file_diff.filename)
+        except OSError:
+            return None
+        
+        # Collect (start, end) windows, merging ones that overlap
+        windows = []
+        for match in _HUNK_RE.finditer(file_diff.patch):
+            start_line = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            start = max(0, start_line - 1 - context_lines)
+            end = min(len(lines), start_line - 1 + count + context_lines)
+            if start >= end:
+                continue
+            if windows and start <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+            else:
+                windows.append((start, end))
+        
+        if not windows:
+            return None
+        
+        sections = []
+        for start, end in windows:
+            section = "".join(f"Line {i + 1:04d}: {lines[i]}" for i in range(start, end))
+            sections.append(section if section.endswith("\n") else section + "\n")
+        return "...\n".join(sections)
+    
+    def _build_prompt_header(self) -> str:
+        """Build the opening of the prompt: role, JIRA context and the PR's changed files"""
         jira_context = self._build_jira_context()
         
         # Get list of all changed files for scope check
         file_diffs = getattr(self, '_all_file_diffs', [])
         changed_files = [fd.filename for fd in file_diffs]
         
-        # Build base prompt
-        base_prompt = f"""You are a strict code-review agent.
+        return f"""You are a strict code-review agent.
 
 {jira_context if jira_context else ""}
 
 ## CODE CHANGES
 
-**File:** {file_diff.filename}
-**Status:** {file_diff.status}
-**Changes:** +{file_diff.additions} -{file_diff.deletions}
-
 **All Changed Files in PR:**
 {chr(10).join(f"- {f}" for f in changed_files)}
 
+"""
+    
+    def _build_file_section(self, file_diff: FileDiff, file_content: str) -> str:
+        """Build the prompt section for a single changed file"""
+        # Send only the regions around the hunks; fall back to the head of the file
+        hunk_context = self._extract_hunk_context(file_diff)
+        if hunk_context:
+            context_title = "FILE CONTENT AROUND CHANGED HUNKS"
+        else:
+            context_title = "FULL FILE CONTENT"
+            hunk_context = file_content[:5000]
+        
+        return f"""**File:** {file_diff.filename}
+**Status:** {file_diff.status}
+**Changes:** +{file_diff.additions} -{file_diff.deletions}
+
 **DIFF:**
 {file_diff.patch}
 
-**FULL FILE CONTENT (for context only - focus on DIFF changes):**
-{file_content[:5000]}
+**{context_title} (for context only - focus on DIFF changes):**
+{hunk_context}
 
 """
+    
+    def _build_enhanced_prompt(self, file_diff: FileDiff, file_content: str) -> str:
+        """Build AI prompt with JIRA context if available"""
+        return self._build_prompt_header() + self._build_file_section(file_diff, file_content) + self._build_review_instructions()
+    
+    def _build_batch_prompt(self, entries: List[tuple]) -> str:
+        """Build one AI prompt covering several (file_diff, file_content) entries"""
+        sections = [self._build_prompt_header()]
+        for index, (file_diff, file_content) in enumerate(entries, 1):
+            sections.append(f"### FILE {index} of {len(entries)}\n\n")
+            sections.append(self._build_file_section(file_diff, file_content))
+        sections.append(self._build_review_instructions())
+        filenames = ", ".join(f'"{fd.filename}"' for fd, _ in entries)
+        sections.append(f"""
+
+**BATCHED REVIEW:** This prompt contains {len(entries)} files. Review each file independently and
+respond with a single JSON object of the form {{"files": [...]}}, holding exactly one entry per file.
+Each entry must have a "filename" key set to the exact file path ({filenames}) plus the
+"overall_assessment", "jira_compliance" and "issues" keys described above, with line numbers
+referring to that file.""")
+        return "".join(sections)
+    
+    def _build_review_instructions(self) -> str:
+        """Build the JIRA requirements and review rubric shared by every prompt"""
+        base_prompt = ""
         
         # Add JIRA-specific requirements if JIRA ticket is available
         if self.jira_issue:
@@ -730,72 +925,169 @@ Be strict. Only report issues that will cause real problems. Verify all line num
         
         return base_prompt
     
-    def review_file(self, file_diff: FileDiff) -> Optional[Dict]:
-        """Review a single file using AI"""
-        print(f"📝 Reviewing {file_diff.filename}...")
-        
-        # Read the full file content if it exists
+    def _read_file_content(self, file_diff: FileDiff) -> str:
+        """Read the full file content if it exists"""
         try:
-            with open(file_diff.filename, 'r', encoding='utf-8') as f:
-                file_content = f.read()
+            return "".join(self._load(file_diff.filename))
         except:
-            file_content = "File not accessible or was deleted"
+            return "File not accessible or was deleted"
+    
+    def _system_message(self) -> str:
+        """System message for JIRA-aware reviews"""
+        system_message = "You are a strict code-review agent. You identify ONLY Critical and High-severity issues that will cause security vulnerabilities, break the application, cause data loss, or create major performance problems. You ignore style, formatting, naming, minor optimizations, and low-severity issues. You always verify line numbers are accurate and provide only correct, executable code snippets."
+        if self.jira_issue:
+            system_message += " You are also an expert at evaluating code implementations against JIRA ticket requirements and acceptance criteria. You must strictly verify that code changes align with the specified requirements."
+        return system_message
+    
+    def _report_openai_error(self, label: str, e: Exception):
+        """Print a review error, with setup guidance for API key problems"""
+        error_str = str(e)
+        print(f"❌ Error reviewing {label}: {error_str}")
+        
+        # Check for API key errors and provide helpful guidance
+        if 'invalid_api_key' in error_str or 'Incorrect API key' in error_str or '401' in error_str:
+            print("")
+            print("🔑 OpenAI API Key Error Detected!")
+            print("   Your OPENAI_API_KEY appears to be invalid.")
+            print("   Valid OpenAI API keys:")
+            print("   - Start with 'sk-' or 'sk-proj-'")
+            print("   - Are about 50-60 characters long")
+            print("   - Come from: https://platform.openai.com/account/api-keys")
+            print("")
+            print("   To fix:")
+            print("   1. Go to: https://platform.openai.com/account/api-keys")
+            print("   2. Create a new API key (starts with 'sk-')")
+            print("   3. Update OPENAI_API_KEY in Bitbucket:")
+            print("      Repository Settings → Pipelines → Repository variables")
+            print("   4. Make sure your OpenAI account has credits/billing set up")
+            print("")
+    
+    async def _complete_json(self, prompt: str) -> Dict:
+        """Send one review prompt and parse the JSON reply"""
+        for attempt in range(_RATE_LIMIT_ATTEMPTS):
+            async with self._limiter:
+                try:
+                    raw = await self.client.chat.completions.with_raw_response.create(
+                        model="gpt-4o",
+                        messages=[
+                            {"role": "system", "content": self._system_message()},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=0.3,
+                        response_format={"type": "json_object"}
+                    )
+                except RateLimitError as e:
+                    self._limiter.on_rate_limit()
+                    if attempt == _RATE_LIMIT_ATTEMPTS - 1:
+                        raise
+                    delay = _header_float(e.response.headers, 'retry-after') or 2 ** attempt
+                    print(f"⚠️  OpenAI rate limit hit, concurrency now {self._limiter.limit}, retrying in {delay:.1f}s")
+                except (APIConnectionError, InternalServerError) as e:
+                    # Transient failures are retried too, but say nothing about the concurrency limit
+                    if attempt == _RATE_LIMIT_ATTEMPTS - 1:
+                        raise
+                    delay = 2 ** attempt
+                    print(f"⚠️  OpenAI request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                else:
+                    remaining = _header_float(raw.headers, 'x-ratelimit-remaining-requests')
+                    self._limiter.on_success(None if remaining is None else int(remaining))
+                    response = raw.parse()
+                    return orjson.loads(response.choices[0].message.content)
+            
+            # Sleep outside the limiter so other requests can use the slot meanwhile
+            await asyncio.sleep(delay)
+    
+    async def review_file_async(self, file_diff: FileDiff) -> Optional[Dict]:
+        """Review a single file using AI"""
+        print(f"📝 Reviewing {file_diff.filename}...")
         
         # Build enhanced prompt with JIRA context
-        prompt = self._build_enhanced_prompt(file_diff, file_content)
-
+        prompt = self._build_enhanced_prompt(file_diff, self._read_file_content(file_diff))
+        
         try:
-            # Enhanced system message for JIRA-aware reviews
-            system_message = "You are a strict code-review agent. You identify ONLY Critical and High-severity issues that will cause security vulnerabilities, break the application, cause data loss, or create major performance problems. You ignore style, formatting, naming, minor optimizations, and low-severity issues. You always verify line numbers are accurate and provide only correct, executable code snippets."
-            if self.jira_issue:
-                system_message += " You are also an expert at evaluating code implementations against JIRA ticket requirements and acceptance criteria. You must strictly verify that code changes align with the specified requirements."
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            review_result = json.loads(response.choices[0].message.content)
-            return review_result
-            
+            return await self._complete_json(prompt)
         except Exception as e:
-            error_str = str(e)
-            print(f"❌ Error reviewing {file_diff.filename}: {error_str}")
-            
-            # Check for API key errors and provide helpful guidance
-            if 'invalid_api_key' in error_str or 'Incorrect API key' in error_str or '401' in error_str:
-                print("")
-                print("🔑 OpenAI API Key Error Detected!")
-                print("   Your OPENAI_API_KEY appears to be invalid.")
-                print("   Valid OpenAI API keys:")
-                print("   - Start with 'sk-' or 'sk-proj-'")
-                print("   - Are about 50-60 characters long")
-                print("   - Come from: https://platform.openai.com/account/api-keys")
-                print("")
-                print("   To fix:")
-                print("   1. Go to: https://platform.openai.com/account/api-keys")
-                print("   2. Create a new API key (starts with 'sk-')")
-                print("   3. Update OPENAI_API_KEY in Bitbucket:")
-                print("      Repository Settings → Pipelines → Repository variables")
-                print("   4. Make sure your OpenAI account has credits/billing set up")
-                print("")
-            
+            self._report_openai_error(file_diff.filename, e)
             return None
     
+    async def review_batch_async(self, batch: List[FileDiff]) -> List[Optional[Dict]]:
+        """Review several small files in one AI request, returning reviews in batch order"""
+        if len(batch) == 1:
+            return [await self.review_file_async(batch[0])]
+        
+        print(f"📝 Reviewing {len(batch)} files in one request: {', '.join(fd.filename for fd in batch)}...")
+        prompt = self._build_batch_prompt([(fd, self._read_file_content(fd)) for fd in batch])
+        
+        try:
+            result = await self._complete_json(prompt)
+            batch_failed = False
+        except Exception as e:
+            self._report_openai_error(f"batch of {len(batch)} files", e)
+            print(f"⚠️  Reviewing the {len(batch)} files one by one instead")
+            result = {}
+            batch_failed = True
+        
+        # Demultiplex the per-file entries back onto the batch (the model may write e.g. ./src/x.php)
+        by_filename = {}
+        for entry in result.get('files', []):
+            if isinstance(entry, dict) and isinstance(entry.get('filename'), str):
+                by_filename[_batch_entry_key(entry.pop('filename'))] = entry
+        
+        # Anything the batch lost gets a single-file review
+        reviews = []
+        for file_diff in batch:
+            review = by_filename.get(_batch_entry_key(file_diff.filename))
+            if review is None:
+                if not batch_failed:
+                    print(f"⚠️  No review returned for {file_diff.filename} in batched response; reviewing it alone")
+                review = await self.review_file_async(file_diff)
+            reviews.append(review)
+        return reviews
+    
+    def _pack_review_batches(self, file_diffs: List[FileDiff]) -> List[List[FileDiff]]:
+        """Greedily pack diffs into batches under the per-request token budget and file cap"""
+        batches = []
+        current = []
+        current_tokens = 0
+        for file_diff in file_diffs:
+            # Rough estimate: ~4 characters per token
+            tokens = len(file_diff.patch) // 4
+            if current and (current_tokens + tokens > _BATCH_TOKEN_BUDGET or len(current) >= self._batch_max_files):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(file_diff)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    async def _review_all(self, file_diffs: List[FileDiff]) -> List:
+        """Review all files concurrently (bounded by OPENAI_MAX_CONCURRENCY), batching small files"""
+        batches = self._pack_review_batches(file_diffs)
+        results = await asyncio.gather(
+            *[self.review_batch_async(batch) for batch in batches],
+            return_exceptions=True
+        )
+        
+        # Flatten back to one review (or exception) per file, in file_diffs order
+        reviews = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                reviews.extend([result] * len(batch))
+            else:
+                reviews.extend(result)
+        return reviews
+    
     def _delete_previous_ai_comments(self):
         """Delete previous AI review comments to prevent email spam"""
         try:
             comments_url = f"{self.bitbucket_api_base}/pullrequests/{self.pr_id}/comments"
             headers = self._get_auth_headers()
-            response = requests.get(comments_url, headers=headers)
+            response = self._http_get(comments_url, headers=headers)
             
             if response.status_code == 200:
-                comments_data = response.json()
+                comments_data = orjson.loads(response.content)
                 comments = comments_data.get('values', [])
                 
                 for comment in comments:
@@ -804,7 +1096,7 @@ Be strict. Only report issues that will cause real problems. Verify all line num
                         comment_id = comment.get('id')
                         if comment_id:
                             delete_url = f"{self.bitbucket_api_base}/pullrequests/{self.pr_id}/comments/{comment_id}"
-                            requests.delete(delete_url, headers=headers)
+                            self._http.delete(delete_url, headers=headers)
         except Exception:
             pass
     
@@ -812,7 +1104,7 @@ Be strict. Only report issues that will cause real problems. Verify all line num
         """Delete previous summary comment (handled in _delete_previous_ai_comments)"""
         pass
     
-    def post_review_comments(self, file_diff: FileDiff, review: Dict):
+    async def post_review_comments(self, file_diff: FileDiff, review: Dict, client: httpx.AsyncClient):
         """Post review comments to Bitbucket PR"""
         if not review or not review.get('issues'):
             return
@@ -850,21 +1142,8 @@ Be strict. Only report issues that will cause real problems. Verify all line num
                 continue  # Skip low/medium severity issues
             
             # Create comment body
-            emoji_map = {
-                'security': '🔒',
-                'bug': '🐛',
-                'performance': '⚡',
-                'architecture': '🏗️'
-            }
-            
-            severity_emoji = {
-                'critical': '🔴',
-                'error': '🔴',
-                'high': '🔴'
-            }
-            
-            emoji = emoji_map.get(issue.get('category', ''), '🔴')
-            severity = severity_emoji.get(issue_severity, '🔴')
+            emoji = _CATEGORY_EMOJI.get(issue.get('category', ''), '🔴')
+            severity = _SEVERITY_EMOJI.get(issue_severity, '🔴')
             
             line_number = issue.get('line')
             line_valid = False
@@ -903,10 +1182,10 @@ Be strict. Only report issues that will cause real problems. Verify all line num
                 }
                 
                 try:
-                    response = requests.post(
+                    response = await client.post(
                         comments_url,
                         headers=headers,
-                        json=comment_data
+                        content=orjson.dumps(comment_data)
                     )
                     if response.status_code in [200, 201]:
                         print(f"✅ Posted inline comment on {file_diff.filename}:{line_number}")
@@ -922,7 +1201,7 @@ Be strict. Only report issues that will cause real problems. Verify all line num
                             'content': {'raw': comment_body}
                         }
                         try:
-                            regular_response = requests.post(comments_url, headers=headers, json=regular_comment_data)
+                            regular_response = await client.post(comments_url, headers=headers, content=orjson.dumps(regular_comment_data))
                             if regular_response.status_code in [200, 201]:
                                 print(f"✅ Posted as regular comment on {file_diff.filename}")
                             else:
@@ -973,16 +1252,18 @@ Be strict. Only report issues that will cause real problems. Verify all line num
         print("📊 Generating review summary...")
         
         total_files = len(file_reviews)
-        total_issues = sum(len(review.get('issues', [])) for _, review in file_reviews if review)
         
-        # Only count Critical and High-severity issues
-        critical_count = sum(
-            1 for _, review in file_reviews if review 
-            for issue in review.get('issues', []) 
-            if issue.get('severity', '').lower() in ['critical', 'error', 'high']
+        # Tally every issue's severity in one pass; only Critical and High-severity issues count as critical
+        severity_counts = Counter(
+            issue.get('severity', '').lower() for _, review in file_reviews if review
+            for issue in review.get('issues', [])
         )
+        total_issues = sum(severity_counts.values())
+        critical_count = severity_counts['critical'] + severity_counts['error'] + severity_counts['high']
         
-        summary = f"""# 🤖 AI Code Review Summary"""
+        # Collect the pieces and join once at the end (repeated += is quadratic on a growing string)
+        parts = ["# 🤖 AI Code Review Summary"]
+        append = parts.append
         
         # Add JIRA context if available
         if self.jira_issue:
@@ -991,24 +1272,24 @@ Be strict. Only report issues that will cause real problems. Verify all line num
             if subtasks:
                 subtasks_info = f"\n**Subtasks:** {len(subtasks)} subtask(s)"
             
-            summary += f"""
+            append(f"""
 
 ## 🎫 JIRA Ticket: [{self.jira_key}]({self.jira_issue.get('url', '')})
 
 **Summary:** {self.jira_issue.get('summary', 'N/A')}{subtasks_info}
 
-"""
+""")
         
-        summary += f"""
+        append(f"""
 ## Overview
 - **Files Reviewed**: {total_files}
 - **Critical/High Issues Found**: {critical_count}
 
-"""
+""")
         
         # Add JIRA compliance section if available
         if self.jira_issue:
-            summary += "## 📋 JIRA Compliance Check\n\n"
+            append("## 📋 JIRA Compliance Check\n\n")
             
             all_compliant = True
             for _, review in file_reviews:
@@ -1035,51 +1316,51 @@ Be strict. Only report issues that will cause real problems. Verify all line num
                 # Final verdict section
                 if final_verdict:
                     verdict_emoji = "✅" if "approve" in final_verdict.lower() else "❌"
-                    summary += f"### 🔚 Final Verdict\n\n"
-                    summary += f"{verdict_emoji} **{final_verdict}**\n\n"
+                    append(f"### 🔚 Final Verdict\n\n")
+                    append(f"{verdict_emoji} **{final_verdict}**\n\n")
                 
                 # Acceptance Criteria Checklist
                 if checklist:
-                    summary += "### 📋 Acceptance Criteria Checklist\n\n"
+                    append("### 📋 Acceptance Criteria Checklist\n\n")
                     for item in checklist:
-                        summary += f"{item.get('status', '❓')} {item.get('criteria', 'N/A')}\n"
+                        append(f"{item.get('status', '❓')} {item.get('criteria', 'N/A')}\n")
                         if item.get('evidence'):
-                            summary += f"   *Evidence: {item.get('evidence')}*\n"
-                    summary += "\n"
+                            append(f"   *Evidence: {item.get('evidence')}*\n")
+                    append("\n")
                 
                 # Subtask Coverage
                 if subtask_coverage:
-                    summary += "### 🧾 Subtask Coverage\n\n"
+                    append("### 🧾 Subtask Coverage\n\n")
                     for subtask in subtask_coverage:
                         subtask_key = subtask.get('subtask_key', 'N/A')
                         subtask_status = subtask.get('status', '❓')
                         subtask_evidence = subtask.get('evidence', '')
-                        summary += f"{subtask_status} **{subtask_key}**\n"
+                        append(f"{subtask_status} **{subtask_key}**\n")
                         if subtask_evidence:
-                            summary += f"   *Evidence: {subtask_evidence}*\n"
-                    summary += "\n"
+                            append(f"   *Evidence: {subtask_evidence}*\n")
+                    append("\n")
                 
                 if missing:
-                    summary += "### ❌ Missing Acceptance Criteria\n\n"
+                    append("### ❌ Missing Acceptance Criteria\n\n")
                     for criteria in missing:
-                        summary += f"- {criteria}\n"
-                    summary += "\n"
+                        append(f"- {criteria}\n")
+                    append("\n")
                 
                 if out_of_scope:
-                    summary += "### ⚠️ Out-of-Scope Files\n\n"
-                    summary += "The following files appear unrelated to JIRA ticket requirements:\n\n"
+                    append("### ⚠️ Out-of-Scope Files\n\n")
+                    append("The following files appear unrelated to JIRA ticket requirements:\n\n")
                     for file in out_of_scope:
-                        summary += f"- `{file}`\n"
-                    summary += "\n"
+                        append(f"- `{file}`\n")
+                    append("\n")
             
             if all_compliant:
-                summary += "✅ **All JIRA requirements appear to be met!**\n\n"
+                append("✅ **All JIRA requirements appear to be met!**\n\n")
             else:
-                summary += "❌ **Some JIRA requirements are not met. Please review.**\n\n"
+                append("❌ **Some JIRA requirements are not met. Please review.**\n\n")
             
-            summary += "---\n\n"
+            append("---\n\n")
         
-        summary += "## Detailed Analysis\n\n"
+        append("## Detailed Analysis\n\n")
         
         for file_diff, review in file_reviews:
             if not review:
@@ -1092,91 +1373,62 @@ Be strict. Only report issues that will cause real problems. Verify all line num
             if not critical_issues:
                 continue  # Skip files with no critical issues
             
-            summary += f"\n### 📄 `{file_diff.filename}`\n\n"
-            summary += f"**Critical/High Issues Found**: {len(critical_issues)}\n\n"
+            append(f"\n### 📄 `{file_diff.filename}`\n\n")
+            append(f"**Critical/High Issues Found**: {len(critical_issues)}\n\n")
                 
             for i, issue in enumerate(critical_issues, 1):
-                emoji_map = {
-                    'security': '🔒',
-                    'bug': '🐛',
-                    'performance': '⚡',
-                    'architecture': '🏗️'
-                }
-                emoji = emoji_map.get(issue.get('category', ''), '🔴')
+                emoji = _CATEGORY_EMOJI.get(issue.get('category', ''), '🔴')
                 severity = issue.get('severity', 'critical').upper()
                 
-                summary += f"{i}. {emoji} **[Severity: {severity}]** {issue['title']}\n"
-                summary += f"   - **File**: `{file_diff.filename}`\n"
-                summary += f"   - **Line**: {issue.get('line', 'N/A')}\n"
-                summary += f"   - **Issue**: {issue['description']}\n"
+                append(f"{i}. {emoji} **[Severity: {severity}]** {issue['title']}\n")
+                append(f"   - **File**: `{file_diff.filename}`\n")
+                append(f"   - **Line**: {issue.get('line', 'N/A')}\n")
+                append(f"   - **Issue**: {issue['description']}\n")
                 if issue.get('suggestion'):
-                    summary += f"   - **Fix**:\n```{self._get_file_extension(file_diff.filename)}\n{issue['suggestion']}\n```\n"
-                summary += "\n"
+                    append(f"   - **Fix**:\n```{self._get_file_extension(file_diff.filename)}\n{issue['suggestion']}\n```\n")
+                append("\n")
         
         if critical_count == 0:
-            summary += "\n✅ **No Critical or High-severity issues found.**\n"
+            append("\n✅ **No Critical or High-severity issues found.**\n")
         
-        summary += "\n---\n"
-        summary += "*🤖 Generated by AI Code Reviewer - Critical/High Issues Only*\n"
+        append("\n---\n")
+        append("*🤖 Generated by AI Code Reviewer - Critical/High Issues Only*\n")
         
-        # Save summary to file
+        # Save summary to file, writing the parts through the file buffer instead of joining them first
         with open('review_summary.md', 'w', encoding='utf-8') as f:
-            f.write(summary)
+            f.writelines(parts)
         
         print("✅ Review summary saved to review_summary.md")
     
+    def _probe_auth(self, url: str, headers: Dict) -> bool:
+        """Check credentials with a body-less HEAD request"""
+        try:
+            response = self._http.head(url, headers=headers, timeout=5)
+            if response.status_code == 405:
+                # HEAD not allowed here: fall back to a GET trimmed to a single field
+                response = self._http.get(url, headers=headers, params={'fields': 'id'}, timeout=5)
+            return response.status_code == 200
+        except Exception:
+            return False
+    
     def _validate_authentication_early(self) -> bool:
         """Validate authentication - tries multiple auth methods, non-blocking"""
         test_url = f"{self.bitbucket_api_base}/pullrequests/{self.pr_id}"
-        token_check = self.bitbucket_app_password.strip() if self.bitbucket_app_password else ""
         
-        # Try Bearer token first (for API tokens)
-        try:
-            headers = self._get_auth_headers(use_basic_auth=False)
-            response = requests.get(test_url, headers=headers, timeout=5)
-            
-            if response.status_code == 200:
-                return True
-        except Exception:
-            pass
+        # The scheme in use first, then the rest of the token's auth attempts
+        current = ('basic' if self._use_basic_auth else 'bearer', self._auth_username if self._use_basic_auth else None)
+        candidates = [current] + [attempt for attempt in self._auth_attempts if attempt != current]
         
-        # If Bearer fails and token is Atlassian (ATATT...), try Basic Auth
-        if token_check.startswith('ATATT'):
-            # Try with username
-            if self.bitbucket_username:
-                try:
-                    headers = self._get_auth_headers(use_basic_auth=True)
-                    response = requests.get(test_url, headers=headers, timeout=5)
-                    
-                    if response.status_code == 200:
-                        self._use_basic_auth = True
-                        return True
-                except Exception:
-                    pass
-            
-            # Try with workspace as username
-            try:
-                headers = self._get_auth_headers(use_basic_auth=True, use_username=self.workspace)
-                response = requests.get(test_url, headers=headers, timeout=5)
-                
-                if response.status_code == 200:
-                    self._use_basic_auth = True
-                    self._auth_username = self.workspace
-                    return True
-            except Exception:
-                pass
+        tried = set()
+        for scheme, username in candidates:
+            headers = self._get_auth_headers(use_basic_auth=scheme == 'basic', use_username=username)
+            if headers['Authorization'] in tried:
+                continue
+            tried.add(headers['Authorization'])
             
-            # Try with 'x-token-auth' as username (some Atlassian tokens use this)
-            try:
-                headers = self._get_auth_headers(use_basic_auth=True, use_username='x-token-auth')
-                response = requests.get(test_url, headers=headers, timeout=5)
-                
-                if response.status_code == 200:
-                    self._use_basic_auth = True
-                    self._auth_username = 'x-token-auth'
-                    return True
-            except Exception:
-                pass
+            if self._probe_auth(test_url, headers):
+                self._use_auth_attempt(scheme, username)
+                return True
         
         # Could not validate, but continue anyway - will fail during actual operations if invalid
         return False
@@ -1189,10 +1441,10 @@ Be strict. Only report issues that will cause real problems. Verify all line num
         try:
             pr_url = f"{self.bitbucket_api_base}/pullrequests/{self.pr_id}"
             headers = self._get_auth_headers(prefer_bearer=True)
-            response = requests.get(pr_url, headers=headers, timeout=10)
+            response = self._http_get(pr_url, headers=headers)
             
             if response.status_code == 200:
-                pr_data = response.json()
+                pr_data = orjson.loads(response.content)
                 self.pr_title = pr_data.get('title', '')
                 print(f"📋 PR Title: {self.pr_title}")
         except Exception as e:
@@ -1201,10 +1453,10 @@ Be strict. Only report issues that will cause real problems. Verify all line num
     def _get_commit_messages(self) -> List[str]:
         """Get commit messages from the PR"""
         try:
-            cmd = f"git log {self.base_sha}..{self.head_sha} --pretty=format:%s"
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            commits = [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
-            return commits[:10]  # Limit to last 10 commits
+            # argv list, no shell; git stops after the 10 most recent commits itself
+            cmd = ["git", "log", "-n", "10", f"{self.base_sha}..{self.head_sha}", "--pretty=format:%s"]
+            result = subprocess.run(cmd, capture_output=True, text=True, close_fds=False)
+            return [line.strip() for line in result.stdout.splitlines() if line.strip()]
         except Exception as e:
             print(f"⚠️  Could not fetch commit messages: {str(e)}")
             return []
@@ -1216,7 +1468,8 @@ Be strict. Only report issues that will cause real problems. Verify all line num
         Returns:
             True if JIRA ticket found and fetched, False otherwise
         """
-        if not self.jira_service.enabled:
+        # Same check as JiraService.enabled, without constructing the client
+        if not os.getenv('JIRA_PROJECT_ID'):
             print("ℹ️  JIRA integration not configured, proceeding with standard review")
             return False
         
@@ -1224,7 +1477,7 @@ Be strict. Only report issues that will cause real problems. Verify all line num
         commit_messages = self._get_commit_messages()
         
         # Find JIRA key
-        self.jira_key = self.jira_service.find_jira_key(
+        self.jira_key = JiraService.find_jira_key(
             self.branch or '', 
             self.pr_title or '', 
             commit_messages
@@ -1268,7 +1521,7 @@ Once a valid JIRA ticket is detected, the AI review will evaluate your code agai
         try:
             comments_url = f"{self.bitbucket_api_base}/pullrequests/{self.pr_id}/comments"
             headers = self._get_auth_headers(prefer_bearer=True)
-            response = requests.post(comments_url, headers=headers, json={'content': {'raw': comment_body}}, timeout=10)
+            response = self._http.post(comments_url, headers=headers, content=orjson.dumps({'content': {'raw': comment_body}}))
             
             if response.status_code in [200, 201]:
                 print("📝 Posted comment requesting JIRA ticket")
@@ -1310,8 +1563,33 @@ Once a valid JIRA ticket is detected, the AI review will evaluate your code agai
 """
         return context
     
+    async def _post_all_comments(self, file_reviews: List[tuple]) -> int:
+        """Post comments for all reviewed files concurrently, returning the number of failed files"""
+        sem = asyncio.Semaphore(8)
+        
+        async def _post_one(client: httpx.AsyncClient, file_diff: FileDiff, review: Dict):
+            async with sem:
+                await self.post_review_comments(file_diff, review, client)
+        
+        async with httpx.AsyncClient(http2=True, timeout=10, follow_redirects=True, headers={'Accept': 'application/json'}) as client:
+            results = await asyncio.gather(
+                *[_post_one(client, file_diff, review) for file_diff, review in file_reviews],
+                return_exceptions=True
+            )
+        
+        comment_errors = 0
+        for (file_diff, _), result in zip(file_reviews, results):
+            if isinstance(result, Exception):
+                comment_errors += 1
+                print(f"⚠️  Failed to post comments for {file_diff.filename}: {str(result)}")
+        return comment_errors
+    
     def run(self):
         """Main execution method"""
+        asyncio.run(self.run_async())
+    
+    async def run_async(self):
+        """Run the review: fetch the diff, review files and post comments concurrently"""
         print("🚀 Starting AI Code Review...")
         print(f"📦 Repository: {self.workspace}/{self.repo_slug}")
         print(f"🔀 PR #{self.pr_id}")
@@ -1324,8 +1602,8 @@ Once a valid JIRA ticket is detected, the AI review will evaluate your code agai
         # Get PR info (title)
         self._get_pr_info()
         
-        # Detect and fetch JIRA ticket
-        if self.jira_service.enabled:
+        # Detect and fetch JIRA ticket (the JIRA client is only built once a key is found)
+        if os.getenv('JIRA_PROJECT_ID'):
             print("🔍 JIRA integration enabled - checking for JIRA ticket...")
             jira_available = self._detect_and_fetch_jira_ticket()
             
@@ -1361,22 +1639,21 @@ Once a valid JIRA ticket is detected, the AI review will evaluate your code agai
         # Store file_diffs for use in prompt building
         self._all_file_diffs = file_diffs
         
-        # Review each file
+        # Drop any stale linecache entries before reading the checked-out files
+        linecache.checkcache()
+        
+        # Review all files concurrently, then post every file's comments concurrently
+        reviews = await self._review_all(file_diffs)
+        
         file_reviews = []
-        comment_errors = 0
-        for file_diff in file_diffs:
-            try:
-                review = self.review_file(file_diff)
-                if review:
-                    file_reviews.append((file_diff, review))
-                    try:
-                        self.post_review_comments(file_diff, review)
-                    except Exception as e:
-                        comment_errors += 1
-                        print(f"⚠️  Failed to post comments for {file_diff.filename}: {str(e)}")
-            except Exception as e:
-                print(f"⚠️  Error reviewing {file_diff.filename}: {str(e)}")
+        for file_diff, review in zip(file_diffs, reviews):
+            if isinstance(review, Exception):
+                print(f"⚠️  Error reviewing {file_diff.filename}: {str(review)}")
                 continue
+            if review:
+                file_reviews.append((file_diff, review))
+        
+        comment_errors = await self._post_all_comments(file_reviews)
         
         # Generate summary (always generate, even if comments failed)
         try:
@@ -1400,10 +1677,14 @@ Once a valid JIRA ticket is detected, the AI review will evaluate your code agai
             print(f"💬 Check the PR for detailed comments and suggestions")
 
 if __name__ == "__main__":
+    reviewer = None
     try:
         reviewer = AICodeReviewerBitbucket()
         reviewer.run()
     except Exception as e:
         print(f"❌ Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if reviewer:
+            reviewer.close()
 
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Bitbucket auth strategy shared by the reviewer and the summary poster
+"""
+
+from typing import List, Optional, Tuple
+
+
+# Token prefix -> auth scheme to try first (longest prefix wins); 'basic' uses BITBUCKET_USERNAME
+AUTH_FOR_PREFIX = {
+    'ATB': 'bearer',  # Repository Access Token
+    'ATBB': 'basic',  # Bitbucket API Token
+    'ATAT': 'basic',  # Atlassian API Token
+}
+
+
+def token_scheme(token: str) -> Optional[str]:
+    """Auth scheme implied by the token prefix, or None for unknown tokens"""
+    return AUTH_FOR_PREFIX.get(token[:4]) or AUTH_FOR_PREFIX.get(token[:3])
+
+
+def auth_attempts(token: str, username: Optional[str], workspace: Optional[str]) -> List[Tuple[str, Optional[str]]]:
+    """
+    (scheme, Basic Auth username) pairs to try, most likely first
+
+    Bearer, Basic with the username and Basic with the workspace, with the token prefix's
+    scheme moved to the front; Atlassian tokens (ATATT...) try 'x-token-auth' last.
+    """
+    attempts = [('bearer', None)]
+    if username:
+        attempts.append(('basic', username))
+    if workspace and workspace != username:
+        attempts.append(('basic', workspace))
+    
+    if token_scheme(token) == 'basic' and len(attempts) > 1:
+        attempts.insert(0, attempts.pop(1))
+    
+    if token.startswith('ATAT'):
+        attempts.append(('basic', 'x-token-auth'))
+    return attempts
@@ -5,41 +5,108 @@ Post review summary to Bitbucket PR
 
 import os
 import sys
+import hashlib
+import asyncio
+import httpx
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+from bitbucket_auth import auth_attempts, token_scheme
 
-def find_pr_id(workspace, repo_slug, branch, app_password):
+# One pooled session for every Bitbucket call so TLS/keep-alive stays warm across the run
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+SESSION.headers.update({'Content-Type': 'application/json', 'Accept': 'application/json'})
+
+def find_pr_id(workspace, repo_slug, branch, app_password, attempts):
     """Find PR ID by querying Bitbucket API using branch name"""
     if not branch:
         return None
     
     try:
         api_base = f"https://api.bitbucket.org/2.0/repositories/{workspace}/{repo_slug}"
-        headers = {
-            'Authorization': f'Bearer {app_password}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
+        
+        # Let Bitbucket filter to the open PR from this branch and return only its id
+        prs_url = f"{api_base}/pullrequests"
+        params = {
+            'state': 'OPEN',
+            'q': f'source.branch.name="{branch}"',
+            'fields': 'values.id',
+            'pagelen': 1
         }
         
-        prs_url = f"{api_base}/pullrequests?state=OPEN&pagelen=50"
-        response = requests.get(prs_url, headers=headers)
+        # The PR query doubles as the auth probe, most likely scheme first
+        for scheme, user in attempts:
+            apply_auth(scheme, user, app_password)
+            response = SESSION.get(prs_url, params=params)
+            if response.status_code not in (401, 403):
+                break
         
         if response.status_code != 200:
             print(f"⚠️  Failed to fetch PRs: {response.status_code}")
             return None
         
-        prs_data = response.json()
-        prs = prs_data.get('values', [])
-        
-        for pr in prs:
-            source_branch = pr.get('source', {}).get('branch', {}).get('name', '')
-            if source_branch == branch:
-                return str(pr.get('id'))
-        
-        return None
+        prs_data = orjson.loads(response.content)
+        return str(prs_data['values'][0]['id']) if prs_data.get('values') else None
     except Exception as e:
         print(f"⚠️  Error finding PR ID: {str(e)}")
         return None
 
+def apply_auth(scheme, user, app_password):
+    """Set the session's credentials for an auth_attempts entry: bearer, or basic as user"""
+    SESSION.auth = None
+    SESSION.headers.pop('Authorization', None)
+    if scheme == 'bearer':
+        SESSION.headers['Authorization'] = f'Bearer {app_password}'
+    else:
+        SESSION.auth = HTTPBasicAuth(user, app_password)
+
+def list_summary_comments(comments_url):
+    """Return (id, raw content) for every AI summary comment on the PR"""
+    # Let Bitbucket filter to summary comments and return only the fields we use, across all pages
+    found = []
+    page_url = comments_url
+    params = {
+        'pagelen': 100,
+        'fields': 'next,values.id,values.content.raw',
+        'q': 'content.raw ~ "AI Code Review Summary"'
+    }
+    while page_url:
+        response = SESSION.get(page_url, params=params)
+        if response.status_code != 200:
+            break
+        comments_data = orjson.loads(response.content)
+        for comment in comments_data.get('values', []):
+            raw = comment.get('content', {}).get('raw', '')
+            if '🤖 AI Code Review Summary' in raw and comment.get('id'):
+                found.append((comment['id'], raw))
+        # The next link already carries the query
+        page_url = comments_data.get('next')
+        params = None
+    return found
+
+async def delete_comments(api_base, pr_id, comment_ids):
+    """Delete PR comments concurrently with the session's credentials, returning how many were removed"""
+    if isinstance(SESSION.auth, HTTPBasicAuth):
+        client_auth = {'auth': httpx.BasicAuth(SESSION.auth.username, SESSION.auth.password)}
+    else:
+        client_auth = {'headers': {'Authorization': SESSION.headers.get('Authorization', '')}}
+    async with httpx.AsyncClient(timeout=10, limits=httpx.Limits(max_connections=10), **client_auth) as client:
+        responses = await asyncio.gather(
+            *[client.delete(f"{api_base}/pullrequests/{pr_id}/comments/{comment_id}")
+              for comment_id in comment_ids],
+            return_exceptions=True
+        )
+    return sum(1 for r in responses if not isinstance(r, Exception) and r.status_code in [200, 204])
+
 def post_summary():
     workspace = os.getenv('BITBUCKET_WORKSPACE')
     repo_slug = os.getenv('BITBUCKET_REPO_SLUG')
@@ -55,15 +122,12 @@ def post_summary():
         print("⚠️  Missing required Bitbucket environment variables")
         return
     
-    # Detect token type
-    token_preview = app_password[:4] if len(app_password) >= 4 else ""
-    is_repository_access_token = token_preview == "ATB"  # Repository Access Token
-    is_bitbucket_api_token = token_preview == "ATBB"  # Bitbucket API Token
-    is_atlassian_token = token_preview == "ATAT"  # Atlassian API Token
+    # Auth schemes in order of likelihood: the one implied by the token prefix first, then the rest
+    attempts = auth_attempts(app_password, username, workspace)
     
     # Try to find PR ID if not set
     if not pr_id and branch:
-        pr_id = find_pr_id(workspace, repo_slug, branch, app_password)
+        pr_id = find_pr_id(workspace, repo_slug, branch, app_password, attempts)
         if not pr_id:
             return
     elif not pr_id:
@@ -79,70 +143,27 @@ def post_summary():
     api_base = f"https://api.bitbucket.org/2.0/repositories/{workspace}/{repo_slug}"
     comments_url = f"{api_base}/pullrequests/{pr_id}/comments"
     
-    # For Repository Access Tokens (ATB...), use Bearer authentication
-    # For other tokens, try Basic Auth with username
-    import base64
-    headers = None
+    # Probe the auth attempts in order until one can read the PR
     test_url = f"{api_base}/pullrequests/{pr_id}"
-    
-    # Repository Access Tokens (ATB...) MUST use Bearer authentication
-    if is_repository_access_token:
-        headers = {
-            'Authorization': f'Bearer {app_password}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        test_response = requests.get(test_url, headers=headers, timeout=10)
-        if test_response.status_code != 200:
-            headers = None
-    
-    # Try Basic Auth with username (for scoped tokens)
-    if not headers and username:
-        credentials = f"{username}:{app_password}"
-        encoded = base64.b64encode(credentials.encode()).decode()
-        headers = {
-            'Authorization': f'Basic {encoded}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        test_response = requests.get(test_url, headers=headers, timeout=10)
+    for scheme, user in attempts:
+        apply_auth(scheme, user, app_password)
+        # HEAD carries the same auth signal without the PR body
+        test_response = SESSION.head(test_url, timeout=10, allow_redirects=False)
+        if test_response.status_code == 405:
+            test_response = SESSION.get(test_url, params={'fields': 'id'}, timeout=10)
         if test_response.status_code == 200:
-            pass  # Success!
-        else:
-            headers = None
-    
-    # If that failed, try Bearer token
-    if not headers or (headers and test_response.status_code != 200):
-        headers = {
-            'Authorization': f'Bearer {app_password}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        test_response = requests.get(test_url, headers=headers, timeout=10)
-        if test_response.status_code != 200:
-            headers = None
-    
-    # If Bearer failed, try Basic Auth with workspace
-    if not headers or (headers and test_response.status_code != 200):
-        credentials = f"{workspace}:{app_password}"
-        encoded = base64.b64encode(credentials.encode()).decode()
-        headers = {
-            'Authorization': f'Basic {encoded}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        test_response = requests.get(test_url, headers=headers, timeout=10)
+            break
     
     # Final check
     if test_response.status_code == 401:
         print("❌ Authentication failed")
-        if is_repository_access_token:
+        if token_scheme(app_password) == 'bearer':
             print("   ⚠️  Repository Access Token (ATB...) authentication failed")
             print("   Verify token is valid and has required permissions")
         elif not username:
             print("   ⚠️  BITBUCKET_USERNAME not set - required for scoped API tokens")
             print("   Set BITBUCKET_USERNAME to your Bitbucket username (not email)")
-        elif is_atlassian_token:
+        elif app_password.startswith('ATAT'):
             print("   ⚠️  Atlassian tokens (ATATT...) may not work for PR comments")
             print("   💡 Use Repository Access Token (ATB...) instead:")
             print("   Repository Settings → Access tokens")
@@ -150,21 +171,11 @@ def post_summary():
     
     # Delete previous summary comments to prevent email spam
     try:
-        response = requests.get(comments_url, headers=headers)
-        if response.status_code == 200:
-            comments_data = response.json()
-            comments = comments_data.get('values', [])
-            
-            for comment in comments:
-                content = comment.get('content', {}).get('raw', '')
-                if '🤖 AI Code Review Summary' in content:
-                    comment_id = comment.get('id')
-                    if comment_id:
-                        delete_url = f"{api_base}/pullrequests/{pr_id}/comments/{comment_id}"
-                        delete_response = requests.delete(delete_url, headers=headers)
-                        if delete_response.status_code in [200, 204]:
-                            print("🗑️  Deleted previous summary comment")
-                            break
+        targets = [comment_id for comment_id, _ in list_summary_comments(comments_url)]
+        if targets:
+            deleted = asyncio.run(delete_comments(api_base, pr_id, targets))
+            if deleted:
+                print(f"🗑️  Deleted {deleted} previous summary comment(s)")
     except Exception as e:
         print(f"⚠️  Could not delete previous summary: {str(e)}")
     
@@ -175,8 +186,16 @@ def post_summary():
         }
     }
     
+    # Same PR + same summary → same key, so a retried POST can be deduplicated where supported
+    idempotency_key = hashlib.sha256(f"{pr_id}:{summary}".encode()).hexdigest()[:32]
+    
     try:
-        response = requests.post(comments_url, headers=headers, json=comment_data)
+        response = SESSION.post(
+            comments_url,
+            data=orjson.dumps(comment_data),
+            headers={'Idempotency-Key': idempotency_key},
+            timeout=30
+        )
         if response.status_code in [200, 201]:
             print("✅ Posted review summary to PR")
         else:
@@ -185,6 +204,16 @@ def post_summary():
             
             if response.status_code == 401:
                 print("❌ Authentication failed (401). Check BITBUCKET_APP_PASSWORD token and scopes.")
+    except requests.exceptions.Timeout:
+        # The comment may have been created before the timeout
+        print("⚠️  Timed out posting summary; checking whether it was created...")
+        try:
+            if any(raw == summary for _, raw in list_summary_comments(comments_url)):
+                print("✅ Review summary is on the PR")
+            else:
+                print("⚠️  Review summary was not posted")
+        except Exception as e:
+            print(f"⚠️  Could not verify summary: {str(e)}")
     except Exception as e:
         print(f"⚠️  Error posting summary: {str(e)}")
 
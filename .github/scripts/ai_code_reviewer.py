@@ -6,488 +6,55 @@ This script analyzes pull request changes and provides intelligent code review s
 
 import os
 import sys
+import argparse
 import json
+import logging
+import asyncio
+import hashlib
+import tempfile
 import subprocess
 import re
-from typing import List, Dict, Optional
+import time
+import codecs
+import threading
+from collections import Counter
+from typing import List, Dict, Optional, Union
 from dataclasses import dataclass
+import msgspec
+import orjson
 import requests
-from openai import OpenAI
+import tiktoken
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from openai import AsyncOpenAI
 from jira_service import JiraService
 from srs_service import SRSService
 
-@dataclass
-class FileDiff:
-    """Represents a file change in a PR"""
-    filename: str
-    status: str  # added, modified, deleted
-    patch: str
-    additions: int
-    deletions: int
-
-@dataclass
-class ReviewComment:
-    """Represents a code review comment"""
-    file: str
-    line: int
-    comment: str
-    severity: str  # info, warning, error
-
-class AICodeReviewer:
-    """Main class for AI-powered code review"""
-    
-    def __init__(self):
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.github_token = os.getenv('GITHUB_TOKEN')
-        self.pr_number = os.getenv('PR_NUMBER')
-        self.repo_name = os.getenv('REPO_NAME')
-        self.base_sha = os.getenv('BASE_SHA')
-        self.head_sha = os.getenv('HEAD_SHA')
-        self.pr_title = os.getenv('PR_TITLE', '')
-        self.branch_name = os.getenv('BRANCH_NAME', '')
-        
-        if not self.openai_api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is required")
-        
-        # Initialize OpenAI client with timeout (120 seconds for large prompts)
-        self.client = OpenAI(api_key=self.openai_api_key, timeout=120.0)
-        self.review_comments: List[ReviewComment] = []
-        
-        # Initialize JIRA service
-        self.jira_service = JiraService()
-        self.jira_issue = None
-        self.jira_key = None
-        
-        # Initialize SRS service
-        self.srs_service = SRSService()
-        self.srs_context = None
-        
-    def get_pr_diff(self) -> List[FileDiff]:
-        """Get the diff of files changed in the PR"""
-        print("🔍 Fetching PR changes...")
-        
-        # Get list of changed files
-        cmd = f"git diff --name-status {self.base_sha} {self.head_sha}"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        # Get files that were changed in commits with current JIRA key (if available)
-        files_from_jira_commits = set()
-        if self.jira_key:
-            print(f"🔍 Filtering files from commits with JIRA key {self.jira_key}...")
-            # Get commits between base and head that contain the JIRA key in commit message
-            commit_cmd = f"git log {self.base_sha}..{self.head_sha} --pretty=format:%H --grep={self.jira_key} --all-match"
-            commit_result = subprocess.run(commit_cmd, shell=True, capture_output=True, text=True)
-            
-            if commit_result.stdout.strip():
-                commit_hashes = commit_result.stdout.strip().split('\n')
-                print(f"📝 Found {len(commit_hashes)} commit(s) with JIRA key {self.jira_key}")
-                
-                # Get files changed in those commits
-                for commit_hash in commit_hashes:
-                    file_cmd = f"git diff-tree --no-commit-id --name-only -r {commit_hash}"
-                    file_result = subprocess.run(file_cmd, shell=True, capture_output=True, text=True)
-                    for file in file_result.stdout.strip().split('\n'):
-                        if file:
-                            files_from_jira_commits.add(file)
-                
-                if files_from_jira_commits:
-                    print(f"✅ Will review {len(files_from_jira_commits)} file(s) from commits with JIRA key {self.jira_key}")
-            else:
-                # If no commits found with JIRA key, check if branch name or PR title has it
-                # In that case, review all files (might be first commit without JIRA key in message)
-                print(f"⚠️  No commits found with JIRA key {self.jira_key} in commit message")
-                print(f"   Reviewing all files in PR (JIRA key found in branch/PR title)")
-        
-        file_diffs = []
-        for line in result.stdout.strip().split('\n'):
-            if not line:
-                continue
-                
-            parts = line.split('\t')
-            if len(parts) < 2:
-                continue
-                
-            status = parts[0]
-            filename = parts[1]
-            
-            # Skip certain file types
-            if self._should_skip_file(filename):
-                continue
-            
-            # If JIRA key is available, only review files from commits with that JIRA key
-            if self.jira_key:
-                if files_from_jira_commits:
-                    # We have commits with JIRA key - only review files from those commits
-                    if filename not in files_from_jira_commits:
-                        print(f"⏭️  Skipping {filename} (not in commits with JIRA key {self.jira_key})")
-                        continue
-                else:
-                    # No commits found with JIRA key, but JIRA key exists in branch/PR
-                    # Only review files that match the JIRA ticket context
-                    # For SEC-400 (payment), only review payment-related files
-                    if not self._is_file_related_to_jira_ticket(filename):
-                        print(f"⏭️  Skipping {filename} (not related to JIRA ticket {self.jira_key})")
-                        continue
-            
-            # Get the diff for this file
-            diff_cmd = f"git diff {self.base_sha} {self.head_sha} -- {filename}"
-            diff_result = subprocess.run(diff_cmd, shell=True, capture_output=True, text=True)
-            
-            # Only include if there are actual changes (not just whitespace)
-            if not diff_result.stdout.strip() or diff_result.stdout.strip() == '':
-                continue
-            
-            # Count additions and deletions
-            additions = len([l for l in diff_result.stdout.split('\n') if l.startswith('+') and not l.startswith('+++')])
-            deletions = len([l for l in diff_result.stdout.split('\n') if l.startswith('-') and not l.startswith('---')])
-            
-            # Skip if no actual code changes (only metadata)
-            if additions == 0 and deletions == 0:
-                continue
-            
-            file_diffs.append(FileDiff(
-                filename=filename,
-                status=status,
-                patch=diff_result.stdout,
-                additions=additions,
-                deletions=deletions
-            ))
-        
-        return file_diffs
-    
-    def _should_skip_file(self, filename: str) -> bool:
-        """Determine if a file should be skipped from review"""
-        # Always skip these patterns (infrastructure, config, docs, etc.)
-        always_skip_patterns = [
-            # Lock files
-            '.lock', 'package-lock.json', 'yarn.lock',
-            # Minified files
-            '.min.js', '.min.css',
-            # Binary files
-            '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp',
-            '.pdf', '.zip', '.tar', '.gz', '.rar',
-            # Build/dist directories
-            'dist/', 'build/', 'node_modules/', '__pycache__/', '.next/', 'out/',
-            # Environment files
-            '.env', '.env.local', '.env.production', '.env.development',
-            # CI/CD configuration files (not part of feature code)
-            '.github/', '.gitlab-ci.yml', 'bitbucket-pipelines.yml', '.circleci/',
-            # IDE files
-            '.idea/', '.vscode/', '.settings/',
-            # Temporary files
-            '.tmp', '.temp', '.log', '.cache',
-        ]
-        
-        # Skip if matches always-skip patterns
-        if any(pattern in filename for pattern in always_skip_patterns):
-            return True
-        
-        # Skip documentation files (unless in src/ or feature directories)
-        doc_patterns = ['.md', 'README', 'CHANGELOG', 'LICENSE', 'CONTRIBUTING', 'SETUP', 'QUICK_START']
-        if any(pattern in filename for pattern in doc_patterns):
-            # Only review docs if they're in src/ or feature directories
-            if not any(dir in filename for dir in ['src/', 'lib/', 'app/', 'features/', 'docs/']):
-                return True
-        
-        # Skip demo/example files (always skip, they're not production code)
-        filename_lower = filename.lower()
-        demo_patterns = [
-            'demo_', 'demo.', 'demo-', '/demo/',
-            'example_', 'example.', 'example-', '/example/',
-            'sample_', 'sample.', 'sample-', '/sample/'
-        ]
-        if any(pattern in filename_lower for pattern in demo_patterns):
-            return True
-        
-        # Skip scripts/tools outside of src/ (unless they're part of the feature)
-        if filename.startswith('scripts/') or filename.startswith('tools/') or filename.startswith('bin/'):
-            # Only review if they're in src/ or feature directories
-            if not any(dir in filename for dir in ['src/', 'lib/', 'app/', 'features/']):
-                return True
-        
-        # Skip config files outside of src/ or feature directories
-        config_extensions = ['.json', '.yaml', '.yml']
-        if any(filename.endswith(ext) for ext in config_extensions):
-            # Only review if in src/, lib/, app/, or feature directories
-            if not any(dir in filename for dir in ['src/', 'lib/', 'app/', 'features/']):
-                return True
-        
-        return False
-    
-    def _is_file_related_to_jira_ticket(self, filename: str) -> bool:
-        """
-        Check if a file is related to the current JIRA ticket based on ticket summary/description
-        This is a fallback when commit-based filtering doesn't work
-        """
-        if not self.jira_issue:
-            return True  # If no JIRA ticket, review all files
-        
-        jira_summary = self.jira_issue.get('summary', '').lower()
-        jira_description = self.jira_issue.get('description', '').lower()
-        filename_lower = filename.lower()
-        
-        # Extract keywords from JIRA ticket
-        keywords = []
-        if 'payment' in jira_summary or 'payment' in jira_description:
-            keywords.extend(['payment', 'pay', 'transaction', 'refund', 'billing'])
-        if 'login' in jira_summary or 'authentication' in jira_summary or 'auth' in jira_summary:
-            keywords.extend(['login', 'auth', 'authentication', 'session', 'token'])
-        if 'profile' in jira_summary or 'user profile' in jira_summary:
-            keywords.extend(['profile', 'user'])
-        
-        # Check if filename contains any relevant keywords
-        if keywords:
-            if any(keyword in filename_lower for keyword in keywords):
-                return True
-            # If no keywords match, it's probably not related
-            return False
-        
-        # If we can't determine, be conservative and review it
-        return True
-    
-    def _filter_out_of_scope_files(self, out_of_scope_files: set) -> set:
-        """
-        Filter out files that are actually in scope based on JIRA ticket context.
-        This prevents false positives where authentication-related files are flagged as out-of-scope.
-        """
-        if not self.jira_issue:
-            return out_of_scope_files
-        
-        jira_summary = self.jira_issue.get('summary', '').lower()
-        jira_description = self.jira_issue.get('description', '').lower()
-        
-        # Check if ticket is about authentication/login
-        auth_keywords = ['login', 'authentication', 'auth', 'session', 'token', 'password', 'user login']
-        is_auth_ticket = any(keyword in jira_summary or keyword in jira_description for keyword in auth_keywords)
-        
-        if not is_auth_ticket:
-            return out_of_scope_files
-        
-        # Files that are clearly in scope for authentication tickets
-        in_scope_patterns = [
-            'login', 'auth', 'authentication', 'session', 'token', 'password',
-            'middleware', 'service', 'controller', 'route', 'model'
-        ]
-        
-        # Files that are clearly out of scope (CI/CD, docs, demos)
-        always_out_of_scope = [
-            '.github/', '.gitlab/', 'bitbucket-pipelines',
-            'demo_', 'example_', 'test_', '_test.', '.test.',
-            'README', 'CHANGELOG', 'LICENSE', '.md',
-            'package.json', 'requirements.txt', 'Dockerfile',
-            'docker-compose', '.config', '.yml', '.yaml'
-        ]
-        
-        filtered = set()
-        for file in out_of_scope_files:
-            file_lower = file.lower()
-            
-            # Always include files that are clearly out of scope
-            if any(pattern in file_lower for pattern in always_out_of_scope):
-                filtered.add(file)
-            # Exclude files that match in-scope patterns for auth tickets
-            elif any(pattern in file_lower for pattern in in_scope_patterns):
-                # This file is likely in scope, don't include it
-                continue
-            else:
-                # Keep other files as potentially out of scope
-                filtered.add(file)
-        
-        return filtered
-    
-    def _extract_code_snippet(self, file_content: str, line_number: Optional[int], context: int = 2) -> Optional[str]:
-        """Return code snippet with line numbers around the specified line."""
-        if not isinstance(line_number, int):
-            return None
-        lines = file_content.splitlines()
-        if line_number < 1 or line_number > len(lines):
-            return None
-
-        start = max(line_number - 1 - context, 0)
-        end = min(line_number + context, len(lines))
-        snippet_lines = []
-        for idx in range(start, end):
-            pointer = ">" if (idx + 1) == line_number else " "
-            snippet_lines.append(f"{idx + 1:04d}{pointer} {lines[idx].rstrip()}")
-        return "\n".join(snippet_lines)
-
-    def _build_jira_context(self) -> str:
-        """Build JIRA context string for AI prompt"""
-        if not self.jira_issue:
-            return ""
-        
-        # Build subtasks section if present
-        subtasks = self.jira_issue.get('subtasks', [])
-        subtasks_section = ""
-        if subtasks:
-            subtasks_section = "\n**Subtasks:**\n"
-            for subtask in subtasks:
-                subtask_key = subtask.get('key', 'N/A')
-                subtask_summary = subtask.get('summary', 'N/A')
-                subtasks_section += f"- **{subtask_key}**: {subtask_summary}\n"
-        
-        context = f"""
-## JIRA TICKET CONTEXT
-
-**JIRA Issue:** {self.jira_key}
-**Summary:** {self.jira_issue.get('summary', 'N/A')}
-{subtasks_section}
-**Description:**
-{self.jira_issue.get('description', 'No description provided')}
-
-**Acceptance Criteria:**
-{self.jira_issue.get('acceptance_criteria', 'No acceptance criteria specified')}
-
-**JIRA Link:** {self.jira_issue.get('url', '')}
-
----
-"""
-        return context
-    
-    def _build_enhanced_prompt(self, file_diff: FileDiff, file_content: str) -> str:
-        """Build AI prompt with SRS and JIRA context if available"""
-        jira_context = self._build_jira_context()
-        srs_context = self.srs_context or ""
-        
-        # Get list of all changed files for scope check
-        changed_files = [fd.filename for fd in getattr(self, '_all_file_diffs', [])]
-        
-        # Calculate total PR size across all files
-        total_additions = sum(fd.additions for fd in getattr(self, '_all_file_diffs', []))
-        total_deletions = sum(fd.deletions for fd in getattr(self, '_all_file_diffs', []))
-        total_changes = total_additions + total_deletions
-        
-        # PR size warning
-        pr_size_warning = ""
-        if len(changed_files) > 10 or total_changes > 500:
-            pr_size_warning = "\n⚠️ **PR SIZE WARNING**: This PR is large. Consider breaking it into smaller, focused PRs for easier review."
-        
-        # Build base prompt
-        prompt = f"""You are a senior code reviewer with 10+ years of experience. Review the following code changes with the rigor and standards expected from a team lead or principal engineer. Provide constructive, specific, and actionable feedback.
-
-{srs_context if srs_context else ""}
-{jira_context if jira_context else ""}
-
-## CODE CHANGES
-
-**File:** {file_diff.filename}
-**Status:** {file_diff.status}
-**Changes:** +{file_diff.additions} -{file_diff.deletions}
-
-**All Changed Files in PR:** ({len(changed_files)} files)
-{chr(10).join(f"- {f}" for f in changed_files)}
-
-**PR Size Analysis:**
-- Total files changed: {len(changed_files)}
-- Total lines added: {total_additions}
-- Total lines deleted: {total_deletions}
-- Total changes: {total_changes} lines{pr_size_warning}
-
-**DIFF:**
-{file_diff.patch}
-
-**FULL FILE CONTENT:**
-{file_content[:8000]}  # Limited to 8k chars for faster processing
-
-## REVIEW REQUIREMENTS
-
-"""
-        
-        # Add SRS-specific requirements if SRS is available
-        if srs_context:
-            prompt += """
-**CRITICAL: Code must align with SRS requirements**
-
-1. **SRS Compliance** (HIGHEST PRIORITY):
-   - ✅ Verify implementation matches SRS specifications
-   - ✅ Check all functional requirements from SRS are met
-   - ✅ Verify non-functional requirements (performance, security, scalability) are addressed
-   - ❌ Flag any deviations from SRS requirements
-   - ❌ Flag missing implementations required by SRS
-   - ⚠️  Highlight any assumptions or interpretations that differ from SRS
-
-2. **Architecture Alignment**:
-   - Verify code follows architectural patterns specified in SRS
-   - Check system design aligns with SRS architecture diagrams/descriptions
-   - Flag any architectural violations
-
-3. **Domain Knowledge**:
-   - Use SRS context to understand business rules and domain logic
-   - Verify business logic implementation matches SRS requirements
-   - Flag incorrect business rule implementations
+logger = logging.getLogger("ai-review")
 
-"""
-        
-        # Add JIRA-specific requirements if JIRA ticket is available
-        if self.jira_issue:
-            subtasks = self.jira_issue.get('subtasks', [])
-            has_subtasks = len(subtasks) > 0
-            
-            prompt += f"""
-**CRITICAL: This code must be evaluated against JIRA ticket {self.jira_key}**
-
-1. **Requirement Compliance** (HIGHEST PRIORITY):
-   - ✅ Verify implementation matches JIRA description
-   - ✅ Check all acceptance criteria are met
-   - ❌ Flag any missing acceptance criteria
-   - ❌ Flag any out-of-scope changes
-   - ⚠️  Highlight files changed that are unrelated to JIRA scope
-
-2. **Scope Validation**:
-   - Review if ALL changed files are relevant to JIRA ticket {self.jira_key}
-   - **IMPORTANT**: Files related to the ticket topic ARE IN SCOPE. For example:
-     * For login/authentication tickets: controllers, services, middleware, routes, models, utils related to auth ARE IN SCOPE
-     * Files with names containing: login, auth, authentication, session, token, password, user (when related to auth) ARE IN SCOPE
-     * Only flag files as out-of-scope if they are clearly unrelated (e.g., documentation updates, CI/CD configs, demo files, unrelated features)
-   - Flag any files that seem completely unrelated to the ticket requirements
-   - Ensure no accidental changes to unrelated functionality
-   - **DO NOT flag authentication-related files (controllers, services, middleware) as out-of-scope for authentication tickets**
+_DIFF_HEADER_RE = re.compile(r'^(diff --git .*)\n', re.M)
+_HUNK_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@', re.M)
 
-3. **Acceptance Criteria Checklist**:
-   - Create a checklist showing which acceptance criteria are met
-   - Clearly mark any missing or incomplete criteria
-   - Provide specific line references where criteria are implemented
-   - Treat description as the primary source of acceptance criteria
+_FILE_NOT_ACCESSIBLE = "File not accessible or was deleted"
+_FILE_CONTENT_TOKEN_BUDGET = 3000
+# Upper bound on how much of a changed file is read, in bytes; anything past it is a generated/vendored blob
+_FILE_READ_LIMIT = 512 * 1024
+# Below this share of changed lines the diff alone is sent, without the surrounding file content
+_DIFF_ONLY_CHANGE_RATIO = 0.2
+# Token budget left over after the hunk windows is spent on the top of the file, if at least this much remains
+_FILE_HEAD_MIN_TOKENS = 200
 
-"""
-            
-            # Add subtask coverage if subtasks exist
-            if has_subtasks:
-                prompt += f"""4. **Subtask Coverage** (🧾):
-   - Verify implementation covers ALL subtasks:
-"""
-                for subtask in subtasks:
-                    subtask_key = subtask.get('key', '')
-                    subtask_summary = subtask.get('summary', '')
-                    prompt += f"     - **{subtask_key}**: {subtask_summary}\n"
-                prompt += """   - Check if each subtask requirement is addressed in the code
-   - Flag any subtasks that are not implemented
-   - Provide evidence of subtask implementation (file/line references)
+# Review rubric and output schema shared by every file's prompt. It is sent as the first user
+# message (right after the system message) so OpenAI's automatic prompt caching can reuse it.
+STATIC_INSTRUCTIONS = """You are a senior code reviewer with 10+ years of experience. Review the following code changes with the rigor and standards expected from a team lead or principal engineer. Provide constructive, specific, and actionable feedback.
 
-"""
-                prompt += """5. **Testing Requirements**:
-"""
-            else:
-                prompt += """4. **Testing Requirements**:
-"""
-            
-            prompt += """   - If business logic changed and no tests were added: ⚠️ WARN explicitly
-   - Verify test coverage for new functionality
-   - Check if acceptance criteria are testable
-   - Apply stricter validation if JIRA summary or subtasks imply backend-critical changes
+## REVIEW STANDARDS
 
-6. **Quality Enforcement**:
-   - Warn if files changed are not aligned with JIRA scope
-   - Flag business logic changes without corresponding tests
-   - Apply stricter checks for critical backend changes
-"""
-        else:
-            prompt += """
 Please provide a detailed code review focusing on:
-"""
-        
-        # Standard review categories
-        prompt += """
+
 6. **Code Quality**: Best practices, clean code principles, maintainability
 7. **Potential Bugs**: Logic errors, edge cases, null pointer issues
 8. **Security**: Vulnerabilities, injection risks, authentication/authorization issues
@@ -526,402 +93,1235 @@ Please provide a detailed code review focusing on:
    - Remove unused functions, classes, and modules
    - Flag unused parameters in function signatures
 
-30. **Commented-Out Code**:
-   - **CRITICAL**: Never commit commented-out code
-   - Flag commented JSX, API logic, SQL queries, or any commented code blocks
-   - Suggest using Git history or feature flags instead of commented code
-   - Remove commented debugging code, TODO comments with old code, or experimental code
+30. **Commented-Out Code**:
+   - **CRITICAL**: Never commit commented-out code
+   - Flag commented JSX, API logic, SQL queries, or any commented code blocks
+   - Suggest using Git history or feature flags instead of commented code
+   - Remove commented debugging code, TODO comments with old code, or experimental code
+
+31. **Hard-Coded Values & Configuration**:
+   - **CRITICAL**: Move all hard-coded values to config/environment files
+   - Flag hard-coded API URLs, endpoints, or service URLs (should be in config)
+   - Flag hard-coded constants, magic numbers, or feature flags (should be configurable)
+   - Flag hard-coded environment-specific values (dev/staging/prod URLs)
+   - Enforce use of environment variables (.env files) or configuration modules
+   - Never allow hard-coded secrets, tokens, or database credentials (covered in secrets check)
+
+32. **Method/Function Signature Quality**:
+   - React: Verify components have clear, well-named props
+   - Flag components with excessive props (suggest using objects/context)
+   - Backend: Verify API endpoints have explicit request/response schemas
+   - Flag missing request payload validation (should use DTOs/Pydantic models)
+   - Ensure return types are predictable and consistent
+   - Flag functions with unclear parameter names or too many parameters
+   - Verify function signatures are self-documenting
+
+33. **Semantic Logic & Business Rules**:
+   - **CRITICAL**: Ensure UI logic reflects backend business rules
+   - Flag business logic embedded directly in React components (should be in backend/services)
+   - Verify validation and business rules are centralized in backend services
+   - Check conditional logic is readable and intention-revealing
+   - Flag complex business logic in frontend that should be server-side
+   - Ensure business rules are consistent between frontend and backend
+
+34. **Performance - Loops, Rendering, and Database**:
+   - **CRITICAL**: Optimize loops, rendering, and database calls
+   - React Performance:
+     * Flag unnecessary re-renders (check dependency arrays in useEffect/useMemo/useCallback)
+     * Flag missing memoization where expensive computations occur
+     * Flag loops inside render that perform heavy logic
+     * Verify useMemo/useCallback are used appropriately (not overused)
+   - Database Performance:
+     * **CRITICAL**: Flag database queries inside for loops (use bulk operations instead)
+     * Prefer bulk inserts, joins, IN queries, and set-based operations
+     * Flag N+1 query problems (use eager loading or batch queries)
+     * Verify indexes exist for frequently filtered columns
+     * Flag sequential await calls in loops when parallel execution is safe
+     * Check for missing database query optimization
+
+35. **Promises & Async Handling**:
+   - **CRITICAL**: Proper async/await and promise handling
+   - Node.js:
+     * Flag wrapping synchronous logic inside new Promise() (unnecessary)
+     * Use async/await consistently (avoid mixing with .then())
+     * Flag sequential await calls in loops when parallel execution is safe (use Promise.all)
+     * Always handle Promise rejections (missing .catch() or try/catch)
+     * Flag unhandled promise rejections
+   - FastAPI/Python:
+     * Use async endpoints only when I/O-bound operations exist
+     * Flag blocking calls inside async routes
+     * Ensure DB sessions are properly closed or scoped
+     * Verify proper async context management
+
+36. **Code Formatting & Indentation**:
+   - React: Maintain consistent JSX indentation and component structure
+   - Flag deeply nested JSX (suggest breaking into smaller components)
+   - Backend: Follow language-specific formatting standards
+   - Ensure consistent indentation for conditionals, loops, and transactions
+   - Flag inconsistent spacing, bracket placement, or indentation
+
+37. **Security - Frontend & Backend**:
+   - Frontend Security:
+     * **CRITICAL**: Never trust client-side validation alone (always validate server-side)
+     * Flag sensitive values exposed in browser logs, console.log, or source code
+     * Verify proper input sanitization before rendering
+     * Check for XSS vulnerabilities in dynamic content rendering
+   - Backend Security (enhanced):
+     * Validate and sanitize all user inputs (covered, but emphasize)
+     * Prevent SQL injection using ORM query bindings (covered)
+     * Enforce authentication and authorization on every protected route (covered)
+     * Ensure proper CORS configuration
+     * Do not leak internal errors or stack traces (covered in error_leakage)
+
+38. **Logging, Error Handling & Testing**:
+   - Use structured and meaningful logs (covered in logging standards)
+   - Avoid logging sensitive data (covered in PII check)
+   - Ensure graceful error handling with clear API responses (covered)
+   - **CRITICAL**: Validate unit tests exist for:
+     * Services and business logic
+     * API endpoints
+     * Critical UI flows/components
+   - Add integration tests for complex database interactions
+   - Flag missing test coverage for new functionality
+
+## ADDITIONAL SENIOR REVIEWER STANDARDS
+
+**HIGH PRIORITY CHECKS:**
+
+13. **Code Style & Consistency**:
+   - Check code formatting consistency (indentation, spacing, brackets)
+   - Validate naming conventions (camelCase, PascalCase, snake_case, kebab-case) match project standards
+   - Verify file organization and structure follows project conventions
+   - Check import/require ordering and grouping
+   - Flag inconsistent coding styles across files
+   - Ensure code follows language-specific style guides (ESLint, Prettier, PEP 8, etc.)
+
+14. **Documentation Requirements**:
+   - Verify functions/classes have proper documentation (JSDoc, docstrings, JavaDoc)
+   - Check for inline comments explaining complex logic or business rules
+   - Flag missing documentation for public APIs, classes, and complex functions
+   - Ensure README/documentation is updated for new features
+   - Check that code examples in documentation are accurate
+   - Verify parameter and return type documentation
+
+15. **Error Handling & Resilience**:
+   - **CRITICAL**: Flag swallowed exceptions (empty catch blocks that ignore errors)
+   - Flag overly generic exception handling (catch (Exception) or catch (Error) without specific handling)
+   - Check for inconsistent error propagation (some errors logged, others not)
+   - Verify correct HTTP status codes for API responses (200 for success, 400 for client errors, 500 for server errors)
+   - Flag missing fallback logic for critical operations
+   - Ensure errors are caught and handled appropriately (try-catch, promises, async/await)
+   - Check for unhandled promise rejections
+   - Verify graceful degradation when errors occur
+   - Flag generic catch blocks that swallow errors without logging
+   - Validate error messages are user-friendly and informative (not exposing internals)
+
+16. **Observability & Operability**:
+   - **CRITICAL**: Check for missing or noisy logging (too many logs or no logs at all)
+   - Verify appropriate log levels are used (DEBUG, INFO, WARN, ERROR)
+   - Flag missing correlation IDs / trace IDs for request tracking
+   - Check for missing metrics for critical paths (success/failure rates, latency)
+   - Flag missing health checks for new components/services
+   - Verify feature flags are used for risky changes (not hard-coded)
+   - Verify structured logging format (JSON, key-value pairs)
+   - Ensure sensitive data (passwords, tokens, PII) is NOT logged
+   - Check log messages are meaningful and include context
+   - Verify performance-critical operations are logged
+   - Flag console.log statements in production code (should use proper logger)
+   - Check logging doesn't create performance bottlenecks
+
+17. **Architecture Alignment**:
+   - Verify code follows existing architectural patterns in the codebase
+   - Check separation of concerns (business logic, data access, presentation)
+   - Validate dependency direction (high-level modules shouldn't depend on low-level)
+   - Ensure code fits the overall system architecture
+   - Check for architectural violations (circular dependencies, tight coupling)
+   - Verify adherence to SOLID principles
+   - Flag code that doesn't align with existing patterns
+
+**MEDIUM PRIORITY CHECKS:**
+
+18. **API Design & Contract Consistency**:
+   - **CRITICAL**: Flag breaking API changes without versioning
+   - Check for backward compatibility issues (removed fields, changed types, etc.)
+   - Verify consistent request/response shapes across similar endpoints
+   - Flag missing validation annotations (required fields, data types, constraints)
+   - Check for DTO vs domain leakage (domain objects exposed directly in API responses)
+   - Flag incorrect default values in API responses or request handling
+   - Validate RESTful API conventions (HTTP methods, status codes, URLs)
+   - Check API versioning strategy is followed
+   - Verify request/response validation
+   - Ensure consistent API response format (success/error structure)
+   - Check API documentation is complete and accurate
+   - Verify proper HTTP status codes are used (200, 201, 400, 401, 404, 500, etc.)
+   - Flag missing input validation on API endpoints
+   - Check rate limiting is properly implemented
+   - Verify API endpoints follow naming conventions
+
+19. **Database Query Optimization**:
+   - Check for N+1 query problems
+   - Verify proper use of database indexes
+   - Flag inefficient queries (full table scans, missing WHERE clauses)
+   - Check for SQL injection vulnerabilities (parameterized queries)
+   - Verify transaction management is correct
+   - Check connection pooling is used appropriately
+   - Flag queries that fetch unnecessary data (SELECT *)
+   - Verify database queries are optimized (EXPLAIN plans)
+   - Check for missing indexes on frequently queried columns
+
+20. **Concurrency & Thread Safety**:
+   - **CRITICAL**: Check for race conditions in multi-threaded code
+   - Verify thread safety (locks, mutexes, atomic operations)
+   - Check for deadlock potential
+   - Flag shared mutable state without proper synchronization
+   - Flag non-thread-safe collections used in concurrent contexts (e.g., ArrayList in Java, regular dict in Python)
+   - Check for proper handling of concurrent requests
+   - Validate async/await patterns are used correctly
+   - Verify promise/async error handling
+   - Check for memory leaks in async operations
+   - Flag improper use of async/await that could cause race conditions
+
+21. **Memory & Resource Management**:
+   - Check for memory leaks (unclosed connections, event listeners, timers)
+   - Verify resource cleanup (file handles, database connections, streams)
+   - Check for proper disposal of resources (using statements, finally blocks)
+   - Flag unbounded data structures that could cause memory issues
+   - Verify large objects are properly released
+   - Check for circular references that prevent garbage collection
+   - Verify streaming/chunking for large data processing
 
-31. **Hard-Coded Values & Configuration**:
-   - **CRITICAL**: Move all hard-coded values to config/environment files
-   - Flag hard-coded API URLs, endpoints, or service URLs (should be in config)
-   - Flag hard-coded constants, magic numbers, or feature flags (should be configurable)
-   - Flag hard-coded environment-specific values (dev/staging/prod URLs)
-   - Enforce use of environment variables (.env files) or configuration modules
-   - Never allow hard-coded secrets, tokens, or database credentials (covered in secrets check)
+22. **PR Quality Checks**:
+   - Check PR size (flag if too large - suggest breaking into smaller PRs)
+   - Verify PR description is clear and includes:
+     * What changes were made
+     * Why the changes were made
+     * How to test the changes
+     * Screenshots/demos if UI changes
+   - Check commit messages follow conventions (conventional commits)
+   - Verify branch naming follows standards
+   - Flag PRs that mix unrelated changes
+   - Check if PR addresses a single concern/feature
+   - Verify breaking changes are documented
 
-32. **Method/Function Signature Quality**:
-   - React: Verify components have clear, well-named props
-   - Flag components with excessive props (suggest using objects/context)
-   - Backend: Verify API endpoints have explicit request/response schemas
-   - Flag missing request payload validation (should use DTOs/Pydantic models)
-   - Ensure return types are predictable and consistent
-   - Flag functions with unclear parameter names or too many parameters
-   - Verify function signatures are self-documenting
+**CRITICAL SECURITY & COMPLIANCE CHECKS (SME FEEDBACK):**
 
-33. **Semantic Logic & Business Rules**:
-   - **CRITICAL**: Ensure UI logic reflects backend business rules
-   - Flag business logic embedded directly in React components (should be in backend/services)
-   - Verify validation and business rules are centralized in backend services
-   - Check conditional logic is readable and intention-revealing
-   - Flag complex business logic in frontend that should be server-side
-   - Ensure business rules are consistent between frontend and backend
+23. **Authorization - Object-Level Access Control**:
+   - **CRITICAL**: When endpoints access user/customer/tenant data, verify object-level authorization is enforced
+   - Flag endpoints that query user data without proper authorization checks (e.g., missing WHERE user_id = ? or tenant_id = ?)
+   - Check for authorization middleware/checks before data access operations
+   - Verify that users can only access their own records (not other users' data)
+   - Flag missing authorization checks in:
+     * GET endpoints that return user-specific data
+     * UPDATE/DELETE operations on user records
+     * Any query that filters by user_id, customer_id, tenant_id without validation
+   - Ensure authorization happens server-side, not just client-side
+   - Check for proper role-based access control (RBAC) when applicable
 
-34. **Performance - Loops, Rendering, and Database**:
-   - **CRITICAL**: Optimize loops, rendering, and database calls
-   - React Performance:
-     * Flag unnecessary re-renders (check dependency arrays in useEffect/useMemo/useCallback)
-     * Flag missing memoization where expensive computations occur
-     * Flag loops inside render that perform heavy logic
-     * Verify useMemo/useCallback are used appropriately (not overused)
-   - Database Performance:
-     * **CRITICAL**: Flag database queries inside for loops (use bulk operations instead)
-     * Prefer bulk inserts, joins, IN queries, and set-based operations
-     * Flag N+1 query problems (use eager loading or batch queries)
-     * Verify indexes exist for frequently filtered columns
-     * Flag sequential await calls in loops when parallel execution is safe
-     * Check for missing database query optimization
+24. **External Integrations - Safe Failure Handling**:
+   - **CRITICAL**: All third-party/internal service calls must have proper error handling
+   - Flag external API calls (fetch, axios, http requests) without try/catch blocks
+   - Require meaningful fallback/error responses for external service failures
+   - Check for graceful degradation when external services fail
+   - Flag missing timeout handling for external calls
+   - Verify circuit breaker patterns for critical external dependencies
+   - Check for proper retry logic with exponential backoff
+   - Ensure one dependency failure doesn't break the entire flow
+   - Flag missing error handling for:
+     * Payment gateway calls
+     * Email/SMS service calls
+     * Third-party API integrations
+     * Internal microservice calls
 
-35. **Promises & Async Handling**:
-   - **CRITICAL**: Proper async/await and promise handling
-   - Node.js:
-     * Flag wrapping synchronous logic inside new Promise() (unnecessary)
-     * Use async/await consistently (avoid mixing with .then())
-     * Flag sequential await calls in loops when parallel execution is safe (use Promise.all)
-     * Always handle Promise rejections (missing .catch() or try/catch)
-     * Flag unhandled promise rejections
-   - FastAPI/Python:
-     * Use async endpoints only when I/O-bound operations exist
-     * Flag blocking calls inside async routes
-     * Ensure DB sessions are properly closed or scoped
-     * Verify proper async context management
+25. **Database Correctness & Constraints**:
+   - **CRITICAL**: Flag missing database constraints and optimizations
+   - Check for missing indexes on frequently queried columns (especially in WHERE clauses)
+   - Flag UPDATE/DELETE queries without WHERE clauses (prevents accidental mass updates)
+   - Verify transaction boundaries for multi-step database operations
+   - Check for missing foreign key constraints (if schema context available)
+   - Flag queries that could cause data integrity issues
+   - Verify proper use of database transactions for atomic operations
+   - Check for missing unique constraints on columns that should be unique
+   - Flag N+1 query problems
+   - Verify proper connection pooling usage
+   - **Note**: Full schema validation requires DB schema/migrations in scope (to be enhanced)
 
-36. **Code Formatting & Indentation**:
-   - React: Maintain consistent JSX indentation and component structure
-   - Flag deeply nested JSX (suggest breaking into smaller components)
-   - Backend: Follow language-specific formatting standards
-   - Ensure consistent indentation for conditionals, loops, and transactions
-   - Flag inconsistent spacing, bracket placement, or indentation
+26. **Secrets & Configuration Safety**:
+   - **CRITICAL**: Never allow hardcoded secrets, tokens, or sensitive configuration
+   - Detect and flag hardcoded:
+     * API keys (pattern: api[_-]?key, apikey, secret[_-]?key)
+     * Passwords (password\s*=\s*['\"][^'\"]+)
+     * Tokens (token\s*=\s*['\"][^'\"]+, jwt[_-]?secret)
+     * AWS keys (aws[_-]?(access[_-]?key|secret[_-]?key))
+     * Database credentials (db[_-]?(password|pass|pwd))
+     * OAuth secrets (client[_-]?secret, oauth[_-]?secret)
+     * Connection strings with credentials
+   - Flag environment-specific URLs hardcoded in code:
+     * localhost, 127.0.0.1, staging URLs, production URLs
+   - **CRITICAL**: Flag environment-specific behavior hardcoded (should use config/env)
+   - Check for missing configuration defaults (required configs should have defaults)
+   - Flag unsafe feature toggles (feature flags that could cause security issues)
+   - Verify config values are validated (type, range, required fields)
+   - Flag secrets in config files (should be in environment variables or secret management)
+   - Enforce configuration via environment variables or config layer
+   - Flag feature flags hardcoded in code (should be in config)
+   - Check for secrets in:
+     * Variable assignments
+     * String literals
+     * Configuration objects
+     * Comments (sometimes developers leave secrets in comments)
+   - Verify sensitive configs are not committed in PR
 
-37. **Security - Frontend & Backend**:
-   - Frontend Security:
-     * **CRITICAL**: Never trust client-side validation alone (always validate server-side)
-     * Flag sensitive values exposed in browser logs, console.log, or source code
-     * Verify proper input sanitization before rendering
-     * Check for XSS vulnerabilities in dynamic content rendering
-   - Backend Security (enhanced):
-     * Validate and sanitize all user inputs (covered, but emphasize)
-     * Prevent SQL injection using ORM query bindings (covered)
-     * Enforce authentication and authorization on every protected route (covered)
-     * Ensure proper CORS configuration
-     * Do not leak internal errors or stack traces (covered in error_leakage)
+27. **Sensitive Data & PII Exposure**:
+   - **CRITICAL**: Prevent PII and sensitive data exposure in APIs and logs
+   - Flag unnecessary PII in API responses:
+     * Email addresses (unless required)
+     * Phone numbers (unless required)
+     * PAN numbers (Indian tax ID pattern)
+     * Aadhaar numbers (12-digit pattern)
+     * Full addresses (unless required)
+     * Date of birth
+     * Social Security Numbers (SSN patterns)
+   - Detect and flag sensitive data in logs:
+     * Passwords (password, pwd, passwd in log messages)
+     * Tokens (token, jwt, access_token, refresh_token)
+     * OTP codes (otp, verification[_-]?code)
+     * Credit card numbers (pattern detection)
+     * PAN/Aadhaar numbers
+     * API keys or secrets
+   - Flag storing secrets in plain text anywhere (database, files, variables)
+   - Check for sensitive fields in:
+     * API response objects
+     * Log statements (console.log, logger.info with sensitive data)
+     * Error messages (shouldn't expose internal details)
+     * Debug output
+   - Verify data masking/redaction for sensitive fields in logs
+   - Flag unnecessary sensitive fields returned in GET responses
 
-38. **Logging, Error Handling & Testing**:
-   - Use structured and meaningful logs (covered in logging standards)
-   - Avoid logging sensitive data (covered in PII check)
-   - Ensure graceful error handling with clear API responses (covered)
-   - **CRITICAL**: Validate unit tests exist for:
-     * Services and business logic
-     * API endpoints
-     * Critical UI flows/components
-   - Add integration tests for complex database interactions
-   - Flag missing test coverage for new functionality
+28. **Error Handling - No Internal Leakage**:
+   - **CRITICAL**: Ensure error responses don't leak internal system details
+   - Flag raw exception messages sent to clients (error.message, error.stack)
+   - Check for stack traces in API responses
+   - Verify detailed error objects are not exposed to end users
+   - Flag database error messages exposed to clients (should be sanitized)
+   - Ensure error responses are user-friendly and don't reveal:
+     * Stack traces
+     * File paths
+     * Database connection strings
+     * Internal system architecture
+     * Code structure or variable names
+   - Verify error logging happens server-side (detailed errors in logs, not responses)
+   - Check for proper error sanitization before sending to client
 
-## ADDITIONAL SENIOR REVIEWER STANDARDS
+## OUTPUT FORMAT
 
-**HIGH PRIORITY CHECKS:**
+Format your response as JSON with the following structure:
+{
+  "overall_assessment": "Brief summary of the changes and compliance with JIRA requirements",
+  "severity": "info|warning|critical",
+  "jira_compliance": {
+    "matches_requirements": true/false,
+    "missing_criteria": ["List of missing acceptance criteria"],
+    "out_of_scope_files": ["List of files not related to JIRA ticket"],
+    "acceptance_criteria_checklist": [
+      {"criteria": "Criterion text", "status": "✅ Met | ❌ Missing | ⚠️ Partial", "evidence": "Line references"}
+    ],
+    "subtask_coverage": [
+      {"subtask_key": "H30-XXXXX", "status": "✅ Covered | ❌ Missing | ⚠️ Partial", "evidence": "File/line references"}
+    ],
+    "final_verdict": "Approve | Changes Requested"
+  },
+  "issues": [
+    {
+      "line": <line_number or null>,
+      "severity": "info|warning|error",
+      "category": "requirement|quality|bug|security|performance|boilerplate|design|testing|scope|style|documentation|error_handling|logging|architecture|api|database|concurrency|memory|pr_quality|authorization|external_integration|db_constraints|secrets|pii|error_leakage|duplication|unused_code|commented_code|hardcoded_values|signature|business_logic|async_handling|formatting|frontend_security|test_coverage|insecure_defaults|crypto|input_validation|unbounded_loops|inefficient_data_structures|caching|swallowed_exceptions|error_propagation|thread_safety|api_contract|observability|config_safety",
+      "title": "Brief issue title",
+      "description": "Detailed explanation",
+      "suggestion": "Specific recommendation or code example"
+    }
+  ],
+  "positive_aspects": ["List of good practices found in the code"]
+}
 
-13. **Code Style & Consistency**:
-   - Check code formatting consistency (indentation, spacing, brackets)
-   - Validate naming conventions (camelCase, PascalCase, snake_case, kebab-case) match project standards
-   - Verify file organization and structure follows project conventions
-   - Check import/require ordering and grouping
-   - Flag inconsistent coding styles across files
-   - Ensure code follows language-specific style guides (ESLint, Prettier, PEP 8, etc.)
+**IMPORTANT:**
+- If acceptance criteria are missing or violated, mark severity as "error" and set final_verdict to "Changes Requested"
+- **SCOPE DETECTION RULES**: 
+  * For authentication/login tickets: Files in paths like `src/controllers/*login*`, `src/services/*auth*`, `src/middleware/*auth*`, `src/routes/*auth*` ARE IN SCOPE
+  * Only flag files as out-of-scope if they are clearly unrelated (CI/CD configs, documentation, demo files, unrelated features)
+  * DO NOT flag authentication-related code files as out-of-scope for authentication tickets
+- If files are out of scope, create issues with category "scope"
+- If subtasks are not covered, mark them as "❌ Missing" in subtask_coverage
+- Be specific about which acceptance criteria are met/missing
+- Provide line references for requirement implementation
+- If business logic changed without tests, create a "testing" issue with severity "warning"
+- Set final_verdict to "Changes Requested" if any requirements are missing or incorrect
+- Set final_verdict to "Approve" only if all requirements are met
+
+**OUTPUT FORMAT (Strict Markdown Structure):**
+Your response must include these sections in markdown:
+- ✅ Matches JIRA Requirements
+- ❌ Missing / Incorrect Implementation  
+- ⚠️ Suggestions / Improvements
+- 📋 Acceptance Criteria Checklist
+- 🧾 Subtask Coverage (if subtasks exist)
+- 🔚 Final Verdict (Approve / Changes Requested)
 
-14. **Documentation Requirements**:
-   - Verify functions/classes have proper documentation (JSDoc, docstrings, JavaDoc)
-   - Check for inline comments explaining complex logic or business rules
-   - Flag missing documentation for public APIs, classes, and complex functions
-   - Ensure README/documentation is updated for new features
-   - Check that code examples in documentation are accurate
-   - Verify parameter and return type documentation
+Be constructive, specific, and helpful. Focus on meaningful improvements."""
 
-15. **Error Handling & Resilience**:
-   - **CRITICAL**: Flag swallowed exceptions (empty catch blocks that ignore errors)
-   - Flag overly generic exception handling (catch (Exception) or catch (Error) without specific handling)
-   - Check for inconsistent error propagation (some errors logged, others not)
-   - Verify correct HTTP status codes for API responses (200 for success, 400 for client errors, 500 for server errors)
-   - Flag missing fallback logic for critical operations
-   - Ensure errors are caught and handled appropriately (try-catch, promises, async/await)
-   - Check for unhandled promise rejections
-   - Verify graceful degradation when errors occur
-   - Flag generic catch blocks that swallow errors without logging
-   - Validate error messages are user-friendly and informative (not exposing internals)
+# Review requirements added to the prompt when SRS documents are available
+_SRS_REQUIREMENTS = """
+**CRITICAL: Code must align with SRS requirements**
 
-16. **Observability & Operability**:
-   - **CRITICAL**: Check for missing or noisy logging (too many logs or no logs at all)
-   - Verify appropriate log levels are used (DEBUG, INFO, WARN, ERROR)
-   - Flag missing correlation IDs / trace IDs for request tracking
-   - Check for missing metrics for critical paths (success/failure rates, latency)
-   - Flag missing health checks for new components/services
-   - Verify feature flags are used for risky changes (not hard-coded)
-   - Verify structured logging format (JSON, key-value pairs)
-   - Ensure sensitive data (passwords, tokens, PII) is NOT logged
-   - Check log messages are meaningful and include context
-   - Verify performance-critical operations are logged
-   - Flag console.log statements in production code (should use proper logger)
-   - Check logging doesn't create performance bottlenecks
+1. **SRS Compliance** (HIGHEST PRIORITY):
+   - ✅ Verify implementation matches SRS specifications
+   - ✅ Check all functional requirements from SRS are met
+   - ✅ Verify non-functional requirements (performance, security, scalability) are addressed
+   - ❌ Flag any deviations from SRS requirements
+   - ❌ Flag missing implementations required by SRS
+   - ⚠️  Highlight any assumptions or interpretations that differ from SRS
 
-17. **Architecture Alignment**:
-   - Verify code follows existing architectural patterns in the codebase
-   - Check separation of concerns (business logic, data access, presentation)
-   - Validate dependency direction (high-level modules shouldn't depend on low-level)
-   - Ensure code fits the overall system architecture
-   - Check for architectural violations (circular dependencies, tight coupling)
-   - Verify adherence to SOLID principles
-   - Flag code that doesn't align with existing patterns
+2. **Architecture Alignment**:
+   - Verify code follows architectural patterns specified in SRS
+   - Check system design aligns with SRS architecture diagrams/descriptions
+   - Flag any architectural violations
 
-**MEDIUM PRIORITY CHECKS:**
+3. **Domain Knowledge**:
+   - Use SRS context to understand business rules and domain logic
+   - Verify business logic implementation matches SRS requirements
+   - Flag incorrect business rule implementations
 
-18. **API Design & Contract Consistency**:
-   - **CRITICAL**: Flag breaking API changes without versioning
-   - Check for backward compatibility issues (removed fields, changed types, etc.)
-   - Verify consistent request/response shapes across similar endpoints
-   - Flag missing validation annotations (required fields, data types, constraints)
-   - Check for DTO vs domain leakage (domain objects exposed directly in API responses)
-   - Flag incorrect default values in API responses or request handling
-   - Validate RESTful API conventions (HTTP methods, status codes, URLs)
-   - Check API versioning strategy is followed
-   - Verify request/response validation
-   - Ensure consistent API response format (success/error structure)
-   - Check API documentation is complete and accurate
-   - Verify proper HTTP status codes are used (200, 201, 400, 401, 404, 500, etc.)
-   - Flag missing input validation on API endpoints
-   - Check rate limiting is properly implemented
-   - Verify API endpoints follow naming conventions
+"""
 
-19. **Database Query Optimization**:
-   - Check for N+1 query problems
-   - Verify proper use of database indexes
-   - Flag inefficient queries (full table scans, missing WHERE clauses)
-   - Check for SQL injection vulnerabilities (parameterized queries)
-   - Verify transaction management is correct
-   - Check connection pooling is used appropriately
-   - Flag queries that fetch unnecessary data (SELECT *)
-   - Verify database queries are optimized (EXPLAIN plans)
-   - Check for missing indexes on frequently queried columns
+def _any_of(patterns, flags=0) -> re.Pattern:
+    """Compile literal substrings into one alternation so a path is scanned once"""
+    return re.compile('|'.join(map(re.escape, patterns)), flags)
+
+# Files that are never reviewed (substring match)
+_ALWAYS_SKIP_RE = _any_of([
+    # Lock files
+    '.lock', 'package-lock.json', 'yarn.lock',
+    # Minified files
+    '.min.js', '.min.css',
+    # Binary files
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp',
+    '.pdf', '.zip', '.tar', '.gz', '.rar',
+    # Build/dist directories
+    'dist/', 'build/', 'node_modules/', '__pycache__/', '.next/', 'out/',
+    # Environment files
+    '.env', '.env.local', '.env.production', '.env.development',
+    # CI/CD configuration files (not part of feature code)
+    '.github/', '.gitlab-ci.yml', 'bitbucket-pipelines.yml', '.circleci/',
+    # IDE files
+    '.idea/', '.vscode/', '.settings/',
+    # Temporary files
+    '.tmp', '.temp', '.log', '.cache',
+])
+# Documentation is only reviewed inside source/feature/docs directories
+_DOC_RE = _any_of(['.md', 'README', 'CHANGELOG', 'LICENSE', 'CONTRIBUTING', 'SETUP', 'QUICK_START'])
+_DOC_DIR_RE = _any_of(['src/', 'lib/', 'app/', 'features/', 'docs/'])
+_FEATURE_DIR_RE = _any_of(['src/', 'lib/', 'app/', 'features/'])
+# Demo/example/sample files, matched case-insensitively
+_DEMO_RE = _any_of([
+    'demo_', 'demo.', 'demo-', '/demo/',
+    'example_', 'example.', 'example-', '/example/',
+    'sample_', 'sample.', 'sample-', '/sample/'
+], re.IGNORECASE)
+# Pathspecs for the subset of the above that git can exclude itself (each one is also skipped by
+# _should_skip_file, so this only saves work and never changes which files get reviewed)
+_GIT_EXCLUDES = tuple(f":(top,exclude,glob){pattern}" for pattern in (
+    '**/*.lock', '**/package-lock.json',
+    '**/*.min.js', '**/*.min.css',
+    '**/*.png', '**/*.jpg', '**/*.jpeg', '**/*.gif', '**/*.svg', '**/*.ico', '**/*.webp',
+    '**/*.pdf', '**/*.zip', '**/*.tar', '**/*.gz', '**/*.rar',
+    '**/dist/**', '**/build/**', '**/node_modules/**', '**/__pycache__/**', '**/.next/**',
+    '.github/**', '**/.circleci/**', '**/.idea/**', '**/.vscode/**',
+))
+_SCRIPT_DIRS = ('scripts/', 'tools/', 'bin/')
+
+# Out-of-scope filtering for authentication tickets (see _filter_out_of_scope_files)
+_AUTH_TICKET_RE = _any_of(['login', 'authentication', 'auth', 'session', 'token', 'password', 'user login'])
+# Files that are clearly in scope for authentication tickets, matched against the lowercased path
+_AUTH_IN_SCOPE_RE = _any_of([
+    'login', 'auth', 'authentication', 'session', 'token', 'password',
+    'middleware', 'service', 'controller', 'route', 'model'
+])
+# Files that are clearly out of scope (CI/CD, docs, demos), matched case-insensitively
+_ALWAYS_OUT_OF_SCOPE_RE = _any_of([
+    '.github/', '.gitlab/', 'bitbucket-pipelines',
+    'demo_', 'example_', 'test_', '_test.', '.test.',
+    'README', 'CHANGELOG', 'LICENSE', '.md',
+    'package.json', 'requirements.txt', 'Dockerfile',
+    'docker-compose', '.config', '.yml', '.yaml'
+], re.IGNORECASE)
+
+_CONFIG_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+# Generated files (test snapshots, protobuf/codegen output) are listed in the PR context but not sent for review
+_GENERATED_SUFFIXES = ('.snap', '_pb2.py', '_pb2_grpc.py', '.pb.go', '.g.dart', '.designer.cs')
+# Added lines that carry no reviewable logic: blank lines and imports/includes
+_LOW_SIGNAL_LINE_RE = re.compile(
+    r'\s*(?:$|import\s|from\s+\S+\s+import\s|#include\s|using\s+[\w.]+;|(?:const|let|var)\s+\w+\s*=\s*require\()'
+)
+# A diff of at least this many added lines that are (almost) all low-signal lines is not sent for review
+_LOW_SIGNAL_MIN_LINES = 20
+_LOW_SIGNAL_RATIO = 0.9
+
+# Emoji shown for an issue's category and severity in inline comments
+_CATEGORY_EMOJI = MappingProxyType({
+    'quality': '🎨',
+    'bug': '🐛',
+    'security': '🔒',
+    'performance': '⚡',
+    'boilerplate': '♻️',
+    'design': '🏗️',
+    'testing': '🧪'
+})
+_SEVERITY_EMOJI = MappingProxyType({
+    'info': 'ℹ️',
+    'warning': '⚠️',
+    'error': '🔴'
+})
+
+# Batching of small files into a single review request
+_BATCH_TOKEN_BUDGET = 6000
+_BATCH_MAX_FILES = 8
+_BATCH_MAX_PATCH_CHARS = 4096  # larger patches are always reviewed on their own
+
+# Upper bound on one streamed review request, in seconds
+_REVIEW_TIMEOUT = 90
+
+# Output token caps by changed-line count: (below this many lines, cap); larger diffs get the max
+_OUTPUT_TOKEN_TIERS = ((200, 1500), (1000, 2500))
+_MAX_OUTPUT_TOKENS = 4000
+# Most output tokens REVIEW_MODEL will produce in one reply (caps a batch's summed budgets)
+_MODEL_MAX_OUTPUT_TOKENS = 16384
+_REVIEW_SEED = 42
+
+# Issues this many lines outside a hunk are moved onto its nearest line rather than into the summary
+_LINE_SNAP_DISTANCE = 3
+
+# OpenAI Batch API status polling interval bounds, in seconds
+_BATCH_API_POLL_MIN = 10
+_BATCH_API_POLL_MAX = 300
+
+# GitHub writes: at most this many in flight, and the longest primary rate-limit reset worth waiting for
+_GITHUB_WRITE_CONCURRENCY = 4
+_RATE_LIMIT_MAX_WAIT = 60
+# Below this many remaining requests, calls pause until the quota resets (if it resets within _RATE_LIMIT_MAX_WAIT)
+_RATE_LIMIT_LOW_WATER = 100
+
+# Stale comments are deleted through GraphQL, this many aliased mutations per request
+_GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+_GRAPHQL_DELETE_BATCH = 50
+
+REVIEW_MODEL = "gpt-4o"  # Using GPT-4o for faster responses
+# Bump whenever the prompt templates or the review schema change, to invalidate cached reviews
+PROMPT_VERSION = "1"
+# Reviews are cached by prompt hash when AI_REVIEW_CACHE=1 (persisted across runs by actions/cache)
+REVIEW_CACHE_DIR = os.getenv(
+    'AI_REVIEW_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ai_review_cache')
+)
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[tiktoken.Encoding]:
+    """Load the review model's tokenizer once per process (None if it cannot be loaded)"""
+    try:
+        return tiktoken.encoding_for_model(REVIEW_MODEL)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not load tokenizer for {REVIEW_MODEL}, estimating 4 chars per token: {str(e)}")
+        return None
+
+def _count_tokens(text: str) -> int:
+    """Number of model tokens in text (estimated at 4 chars per token without a tokenizer)"""
+    enc = _encoding()
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens model tokens, marking it when something was dropped"""
+    enc = _encoding()
+    if enc is None:
+        if len(text) <= max_tokens * 4:
+            return text
+        return text[:max_tokens * 4] + "\n... (truncated)"
+    
+    ids = enc.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    return enc.decode(ids[:max_tokens]) + "\n... (truncated)"
 
-20. **Concurrency & Thread Safety**:
-   - **CRITICAL**: Check for race conditions in multi-threaded code
-   - Verify thread safety (locks, mutexes, atomic operations)
-   - Check for deadlock potential
-   - Flag shared mutable state without proper synchronization
-   - Flag non-thread-safe collections used in concurrent contexts (e.g., ArrayList in Java, regular dict in Python)
-   - Check for proper handling of concurrent requests
-   - Validate async/await patterns are used correctly
-   - Verify promise/async error handling
-   - Check for memory leaks in async operations
-   - Flag improper use of async/await that could cause race conditions
+def _top_literal(filenames: List[str]) -> List[str]:
+    """Pathspecs for repo-root-relative paths, matched literally whatever the working directory"""
+    return [f":(top,literal){filename}" for filename in filenames]
 
-21. **Memory & Resource Management**:
-   - Check for memory leaks (unclosed connections, event listeners, timers)
-   - Verify resource cleanup (file handles, database connections, streams)
-   - Check for proper disposal of resources (using statements, finally blocks)
-   - Flag unbounded data structures that could cause memory issues
-   - Verify large objects are properly released
-   - Check for circular references that prevent garbage collection
-   - Verify streaming/chunking for large data processing
+class _GitHubRetry(Retry):
+    """urllib3 Retry that retries a POST only on 429 (never on a 5xx or read timeout, which may follow a created review)"""
+    
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method.upper() == 'POST':
+            return status_code == 429 and bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
 
-22. **PR Quality Checks**:
-   - Check PR size (flag if too large - suggest breaking into smaller PRs)
-   - Verify PR description is clear and includes:
-     * What changes were made
-     * Why the changes were made
-     * How to test the changes
-     * Screenshots/demos if UI changes
-   - Check commit messages follow conventions (conventional commits)
-   - Verify branch naming follows standards
-   - Flag PRs that mix unrelated changes
-   - Check if PR addresses a single concern/feature
-   - Verify breaking changes are documented
+@dataclass
+class FileDiff:
+    """Represents a file change in a PR"""
+    filename: str
+    status: str  # added, modified, deleted
+    patch: str
+    additions: int
+    deletions: int
+    line_map: Optional[Dict[int, int]] = None  # new-file line -> diff position, see _build_line_map
+
+class ReviewIssue(msgspec.Struct):
+    """One issue reported by the model for a file"""
+    line: Union[int, str, None] = None
+    severity: str = "info"
+    category: str = "general"
+    title: Optional[str] = ""
+    description: Optional[str] = ""
+    suggestion: Optional[str] = "No specific suggestion provided"
+    # Filled in locally after decoding
+    code_snippet: Optional[str] = None
+    line_valid: bool = False
+
+class CriterionCheck(msgspec.Struct):
+    """One acceptance criterion and whether the change meets it"""
+    criteria: str = "N/A"
+    status: str = "❓"
+    evidence: Optional[str] = None
+
+class SubtaskCheck(msgspec.Struct):
+    """Coverage of one JIRA subtask"""
+    subtask_key: str = "N/A"
+    status: str = "❓"
+    evidence: Optional[str] = None
+
+class JiraCompliance(msgspec.Struct):
+    """The model's assessment of the change against the JIRA ticket"""
+    matches_requirements: bool = False
+    missing_criteria: List[str] = []
+    out_of_scope_files: List[str] = []
+    acceptance_criteria_checklist: List[CriterionCheck] = []
+    subtask_coverage: List[SubtaskCheck] = []
+    final_verdict: str = ""
+
+class Review(msgspec.Struct):
+    """The model's review of a single file"""
+    overall_assessment: str = ""
+    severity: str = "info"
+    jira_compliance: JiraCompliance = msgspec.field(default_factory=JiraCompliance)
+    issues: List[ReviewIssue] = []
+    positive_aspects: List[str] = []
+
+class BatchReviewEntry(Review):
+    """One file's review inside a batched response"""
+    filename: str = ""
+
+class BatchReview(msgspec.Struct):
+    """The model's reply to a batched prompt"""
+    files: List[BatchReviewEntry] = []
 
-**CRITICAL SECURITY & COMPLIANCE CHECKS (SME FEEDBACK):**
+@dataclass
+class ReviewComment:
+    """Represents a code review comment"""
+    file: str
+    line: int
+    comment: str
+    severity: str  # info, warning, error
+
+@dataclass
+class ComplianceDigest:
+    """What the summary and the PR review verdict need from all file reviews, gathered in one pass"""
+    severity_counts: Counter
+    critical_issues: List[ReviewIssue]  # first few distinct error-level requirement/scope issues (see _compute_digest)
+    missing_criteria: set
+    out_of_scope: set
+    filtered_out_of_scope: set  # out_of_scope minus files the JIRA ticket covers (_filter_out_of_scope_files)
+    checklist: List[CriterionCheck]  # first non-empty one
+    subtask_coverage: List[SubtaskCheck]  # first non-empty one
+    final_verdict: Optional[str]  # first one given
+    all_compliant: bool
+    should_request_changes: bool
+
+class AICodeReviewer:
+    """Main class for AI-powered code review"""
+    
+    def __init__(self):
+        self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        self.github_token = os.getenv('GITHUB_TOKEN')
+        self.pr_number = os.getenv('PR_NUMBER')
+        self.repo_name = os.getenv('REPO_NAME')
+        self.base_sha = os.getenv('BASE_SHA')
+        self.head_sha = os.getenv('HEAD_SHA')
+        self.pr_title = os.getenv('PR_TITLE', '')
+        self.branch_name = os.getenv('BRANCH_NAME', '')
+        
+        if not self.openai_api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+        
+        # Initialize OpenAI client with timeout (120 seconds for large prompts);
+        # the SDK retries 408/409/429/5xx with exponential backoff, honouring Retry-After
+        self.client = AsyncOpenAI(api_key=self.openai_api_key, timeout=120.0, max_retries=3)
+        self.max_concurrency = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8'))
+        self.review_cache_enabled = os.getenv('AI_REVIEW_CACHE') == '1'
+        self.review_comments: List[ReviewComment] = []
+        # (inline comment payload, severity) pairs queued by post_review_comments, sent by _submit_review
+        self._pending_review_comments: List[tuple] = []
+        # Every file in the PR, for the PR-wide prompt context (set once the diff is fetched)
+        self._all_file_diffs: List[FileDiff] = []
+        
+        # One pooled, keep-alive session for every GitHub API call
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'token {self.github_token}',
+            'Accept': 'application/vnd.github.v3+json'
+        })
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=_GitHubRetry(
+                total=5,
+                backoff_factor=1.0,
+                status_forcelist=[429, 500, 502, 503, 504],
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        # Keeps comment bursts under GitHub's secondary (concurrency) rate limit
+        self._github_write_slots = threading.BoundedSemaphore(_GITHUB_WRITE_CONCURRENCY)
+        
+        # JIRA service is created on first use (see jira_service)
+        self.jira_issue = None
+        self.jira_key = None
+        
+        # Initialize SRS service
+        self.srs_service = SRSService()
+        self.srs_context = None
+        
+    @cached_property
+    def jira_service(self) -> JiraService:
+        """JIRA client, built the first time JIRA integration is checked"""
+        return JiraService()
+    
+    async def _git_diff(self, filenames: List[str]) -> str:
+        """Get the combined diff of the given files in a single git invocation"""
+        proc = await asyncio.create_subprocess_exec(
+            "git", "-c", "core.quotePath=false",
+            "diff", "--no-renames", self.base_sha, self.head_sha, "--", *_top_literal(filenames),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        out, _ = await proc.communicate()
+        return out.decode('utf-8', errors='replace')
+    
+    def _split_combined_diff(self, diff_text: str) -> Dict[str, str]:
+        """Split a combined diff into per-file patches keyed by filename"""
+        patches = {}
+        parts = _DIFF_HEADER_RE.split(diff_text)
+        # parts = [preamble, header, body, header, body, ...]
+        for header, body in zip(parts[1::2], parts[2::2]):
+            # With --no-renames both sides are the same path: 'diff --git a/<name> b/<name>'
+            rest = header[len('diff --git a/'):]
+            filename = rest[:(len(rest) - len(' b/')) // 2]
+            patches[filename] = f"{header}\n{body}"
+        return patches
+    
+    async def _git_numstat(self, filenames: List[str]) -> Dict[str, tuple]:
+        """Get git's own (additions, deletions) counts for the given files"""
+        proc = await asyncio.create_subprocess_exec(
+            "git", "diff", "--numstat", "-z", "--no-renames", self.base_sha, self.head_sha, "--", *_top_literal(filenames),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        out, _ = await proc.communicate()
+        
+        stats = {}
+        # -z records are 'adds<TAB>dels<TAB>path<NUL>'; binary files report '-' for both counts
+        for record in out.decode('utf-8', errors='replace').split('\0'):
+            parts = record.split('\t', 2)
+            if len(parts) != 3:
+                continue
+            adds, dels, filename = parts
+            stats[filename] = (int(adds) if adds != '-' else 0, int(dels) if dels != '-' else 0)
+        return stats
+    
+    async def get_pr_diff(self) -> List[FileDiff]:
+        """Get the diff of files changed in the PR"""
+        logger.info("🔍 Fetching PR changes...")
+        
+        # Get list of changed files, letting git drop the obvious never-reviewed paths up front
+        # (_should_skip_file below still applies the full rules)
+        result = subprocess.run(
+            ["git", "diff", "--name-status", self.base_sha, self.head_sha, "--", ":/", *_GIT_EXCLUDES],
+            capture_output=True, text=True
+        )
+        
+        # Get files that were changed in commits with current JIRA key (if available)
+        files_from_jira_commits = set()
+        if self.jira_key:
+            logger.info(f"🔍 Filtering files from commits with JIRA key {self.jira_key}...")
+            # Get commits between base and head that contain the JIRA key in commit message,
+            # with the files each one touched, in one git call (each record is NUL, hash, then file names)
+            commit_result = subprocess.run(
+                ["git", "log", f"{self.base_sha}..{self.head_sha}", "--pretty=format:%x00%H", "--name-only", f"--grep={self.jira_key}", "--all-match"],
+                capture_output=True, text=True
+            )
+            
+            commit_records = [record.split('\n') for record in commit_result.stdout.split('\0') if record.strip()]
+            if commit_records:
+                logger.info(f"📝 Found {len(commit_records)} commit(s) with JIRA key {self.jira_key}")
+                
+                # Collect files changed in those commits
+                for commit_hash, *files in commit_records:
+                    files_from_jira_commits.update(file for file in files if file)
+                
+                if files_from_jira_commits:
+                    logger.info(f"✅ Will review {len(files_from_jira_commits)} file(s) from commits with JIRA key {self.jira_key}")
+            else:
+                # If no commits found with JIRA key, check if branch name or PR title has it
+                # In that case, review all files (might be first commit without JIRA key in message)
+                logger.warning(f"⚠️  No commits found with JIRA key {self.jira_key} in commit message")
+                logger.info(f"   Reviewing all files in PR (JIRA key found in branch/PR title)")
+        
+        candidates = []
+        for line in result.stdout.strip().split('\n'):
+            if not line:
+                continue
+                
+            parts = line.split('\t')
+            if len(parts) < 2:
+                continue
+                
+            status = parts[0]
+            filename = parts[1]
+            
+            # Skip certain file types
+            if self._should_skip_file(filename):
+                continue
+            
+            # If JIRA key is available, only review files from commits with that JIRA key
+            if self.jira_key:
+                if files_from_jira_commits:
+                    # We have commits with JIRA key - only review files from those commits
+                    if filename not in files_from_jira_commits:
+                        logger.info(f"⏭️  Skipping {filename} (not in commits with JIRA key {self.jira_key})")
+                        continue
+                else:
+                    # No commits found with JIRA key, but JIRA key exists in branch/PR
+                    # Only review files that match the JIRA ticket context
+                    # For SEC-400 (payment), only review payment-related files
+                    if not self._is_file_related_to_jira_ticket(filename):
+                        logger.info(f"⏭️  Skipping {filename} (not related to JIRA ticket {self.jira_key})")
+                        continue
+            
+            candidates.append((status, filename))
+        
+        if not candidates:
+            return []
+        
+        # Fetch all remaining files' diffs and git's line counts concurrently, one git call each
+        filenames = [filename for _, filename in candidates]
+        diff_text, stats = await asyncio.gather(self._git_diff(filenames), self._git_numstat(filenames))
+        patches = self._split_combined_diff(diff_text)
+        
+        file_diffs = []
+        for status, filename in candidates:
+            patch = patches.get(filename, '')
+            
+            # Only include if there are actual changes (not just whitespace)
+            if not patch.strip():
+                continue
+            
+            additions, deletions = stats.get(filename, (0, 0))
+            
+            # Skip if no actual code changes (only metadata)
+            if additions == 0 and deletions == 0:
+                continue
+            
+            file_diffs.append(FileDiff(
+                filename=filename,
+                status=status,
+                patch=patch,
+                additions=additions,
+                deletions=deletions
+            ))
+        
+        return file_diffs
+    
+    def _should_skip_file(self, filename: str) -> bool:
+        """Determine if a file should be skipped from review"""
+        # Always skip infrastructure, config, docs, binaries, etc.
+        if _ALWAYS_SKIP_RE.search(filename):
+            return True
+        
+        # Skip documentation files (unless in src/ or feature directories)
+        if _DOC_RE.search(filename) and not _DOC_DIR_RE.search(filename):
+            return True
+        
+        # Skip demo/example files (always skip, they're not production code)
+        if _DEMO_RE.search(filename):
+            return True
+        
+        # Skip scripts/tools outside of src/ (unless they're part of the feature)
+        if filename.startswith(_SCRIPT_DIRS) and not _FEATURE_DIR_RE.search(filename):
+            return True
+        
+        # Skip config files outside of src/ or feature directories
+        if filename.endswith(_CONFIG_EXTENSIONS) and not _FEATURE_DIR_RE.search(filename):
+            return True
+        
+        return False
+    
+    def _is_low_signal(self, file_diff: FileDiff) -> bool:
+        """Whether a diff is generated output or bulk import/blank churn the model cannot meaningfully review"""
+        filename = file_diff.filename
+        if filename.endswith(_GENERATED_SUFFIXES) or '.generated.' in filename:
+            return True
+        
+        if file_diff.additions < _LOW_SIGNAL_MIN_LINES or file_diff.deletions:
+            return False
+        added = [line[1:] for line in file_diff.patch.splitlines() if line.startswith('+') and not line.startswith('+++')]
+        low_signal = sum(1 for line in added if _LOW_SIGNAL_LINE_RE.match(line))
+        return low_signal >= _LOW_SIGNAL_RATIO * len(added)
+    
+    def _is_file_related_to_jira_ticket(self, filename: str) -> bool:
+        """
+        Check if a file is related to the current JIRA ticket based on ticket summary/description
+        This is a fallback when commit-based filtering doesn't work
+        """
+        if not self.jira_issue:
+            return True  # If no JIRA ticket, review all files
+        
+        # Check if filename contains any relevant keywords
+        keywords_re = self._jira_file_keywords_re
+        if keywords_re:
+            # If no keywords match, it's probably not related
+            return bool(keywords_re.search(filename.lower()))
+        
+        # If we can't determine, be conservative and review it
+        return True
+    
+    @cached_property
+    def _jira_file_keywords_re(self) -> Optional[re.Pattern]:
+        """Filename keywords implied by the JIRA ticket's topic, compiled once per run (None when unknown)"""
+        jira_summary = self.jira_issue.get('summary', '').lower()
+        jira_description = self.jira_issue.get('description', '').lower()
+        
+        # Extract keywords from JIRA ticket
+        keywords = []
+        if 'payment' in jira_summary or 'payment' in jira_description:
+            keywords.extend(['payment', 'pay', 'transaction', 'refund', 'billing'])
+        if 'login' in jira_summary or 'authentication' in jira_summary or 'auth' in jira_summary:
+            keywords.extend(['login', 'auth', 'authentication', 'session', 'token'])
+        if 'profile' in jira_summary or 'user profile' in jira_summary:
+            keywords.extend(['profile', 'user'])
+        return _any_of(keywords) if keywords else None
+    
+    def _filter_out_of_scope_files(self, out_of_scope_files: set) -> set:
+        """
+        Filter out files that are actually in scope based on JIRA ticket context.
+        This prevents false positives where authentication-related files are flagged as out-of-scope.
+        """
+        if not out_of_scope_files or not self.jira_issue:
+            return out_of_scope_files
+        
+        # Check if ticket is about authentication/login
+        jira_summary = self.jira_issue.get('summary', '').lower()
+        jira_description = self.jira_issue.get('description', '').lower()
+        if not (_AUTH_TICKET_RE.search(jira_summary) or _AUTH_TICKET_RE.search(jira_description)):
+            return out_of_scope_files
+        
+        filtered = set()
+        for file in out_of_scope_files:
+            # Always include files that are clearly out of scope
+            if _ALWAYS_OUT_OF_SCOPE_RE.search(file):
+                filtered.add(file)
+            # Exclude files that match in-scope patterns for auth tickets
+            elif _AUTH_IN_SCOPE_RE.search(file.lower()):
+                # This file is likely in scope, don't include it
+                continue
+            else:
+                # Keep other files as potentially out of scope
+                filtered.add(file)
+        
+        return filtered
+    
+    def _extract_code_snippet(self, file_content: str, line_number: Optional[int], context: int = 2) -> Optional[str]:
+        """Return code snippet with line numbers around the specified line."""
+        if not isinstance(line_number, int):
+            return None
+        lines = file_content.splitlines()
+        if line_number < 1 or line_number > len(lines):
+            return None
 
-23. **Authorization - Object-Level Access Control**:
-   - **CRITICAL**: When endpoints access user/customer/tenant data, verify object-level authorization is enforced
-   - Flag endpoints that query user data without proper authorization checks (e.g., missing WHERE user_id = ? or tenant_id = ?)
-   - Check for authorization middleware/checks before data access operations
-   - Verify that users can only access their own records (not other users' data)
-   - Flag missing authorization checks in:
-     * GET endpoints that return user-specific data
-     * UPDATE/DELETE operations on user records
-     * Any query that filters by user_id, customer_id, tenant_id without validation
-   - Ensure authorization happens server-side, not just client-side
-   - Check for proper role-based access control (RBAC) when applicable
+        start = max(line_number - 1 - context, 0)
+        end = min(line_number + context, len(lines))
+        snippet_lines = []
+        for idx in range(start, end):
+            pointer = ">" if (idx + 1) == line_number else " "
+            snippet_lines.append(f"{idx + 1:04d}{pointer} {lines[idx].rstrip()}")
+        return "\n".join(snippet_lines)
 
-24. **External Integrations - Safe Failure Handling**:
-   - **CRITICAL**: All third-party/internal service calls must have proper error handling
-   - Flag external API calls (fetch, axios, http requests) without try/catch blocks
-   - Require meaningful fallback/error responses for external service failures
-   - Check for graceful degradation when external services fail
-   - Flag missing timeout handling for external calls
-   - Verify circuit breaker patterns for critical external dependencies
-   - Check for proper retry logic with exponential backoff
-   - Ensure one dependency failure doesn't break the entire flow
-   - Flag missing error handling for:
-     * Payment gateway calls
-     * Email/SMS service calls
-     * Third-party API integrations
-     * Internal microservice calls
+    # The JIRA blocks are identical for every file in the PR, so they are built once, on the
+    # first prompt (after _detect_and_fetch_jira_ticket has run), and reused
+    @cached_property
+    def _jira_context(self) -> str:
+        """JIRA context string for AI prompt"""
+        if not self.jira_issue:
+            return ""
+        
+        # Build subtasks section if present
+        subtasks = self.jira_issue.get('subtasks', [])
+        subtasks_section = ""
+        if subtasks:
+            subtasks_section = "\n**Subtasks:**\n"
+            for subtask in subtasks:
+                subtask_key = subtask.get('key', 'N/A')
+                subtask_summary = subtask.get('summary', 'N/A')
+                subtasks_section += f"- **{subtask_key}**: {subtask_summary}\n"
+        
+        context = f"""
+## JIRA TICKET CONTEXT
 
-25. **Database Correctness & Constraints**:
-   - **CRITICAL**: Flag missing database constraints and optimizations
-   - Check for missing indexes on frequently queried columns (especially in WHERE clauses)
-   - Flag UPDATE/DELETE queries without WHERE clauses (prevents accidental mass updates)
-   - Verify transaction boundaries for multi-step database operations
-   - Check for missing foreign key constraints (if schema context available)
-   - Flag queries that could cause data integrity issues
-   - Verify proper use of database transactions for atomic operations
-   - Check for missing unique constraints on columns that should be unique
-   - Flag N+1 query problems
-   - Verify proper connection pooling usage
-   - **Note**: Full schema validation requires DB schema/migrations in scope (to be enhanced)
+**JIRA Issue:** {self.jira_key}
+**Summary:** {self.jira_issue.get('summary', 'N/A')}
+{subtasks_section}
+**Description:**
+{self.jira_issue.get('description', 'No description provided')}
 
-26. **Secrets & Configuration Safety**:
-   - **CRITICAL**: Never allow hardcoded secrets, tokens, or sensitive configuration
-   - Detect and flag hardcoded:
-     * API keys (pattern: api[_-]?key, apikey, secret[_-]?key)
-     * Passwords (password\s*=\s*['\"][^'\"]+)
-     * Tokens (token\s*=\s*['\"][^'\"]+, jwt[_-]?secret)
-     * AWS keys (aws[_-]?(access[_-]?key|secret[_-]?key))
-     * Database credentials (db[_-]?(password|pass|pwd))
-     * OAuth secrets (client[_-]?secret, oauth[_-]?secret)
-     * Connection strings with credentials
-   - Flag environment-specific URLs hardcoded in code:
-     * localhost, 127.0.0.1, staging URLs, production URLs
-   - **CRITICAL**: Flag environment-specific behavior hardcoded (should use config/env)
-   - Check for missing configuration defaults (required configs should have defaults)
-   - Flag unsafe feature toggles (feature flags that could cause security issues)
-   - Verify config values are validated (type, range, required fields)
-   - Flag secrets in config files (should be in environment variables or secret management)
-   - Enforce configuration via environment variables or config layer
-   - Flag feature flags hardcoded in code (should be in config)
-   - Check for secrets in:
-     * Variable assignments
-     * String literals
-     * Configuration objects
-     * Comments (sometimes developers leave secrets in comments)
-   - Verify sensitive configs are not committed in PR
+**Acceptance Criteria:**
+{self.jira_issue.get('acceptance_criteria', 'No acceptance criteria specified')}
 
-27. **Sensitive Data & PII Exposure**:
-   - **CRITICAL**: Prevent PII and sensitive data exposure in APIs and logs
-   - Flag unnecessary PII in API responses:
-     * Email addresses (unless required)
-     * Phone numbers (unless required)
-     * PAN numbers (Indian tax ID pattern)
-     * Aadhaar numbers (12-digit pattern)
-     * Full addresses (unless required)
-     * Date of birth
-     * Social Security Numbers (SSN patterns)
-   - Detect and flag sensitive data in logs:
-     * Passwords (password, pwd, passwd in log messages)
-     * Tokens (token, jwt, access_token, refresh_token)
-     * OTP codes (otp, verification[_-]?code)
-     * Credit card numbers (pattern detection)
-     * PAN/Aadhaar numbers
-     * API keys or secrets
-   - Flag storing secrets in plain text anywhere (database, files, variables)
-   - Check for sensitive fields in:
-     * API response objects
-     * Log statements (console.log, logger.info with sensitive data)
-     * Error messages (shouldn't expose internal details)
-     * Debug output
-   - Verify data masking/redaction for sensitive fields in logs
-   - Flag unnecessary sensitive fields returned in GET responses
+**JIRA Link:** {self.jira_issue.get('url', '')}
 
-28. **Error Handling - No Internal Leakage**:
-   - **CRITICAL**: Ensure error responses don't leak internal system details
-   - Flag raw exception messages sent to clients (error.message, error.stack)
-   - Check for stack traces in API responses
-   - Verify detailed error objects are not exposed to end users
-   - Flag database error messages exposed to clients (should be sanitized)
-   - Ensure error responses are user-friendly and don't reveal:
-     * Stack traces
-     * File paths
-     * Database connection strings
-     * Internal system architecture
-     * Code structure or variable names
-   - Verify error logging happens server-side (detailed errors in logs, not responses)
-   - Check for proper error sanitization before sending to client
+---
+"""
+        return context
+    
+    @cached_property
+    def _jira_requirements(self) -> str:
+        """JIRA-specific review requirements (scope, acceptance criteria, subtasks) for the AI prompt"""
+        subtasks = self.jira_issue.get('subtasks', [])
+        has_subtasks = len(subtasks) > 0
+        
+        requirements = f"""
+**CRITICAL: This code must be evaluated against JIRA ticket {self.jira_key}**
 
-## OUTPUT FORMAT
+1. **Requirement Compliance** (HIGHEST PRIORITY):
+   - ✅ Verify implementation matches JIRA description
+   - ✅ Check all acceptance criteria are met
+   - ❌ Flag any missing acceptance criteria
+   - ❌ Flag any out-of-scope changes
+   - ⚠️  Highlight files changed that are unrelated to JIRA scope
 
-Format your response as JSON with the following structure:
-{{
-  "overall_assessment": "Brief summary of the changes and compliance with JIRA requirements",
-  "severity": "info|warning|critical",
-  "jira_compliance": {{
-    "matches_requirements": true/false,
-    "missing_criteria": ["List of missing acceptance criteria"],
-    "out_of_scope_files": ["List of files not related to JIRA ticket"],
-    "acceptance_criteria_checklist": [
-      {{"criteria": "Criterion text", "status": "✅ Met | ❌ Missing | ⚠️ Partial", "evidence": "Line references"}}
-    ],
-    "subtask_coverage": [
-      {{"subtask_key": "H30-XXXXX", "status": "✅ Covered | ❌ Missing | ⚠️ Partial", "evidence": "File/line references"}}
-    ],
-    "final_verdict": "Approve | Changes Requested"
-  }},
-  "issues": [
-    {{
-      "line": <line_number or null>,
-      "severity": "info|warning|error",
-      "category": "requirement|quality|bug|security|performance|boilerplate|design|testing|scope|style|documentation|error_handling|logging|architecture|api|database|concurrency|memory|pr_quality|authorization|external_integration|db_constraints|secrets|pii|error_leakage|duplication|unused_code|commented_code|hardcoded_values|signature|business_logic|async_handling|formatting|frontend_security|test_coverage|insecure_defaults|crypto|input_validation|unbounded_loops|inefficient_data_structures|caching|swallowed_exceptions|error_propagation|thread_safety|api_contract|observability|config_safety",
-      "title": "Brief issue title",
-      "description": "Detailed explanation",
-      "suggestion": "Specific recommendation or code example"
-    }}
-  ],
-  "positive_aspects": ["List of good practices found in the code"]
-}}
+2. **Scope Validation**:
+   - Review if ALL changed files are relevant to JIRA ticket {self.jira_key}
+   - **IMPORTANT**: Files related to the ticket topic ARE IN SCOPE. For example:
+     * For login/authentication tickets: controllers, services, middleware, routes, models, utils related to auth ARE IN SCOPE
+     * Files with names containing: login, auth, authentication, session, token, password, user (when related to auth) ARE IN SCOPE
+     * Only flag files as out-of-scope if they are clearly unrelated (e.g., documentation updates, CI/CD configs, demo files, unrelated features)
+   - Flag any files that seem completely unrelated to the ticket requirements
+   - Ensure no accidental changes to unrelated functionality
+   - **DO NOT flag authentication-related files (controllers, services, middleware) as out-of-scope for authentication tickets**
 
-**IMPORTANT:**
-- If acceptance criteria are missing or violated, mark severity as "error" and set final_verdict to "Changes Requested"
-- **SCOPE DETECTION RULES**: 
-  * For authentication/login tickets: Files in paths like `src/controllers/*login*`, `src/services/*auth*`, `src/middleware/*auth*`, `src/routes/*auth*` ARE IN SCOPE
-  * Only flag files as out-of-scope if they are clearly unrelated (CI/CD configs, documentation, demo files, unrelated features)
-  * DO NOT flag authentication-related code files as out-of-scope for authentication tickets
-- If files are out of scope, create issues with category "scope"
-- If subtasks are not covered, mark them as "❌ Missing" in subtask_coverage
-- Be specific about which acceptance criteria are met/missing
-- Provide line references for requirement implementation
-- If business logic changed without tests, create a "testing" issue with severity "warning"
-- Set final_verdict to "Changes Requested" if any requirements are missing or incorrect
-- Set final_verdict to "Approve" only if all requirements are met
+3. **Acceptance Criteria Checklist**:
+   - Create a checklist showing which acceptance criteria are met
+   - Clearly mark any missing or incomplete criteria
+   - Provide specific line references where criteria are implemented
+   - Treat description as the primary source of acceptance criteria
 
-**OUTPUT FORMAT (Strict Markdown Structure):**
-Your response must include these sections in markdown:
-- ✅ Matches JIRA Requirements
-- ❌ Missing / Incorrect Implementation  
-- ⚠️ Suggestions / Improvements
-- 📋 Acceptance Criteria Checklist
-- 🧾 Subtask Coverage (if subtasks exist)
-- 🔚 Final Verdict (Approve / Changes Requested)
+"""
+        
+        # Add subtask coverage if subtasks exist
+        if has_subtasks:
+            requirements += f"""4. **Subtask Coverage** (🧾):
+   - Verify implementation covers ALL subtasks:
+"""
+            for subtask in subtasks:
+                subtask_key = subtask.get('key', '')
+                subtask_summary = subtask.get('summary', '')
+                requirements += f"     - **{subtask_key}**: {subtask_summary}\n"
+            requirements += """   - Check if each subtask requirement is addressed in the code
+   - Flag any subtasks that are not implemented
+   - Provide evidence of subtask implementation (file/line references)
 
-Be constructive, specific, and helpful. Focus on meaningful improvements."""
+"""
+            requirements += """5. **Testing Requirements**:
+"""
+        else:
+            requirements += """4. **Testing Requirements**:
+"""
         
-        return prompt
+        requirements += """   - If business logic changed and no tests were added: ⚠️ WARN explicitly
+   - Verify test coverage for new functionality
+   - Check if acceptance criteria are testable
+   - Apply stricter validation if JIRA summary or subtasks imply backend-critical changes
+
+6. **Quality Enforcement**:
+   - Warn if files changed are not aligned with JIRA scope
+   - Flag business logic changes without corresponding tests
+   - Apply stricter checks for critical backend changes
+"""
+        return requirements
     
-    def review_file(self, file_diff: FileDiff) -> Optional[Dict]:
-        """Review a single file using AI"""
-        print(f"📝 Reviewing {file_diff.filename}...")
+    # Identical for every file in the PR, so it is built once, on the first prompt (after the
+    # diff has been fetched and the SRS/JIRA context loaded), and shared by every request
+    @cached_property
+    def _pr_context(self) -> str:
+        """The PR-wide part of the AI prompt, with SRS and JIRA context if available"""
+        srs_context = self.srs_context or ""
         
-        # Read the full file content if it exists (limit to 8000 chars for faster processing)
-        try:
-            with open(file_diff.filename, 'r', encoding='utf-8') as f:
-                full_content = f.read()
-                # Limit file content to 8000 chars to reduce prompt size and API latency
-                file_content = full_content[:8000] + ("\n... (truncated)" if len(full_content) > 8000 else "")
-        except:
-            file_content = "File not accessible or was deleted"
+        # List all changed files for scope check and total the PR size, in one pass over the diffs
+        changed_files = []
+        total_additions = total_deletions = 0
+        for fd in self._all_file_diffs:
+            changed_files.append(fd.filename)
+            total_additions += fd.additions
+            total_deletions += fd.deletions
+        total_changes = total_additions + total_deletions
         
-        # Build enhanced prompt with JIRA context
-        prompt = self._build_enhanced_prompt(file_diff, file_content)
+        # PR size warning
+        pr_size_warning = ""
+        if len(changed_files) > 10 or total_changes > 500:
+            pr_size_warning = "\n⚠️ **PR SIZE WARNING**: This PR is large. Consider breaking it into smaller, focused PRs for easier review."
+        
+        # The static rubric (STATIC_INSTRUCTIONS) is sent separately, ahead of this prompt.
+        # Order here goes from PR-wide to per-file so consecutive files share the longest prefix.
+        parts = [srs_context, "\n", self._jira_context, "\n"]
+        
+        if srs_context or self.jira_issue:
+            parts.append("\n## REVIEW REQUIREMENTS\n")
+        
+        # Add SRS-specific requirements if SRS is available
+        if srs_context:
+            parts.append(_SRS_REQUIREMENTS)
+        
+        # Add JIRA-specific requirements if JIRA ticket is available
+        if self.jira_issue:
+            parts.append(self._jira_requirements)
+        
+        parts.append(f"""
+## CODE CHANGES
+
+**All Changed Files in PR:** ({len(changed_files)} files)
+{chr(10).join(f"- {f}" for f in changed_files)}
+
+**PR Size Analysis:**
+- Total files changed: {len(changed_files)}
+- Total lines added: {total_additions}
+- Total lines deleted: {total_deletions}
+- Total changes: {total_changes} lines{pr_size_warning}
+
+""")
+        
+        return "".join(parts)
+    
+    def _hunk_windows(self, file_diff: FileDiff, line_count: int, context_lines: int = 40) -> List[tuple]:
+        """0-based (start, end) line windows around each hunk of the patch, merging ones that overlap"""
+        windows = []
+        for match in _HUNK_RE.finditer(file_diff.patch):
+            start_line = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            start = max(0, start_line - 1 - context_lines)
+            end = min(line_count, start_line - 1 + count + context_lines)
+            if start >= end:
+                continue
+            if windows and start <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+            else:
+                windows.append((start, end))
+        return windows
+    
+    def _extract_hunk_context(self, lines: List[str], windows: List[tuple]) -> str:
+        """Numbered file lines for each window"""
+        return "...\n".join(
+            "".join(f"{i + 1:04d}  {lines[i]}\n" for i in range(start, end))
+            for start, end in windows
+        )
+    
+    def _build_file_content_section(self, file_diff: FileDiff, file_content: str) -> str:
+        """Build the file-content part of a file's prompt section (empty when the diff is enough)"""
+        if file_content == _FILE_NOT_ACCESSIBLE:
+            return f"**FULL FILE CONTENT:**\n{file_content}\n"
+        
+        # Small edits in larger files: the diff's own context lines are enough
+        file_lines = file_content.count('\n') + 1
+        change_ratio = (file_diff.additions + file_diff.deletions) / max(file_lines, 1)
+        if change_ratio < _DIFF_ONLY_CHANGE_RATIO:
+            return ""
+        
+        # Otherwise send only the regions around the hunks; fall back to the head of the file.
+        # Limited to a fixed token budget to reduce prompt size and API latency
+        lines = file_content.splitlines()
+        windows = self._hunk_windows(file_diff, len(lines))
+        if not windows:
+            return f"**FULL FILE CONTENT:**\n{_truncate_tokens(file_content, _FILE_CONTENT_TOKEN_BUDGET)}\n"
+        hunk_context = self._extract_hunk_context(lines, windows)
+        used = _count_tokens(hunk_context)
+        if used > _FILE_CONTENT_TOKEN_BUDGET:
+            hunk_context = _truncate_tokens(hunk_context, _FILE_CONTENT_TOKEN_BUDGET)
+        section = f"**FILE CONTENT AROUND CHANGED HUNKS:**\n{hunk_context}\n"
+        
+        # The hunks get the budget first; what is left shows the top of the file (imports, module setup)
+        remaining = _FILE_CONTENT_TOKEN_BUDGET - used
+        head_end = windows[0][0]
+        if remaining >= _FILE_HEAD_MIN_TOKENS and head_end > 0:
+            head = self._extract_hunk_context(lines, [(0, head_end)])
+            section = f"**FILE HEAD:**\n{_truncate_tokens(head, remaining)}\n" + section
+        return section
+    
+    def _build_file_section(self, file_diff: FileDiff, file_content: str) -> str:
+        """Build the prompt section for a single changed file"""
+        return f"""**File:** {file_diff.filename}
+**Status:** {file_diff.status}
+**Changes:** +{file_diff.additions} -{file_diff.deletions}
+
+**DIFF:**
+{file_diff.patch}
 
+{self._build_file_content_section(file_diff, file_content)}"""
+    
+    def _build_enhanced_prompt(self, file_diff: FileDiff, file_content: str) -> str:
+        """Build AI prompt with SRS and JIRA context if available"""
+        # PR-wide context first and per-file data last so every file in the PR shares the prefix
+        return self._pr_context + self._build_file_section(file_diff, file_content)
+    
+    def _build_batch_prompt(self, entries: List[tuple]) -> str:
+        """Build one AI prompt covering several (file_diff, file_content) entries"""
+        sections = [self._pr_context]
+        for index, (file_diff, file_content) in enumerate(entries, 1):
+            sections.append(f"### FILE {index} of {len(entries)}\n\n")
+            sections.append(self._build_file_section(file_diff, file_content))
+            sections.append("\n")
+        filenames = ", ".join(f'"{fd.filename}"' for fd, _ in entries)
+        sections.append(f"""
+**BATCHED REVIEW:** This prompt contains {len(entries)} files. Review each file independently and
+respond with a single JSON object of the form {{"files": [...]}}, holding exactly one entry per file.
+Each entry must have a "filename" key set to the exact file path ({filenames}) plus the
+"overall_assessment", "severity", "jira_compliance", "issues" and "positive_aspects" keys described
+above, with line numbers referring to that file.""")
+        return "".join(sections)
+    
+    def _read_file_content(self, file_diff: FileDiff) -> str:
+        """Read the file content if it exists, up to _FILE_READ_LIMIT bytes (the prompt decides how much to send)"""
+        # A deleted file has nothing in the working tree to read (git's name-status code is 'D')
+        if file_diff.status.startswith('D'):
+            return _FILE_NOT_ACCESSIBLE
         try:
-            # Enhanced system message for JIRA-aware reviews
-            system_message = """You are a senior code reviewer with 10+ years of experience, acting as a team lead or principal engineer. You have deep expertise in:
+            with open(file_diff.filename, 'rb') as f:
+                data = f.read(_FILE_READ_LIMIT)
+            # Strict decoding keeps binary files out of the prompt; final=False tolerates a
+            # multi-byte character cut in half by the size cap
+            return codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+        except (OSError, UnicodeDecodeError):
+            return _FILE_NOT_ACCESSIBLE
+    
+    def _system_message(self) -> str:
+        """Enhanced system message for JIRA-aware reviews"""
+        system_message = """You are a senior code reviewer with 10+ years of experience, acting as a team lead or principal engineer. You have deep expertise in:
 - Software engineering best practices and clean code principles
 - Security vulnerabilities and OWASP Top 10
 - Design patterns and architecture
@@ -936,60 +1336,311 @@ You review code with the same rigor and standards expected from a senior enginee
 - Specific and actionable (provide clear guidance)
 - Balanced (acknowledge good practices, suggest improvements)
 - Professional and respectful (maintain positive team culture)"""
-            
-            if self.jira_issue:
-                system_message += "\n\nYou are also an expert at evaluating code implementations against JIRA ticket requirements and acceptance criteria. You must strictly verify that code changes align with the specified requirements."
-            
-            # Use faster model settings for better performance
-            response = self.client.chat.completions.create(
-                model="gpt-4o",  # Using GPT-4o for faster responses
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,  # Lower temperature for faster, more consistent responses
-                response_format={"type": "json_object"},
-                max_tokens=4000  # Limit response size for faster processing
+        
+        if self.jira_issue:
+            system_message += "\n\nYou are also an expert at evaluating code implementations against JIRA ticket requirements and acceptance criteria. You must strictly verify that code changes align with the specified requirements."
+        
+        return system_message
+    
+    def _review_cache_key(self, system_message: str, prompt: str) -> str:
+        """Hash everything a review depends on, except the PR-wide file list and totals that shift with every push"""
+        # Prompts always start with the PR context; its SRS and JIRA parts are hashed on their own
+        request = prompt.removeprefix(self._pr_context)
+        material = "\x00".join((
+            PROMPT_VERSION, REVIEW_MODEL, system_message, STATIC_INSTRUCTIONS,
+            self.srs_context or "", self._jira_context, request
+        ))
+        return hashlib.blake2b(material.encode('utf-8'), digest_size=32).hexdigest()
+    
+    @staticmethod
+    def _budget_for(file_diff: FileDiff) -> int:
+        """Output token cap for one file's review, scaled to the size of its diff"""
+        changed_lines = file_diff.additions + file_diff.deletions
+        for line_limit, max_tokens in _OUTPUT_TOKEN_TIERS:
+            if changed_lines < line_limit:
+                return max_tokens
+        return _MAX_OUTPUT_TOKENS
+    
+    async def _complete_json(self, prompt: str, label: str, review_type: type = Review,
+                             max_tokens: int = _MAX_OUTPUT_TOKENS):
+        """Send one review prompt (after the shared static instructions) and decode the JSON reply into review_type"""
+        system_message = self._system_message()
+        
+        # Unchanged files (e.g. on a re-run CI job or a push touching other files) reuse the stored review
+        cache_key = self._review_cache_key(system_message, prompt)
+        cached = self._load_cached_review(cache_key)
+        if cached is not None:
+            try:
+                review_result = msgspec.json.decode(cached, type=review_type, strict=False)
+                logger.info(f"♻️  Reusing cached review for {label}")
+                return review_result
+            except msgspec.DecodeError:
+                pass
+        
+        # Cap the whole streamed completion, not just the time to the first byte
+        try:
+            content = await asyncio.wait_for(
+                self._stream_completion(system_message, prompt, max_tokens), timeout=_REVIEW_TIMEOUT
             )
-            
-            review_result = json.loads(response.choices[0].message.content)
-            for issue in review_result.get('issues', []):
-                line_number = issue.get('line')
-                snippet = self._extract_code_snippet(file_content, line_number)
-                issue['code_snippet'] = snippet
-                issue['line_valid'] = snippet is not None
-            return review_result
-            
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"OpenAI review did not finish within {_REVIEW_TIMEOUT}s") from None
+        
+        # Decode and validate in one pass; strict=False lets e.g. "12" stand in for 12
+        review_result = msgspec.json.decode(content, type=review_type, strict=False)
+        self._store_cached_review(cache_key, content)
+        return review_result
+    
+    def _completion_body(self, system_message: str, prompt: str, max_tokens: int = _MAX_OUTPUT_TOKENS) -> Dict:
+        """Chat completion parameters for one review prompt (shared by the streaming and Batch API paths)"""
+        # Deterministic sampling: the same prompt should yield the same review (and a reusable cache entry)
+        return {
+            "model": REVIEW_MODEL,
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": STATIC_INSTRUCTIONS},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.0,
+            "top_p": 1.0,
+            "seed": _REVIEW_SEED,
+            "response_format": {"type": "json_object"},
+            "max_tokens": max_tokens  # Output tokens are the expensive half; small diffs need short reviews
+        }
+    
+    @property
+    def _prompt_cache_key(self) -> str:
+        """Routes all of a PR's requests to the same OpenAI prompt cache, since they share the PR context prefix"""
+        return f"ai-review:{self.repo_name}#{self.pr_number}"
+    
+    async def _stream_completion(self, system_message: str, prompt: str, max_tokens: int) -> str:
+        """Stream a chat completion and return the concatenated message content, raising if max_tokens cut it off"""
+        stream = await self.client.chat.completions.create(
+            **self._completion_body(system_message, prompt, max_tokens),
+            stream=True,
+            # Sent as a raw field so older SDKs without the keyword argument still pass it through
+            extra_body={"prompt_cache_key": self._prompt_cache_key}
+        )
+        
+        buf = []
+        finish_reason = None
+        async for chunk in stream:
+            if chunk.choices:
+                buf.append(chunk.choices[0].delta.content or "")
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+        
+        # A reply cut off at the cap is partial JSON; say so instead of letting the decode fail opaquely
+        if finish_reason == 'length':
+            raise ValueError(f"review reply truncated at max_tokens={max_tokens}")
+        return "".join(buf)
+    
+    def _attach_code_snippets(self, review: Review, file_content: str) -> Review:
+        """Attach the numbered source around each issue's line, marking lines that do not exist"""
+        for issue in review.issues:
+            snippet = self._extract_code_snippet(file_content, issue.line)
+            issue.code_snippet = snippet
+            issue.line_valid = snippet is not None
+        return review
+    
+    async def review_file(self, file_diff: FileDiff) -> Optional[Review]:
+        """Review a single file using AI"""
+        logger.info(f"📝 Reviewing {file_diff.filename}...")
+        
+        file_content = self._read_file_content(file_diff)
+        
+        # Build enhanced prompt with JIRA context
+        prompt = self._build_enhanced_prompt(file_diff, file_content)
+        
+        try:
+            review_result = await self._complete_json(prompt, file_diff.filename, max_tokens=self._budget_for(file_diff))
+            return self._attach_code_snippets(review_result, file_content)
+        except Exception as e:
+            logger.error(f"❌ Error reviewing {file_diff.filename}: {str(e)}")
+            return None
+    
+    async def review_batch(self, batch: List[FileDiff]) -> List[Optional[Review]]:
+        """Review several small files in one AI request, returning reviews in batch order"""
+        if len(batch) == 1:
+            return [await self.review_file(batch[0])]
+        
+        logger.info(f"📝 Reviewing {len(batch)} files in one request: {', '.join(fd.filename for fd in batch)}...")
+        entries = [(fd, self._read_file_content(fd)) for fd in batch]
+        prompt = self._build_batch_prompt(entries)
+        
+        try:
+            # Each file gets the output budget it would have had alone, so a full batch is not cut off mid-JSON
+            max_tokens = min(sum(self._budget_for(fd) for fd in batch), _MODEL_MAX_OUTPUT_TOKENS)
+            result = await self._complete_json(prompt, f"batch of {len(batch)} files", BatchReview, max_tokens=max_tokens)
+            by_filename = {entry.filename: entry for entry in result.files if entry.filename}
+            batch_failed = False
         except Exception as e:
-            print(f"❌ Error reviewing {file_diff.filename}: {str(e)}")
+            logger.warning(f"⚠️  Batched review of {len(batch)} files failed ({str(e)}); reviewing them one by one")
+            by_filename = {}
+            batch_failed = True
+        
+        # Demultiplex the per-file entries back onto the batch; anything the batch lost gets a single-file review
+        reviews = []
+        for file_diff, file_content in entries:
+            review = by_filename.get(file_diff.filename)
+            if review is None:
+                if not batch_failed:
+                    logger.warning(f"⚠️  No review returned for {file_diff.filename} in batched response; reviewing it alone")
+                review = await self.review_file(file_diff)
+            else:
+                review = self._attach_code_snippets(review, file_content)
+            reviews.append(review)
+        return reviews
+    
+    async def review_files_via_batch_api(self, file_diffs: List[FileDiff]) -> List[Optional[Review]]:
+        """Review every file through the OpenAI Batch API (half price, up to 24h turnaround), in file_diffs order"""
+        system_message = self._system_message()
+        entries = [(fd, self._read_file_content(fd)) for fd in file_diffs]
+        lines = [
+            json.dumps({
+                "custom_id": f"file-{index}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    **self._completion_body(
+                        system_message, self._build_enhanced_prompt(file_diff, file_content), self._budget_for(file_diff)
+                    ),
+                    "prompt_cache_key": self._prompt_cache_key
+                }
+            })
+            for index, (file_diff, file_content) in enumerate(entries)
+        ]
+        
+        input_file = await self.client.files.create(
+            file=("ai_review_batch.jsonl", "\n".join(lines).encode('utf-8')),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            metadata={"repo": str(self.repo_name), "pr": str(self.pr_number)}
+        )
+        logger.info(f"📮 Submitted {len(lines)} review request(s) as OpenAI batch {batch.id}")
+        
+        # Poll with exponential backoff until the batch reaches a terminal state
+        delay = _BATCH_API_POLL_MIN
+        while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _BATCH_API_POLL_MAX)
+            batch = await self.client.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            logger.info(f"⏳ Batch {batch.id}: {batch.status}" + (f" ({counts.completed}/{counts.total})" if counts else ""))
+        
+        reviews: List[Optional[Review]] = [None] * len(entries)
+        if batch.status != 'completed' or not batch.output_file_id:
+            logger.error(f"❌ Batch {batch.id} ended as {batch.status}; no reviews to post")
+            return reviews
+        
+        output = await self.client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            index = int(result['custom_id'].split('-', 1)[1])
+            file_diff, file_content = entries[index]
+            response = result.get('response') or {}
+            if result.get('error') or response.get('status_code') != 200:
+                logger.error(f"❌ Error reviewing {file_diff.filename}: {result.get('error') or response.get('status_code')}")
+                continue
+            try:
+                content = response['body']['choices'][0]['message']['content']
+                review = msgspec.json.decode(content, type=Review, strict=False)
+                reviews[index] = self._attach_code_snippets(review, file_content)
+            except (KeyError, IndexError, TypeError, msgspec.DecodeError) as e:
+                logger.error(f"❌ Error reviewing {file_diff.filename}: {str(e)}")
+        return reviews
+    
+    def _pack_review_batches(self, file_diffs: List[FileDiff]) -> List[List[FileDiff]]:
+        """Greedily pack small diffs into batches under the token budget; large diffs go alone"""
+        batches = []
+        current = []
+        current_tokens = 0
+        for file_diff in file_diffs:
+            if len(file_diff.patch) > _BATCH_MAX_PATCH_CHARS:
+                batches.append([file_diff])
+                continue
+            # Rough estimate: ~4 characters per token
+            tokens = len(file_diff.patch) // 4
+            if current and (current_tokens + tokens > _BATCH_TOKEN_BUDGET or len(current) >= _BATCH_MAX_FILES):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(file_diff)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _load_cached_review(self, cache_key: str) -> Optional[bytes]:
+        """Return the raw JSON of a previously stored review for this prompt hash, if caching is enabled"""
+        if not self.review_cache_enabled:
             return None
+        try:
+            with open(os.path.join(REVIEW_CACHE_DIR, f"{cache_key}.json"), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def _store_cached_review(self, cache_key: str, content: str):
+        """Atomically store a review's raw JSON under its prompt hash, if caching is enabled"""
+        if not self.review_cache_enabled:
+            return
+        try:
+            os.makedirs(REVIEW_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=REVIEW_CACHE_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, os.path.join(REVIEW_CACHE_DIR, f"{cache_key}.json"))
+        except OSError as e:
+            logger.warning(f"⚠️  Could not cache review: {str(e)}")
+    
+    async def _review_with_sem(self, sem: asyncio.Semaphore, idx: int, total: int, batch: List[FileDiff]) -> List[Optional[Review]]:
+        """Review a batch of files once a concurrency slot is free, returning one review per file"""
+        names = ', '.join(fd.filename for fd in batch)
+        async with sem:
+            logger.info(f"📝 [{idx}/{total}] Reviewing {names}...")
+            batch_start = time.time()
+            
+            try:
+                reviews = await self.review_batch(batch)
+            except Exception as e:
+                logger.error(f"❌ Error reviewing {names}: {str(e)}")
+                reviews = [None] * len(batch)
+            
+            batch_elapsed = time.time() - batch_start
+            logger.info(f"✅ [{idx}/{total}] Completed {names} in {batch_elapsed:.1f}s")
+            return reviews
     
     def _build_line_map(self, patch: str) -> Dict[int, int]:
         """Map actual file line numbers to diff positions for inline comments."""
         line_map: Dict[int, int] = {}
         current_line = 0
         diff_line = 0
+        in_hunk = False
 
+        # One first-character dispatch per line; the file headers before the first hunk are skipped
         for raw_line in patch.splitlines():
-            if raw_line.startswith('@@'):
-                match = re.search(r'\+(\d+)', raw_line)
+            first = raw_line[:1]
+            if first == '@':
+                match = _HUNK_RE.match(raw_line)
                 if match:
                     current_line = int(match.group(1))
                     diff_line = 0
+                    in_hunk = True
                 continue
-            if raw_line.startswith('+++') or raw_line.startswith('---'):
+            if not in_hunk or first == '\\':
                 continue
 
             diff_line += 1
 
-            if raw_line.startswith('+'):
-                line_map[current_line] = diff_line
-                current_line += 1
-            elif raw_line.startswith('-'):
+            if first == '-':
                 continue
-            else:
-                line_map[current_line] = diff_line
-                current_line += 1
+            line_map[current_line] = diff_line
+            current_line += 1
 
         return line_map
 
@@ -998,291 +1649,371 @@ You review code with the same rigor and standards expected from a senior enginee
         try:
             # Get all PR comments
             comments_url = f"https://api.github.com/repos/{self.repo_name}/pulls/{self.pr_number}/comments"
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
             
-            response = requests.get(comments_url, headers=headers)
-            if response.status_code == 200:
-                comments = response.json()
-                deleted_count = 0
-                for comment in comments:
-                    # Check if it's an AI-generated comment
-                    if '🤖 Generated by AI Code Reviewer' in comment.get('body', ''):
-                        delete_url = f"https://api.github.com/repos/{self.repo_name}/pulls/comments/{comment['id']}"
-                        delete_response = requests.delete(delete_url, headers=headers)
-                        if delete_response.status_code == 204:
-                            deleted_count += 1
+            comments = self._find_github_comments(comments_url, '🤖 Generated by AI Code Reviewer')
+            if comments:
+                deleted_count = self._delete_comments(comments, 'deletePullRequestReviewComment')
                 
                 if deleted_count > 0:
-                    print(f"🗑️  Deleted {deleted_count} previous AI comments")
+                    logger.info(f"🗑️  Deleted {deleted_count} previous AI comments")
         except Exception as e:
-            print(f"⚠️  Could not delete previous comments: {str(e)}")
+            logger.warning(f"⚠️  Could not delete previous comments: {str(e)}")
+    
+    def _find_github_comments(self, comments_url: str, marker: str) -> List[Dict]:
+        """Return the comments whose body contains marker, across every page of a GitHub comments listing"""
+        # Pages without the marker's ASCII tail in the raw bytes are not parsed at all
+        # (checked without the emoji, which could also arrive \u-escaped)
+        raw_marker = marker.encode('ascii', 'ignore').strip()
+        comments = []
+        url, params = comments_url, {'per_page': 100}
+        while url:
+            response = self._gh_request('GET', url, params=params)
+            if response.status_code != 200:
+                logger.warning(f"⚠️  Could not list comments ({response.status_code}): {url}")
+                break
+            if raw_marker in response.content:
+                comments.extend(comment for comment in orjson.loads(response.content) if marker in (comment.get('body') or ''))
+            # The next-page URL already carries the query string
+            url, params = response.links.get('next', {}).get('url'), None
+        return comments
+    
+    def _delete_comments(self, comments: List[Dict], mutation: str) -> int:
+        """Delete comments with aliased GraphQL mutations (one request per _GRAPHQL_DELETE_BATCH), returning the count"""
+        deleted = 0
+        for start in range(0, len(comments), _GRAPHQL_DELETE_BATCH):
+            batch = comments[start:start + _GRAPHQL_DELETE_BATCH]
+            # Node IDs are passed as variables: d0: deleteIssueComment(input: {id: $id0}) { clientMutationId } ...
+            params = ", ".join(f"$id{index}: ID!" for index in range(len(batch)))
+            fields = " ".join(
+                f"d{index}: {mutation}(input: {{id: $id{index}}}) {{ clientMutationId }}"
+                for index in range(len(batch))
+            )
+            payload = {
+                'query': f"mutation({params}) {{ {fields} }}",
+                'variables': {f"id{index}": comment['node_id'] for index, comment in enumerate(batch)}
+            }
+            
+            response = self._gh_request('POST', _GITHUB_GRAPHQL_URL, json=payload, timeout=30)
+            
+            # GraphQL reports failures with a 200 too: top-level "errors", null "data", or a null alias per
+            # failed mutation (e.g. "Resource not accessible by integration")
+            data, errors = {}, []
+            if response.status_code == 200:
+                try:
+                    body = orjson.loads(response.content)
+                    data, errors = body.get('data') or {}, body.get('errors') or []
+                except orjson.JSONDecodeError:
+                    pass
+            failed = [comment for index, comment in enumerate(batch) if data.get(f"d{index}") is None]
+            deleted += len(batch) - len(failed)
+            if not failed:
+                continue
+            
+            # Fall back to one REST DELETE per comment GraphQL did not delete
+            reason = errors[0].get('message', '') if errors else f"HTTP {response.status_code}"
+            logger.warning(f"⚠️  GraphQL delete failed for {len(failed)} comment(s) ({reason}); deleting them one by one")
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                deleted += sum(pool.map(self._delete_comment, [comment['url'] for comment in failed]))
+        return deleted
+    
+    def _delete_comment(self, delete_url: str) -> bool:
+        """Delete one comment, returning True if GitHub confirmed the deletion"""
+        try:
+            return self._gh_request('DELETE', delete_url).status_code == 204
+        except requests.RequestException as e:
+            logger.warning(f"⚠️  Could not delete comment {delete_url}: {str(e)}")
+            return False
     
     def _delete_previous_summary_comment(self):
-        """Delete previous summary comment"""
+        """Delete previous summary comments"""
         try:
             # Get all issue comments (summary is posted as issue comment)
             comments_url = f"https://api.github.com/repos/{self.repo_name}/issues/{self.pr_number}/comments"
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
             
-            response = requests.get(comments_url, headers=headers)
-            if response.status_code == 200:
-                comments = response.json()
-                for comment in comments:
-                    # Check if it's an AI summary comment
-                    if '🤖 AI Code Review Summary' in comment.get('body', ''):
-                        delete_url = f"https://api.github.com/repos/{self.repo_name}/issues/comments/{comment['id']}"
-                        delete_response = requests.delete(delete_url, headers=headers)
-                        if delete_response.status_code == 204:
-                            print("🗑️  Deleted previous summary comment")
-                            break
+            # Only AI summary comments come back
+            comments = self._find_github_comments(comments_url, '🤖 AI Code Review Summary')
+            if comments and self._delete_comments(comments, 'deleteIssueComment') > 0:
+                logger.info("🗑️  Deleted previous summary comment")
         except Exception as e:
-            print(f"⚠️  Could not delete previous summary: {str(e)}")
+            logger.warning(f"⚠️  Could not delete previous summary: {str(e)}")
+    
+    def _snap_to_diff_line(self, line_number: int, line_map: Dict[int, int]) -> Optional[int]:
+        """Return line_number if it is in the diff, else the nearest diff line within _LINE_SNAP_DISTANCE"""
+        if line_number in line_map:
+            return line_number
+        for distance in range(1, _LINE_SNAP_DISTANCE + 1):
+            for candidate in (line_number - distance, line_number + distance):
+                if candidate in line_map:
+                    return candidate
+        return None
+    
+    def _gh_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Call the GitHub API, waiting out a rate-limit 403 once and pausing when the quota runs low"""
+        kwargs.setdefault('timeout', 10)
+        response = self._gh_send(method, url, kwargs)
+        if response.status_code == 403:
+            # Secondary limits send Retry-After; the primary limit sends X-RateLimit-Remaining: 0 plus a reset time
+            if response.headers.get('Retry-After', '').isdigit():
+                wait = int(response.headers['Retry-After'])
+            elif response.headers.get('X-RateLimit-Remaining') == '0':
+                wait = int(response.headers.get('X-RateLimit-Reset', '0')) - int(time.time()) + 1
+            else:
+                return response
+            if wait > _RATE_LIMIT_MAX_WAIT:
+                logger.warning(f"⚠️  GitHub rate limit resets in {wait}s; not waiting")
+                return response
+            
+            logger.warning(f"⏳ GitHub rate limit hit; retrying in {max(wait, 1)}s")
+            time.sleep(max(wait, 1))
+            response = self._gh_send(method, url, kwargs)
+        
+        # Nearly out of quota: wait for the reset rather than run into 403s on the next calls
+        remaining = response.headers.get('X-RateLimit-Remaining', '')
+        if remaining.isdigit() and int(remaining) < _RATE_LIMIT_LOW_WATER:
+            wait = int(response.headers.get('X-RateLimit-Reset', '0')) - int(time.time()) + 1
+            if 0 < wait <= _RATE_LIMIT_MAX_WAIT:
+                logger.warning(f"⏳ {remaining} GitHub API calls left; pausing {wait}s for the quota reset")
+                time.sleep(wait)
+        return response
     
-    def post_review_comments(self, file_diff: FileDiff, review: Dict):
-        """Post review comments to GitHub PR"""
-        if not review or not review.get('issues'):
+    def _gh_send(self, method: str, url: str, kwargs: Dict) -> requests.Response:
+        """Send one request on the pooled session; writes take a slot of _github_write_slots"""
+        if method == 'GET':
+            return self.session.request(method, url, **kwargs)
+        with self._github_write_slots:
+            return self.session.request(method, url, **kwargs)
+    
+    def post_review_comments(self, file_diff: FileDiff, review: Review):
+        """Queue a file's review issues as inline comments for the PR review (unmatched lines go to the summary)"""
+        if not review or not review.issues:
             return
         
-        github_api_url = f"https://api.github.com/repos/{self.repo_name}/pulls/{self.pr_number}/comments"
-        headers = {
-            'Authorization': f'token {self.github_token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
+        # Built once per file and kept on the FileDiff
+        if file_diff.line_map is None:
+            file_diff.line_map = self._build_line_map(file_diff.patch)
+        line_map = file_diff.line_map
         
-        line_map = self._build_line_map(file_diff.patch)
-
-        for issue in review['issues']:
-            # Create comment body
-            emoji_map = {
-                'quality': '🎨',
-                'bug': '🐛',
-                'security': '🔒',
-                'performance': '⚡',
-                'boilerplate': '♻️',
-                'design': '🏗️',
-                'testing': '🧪'
-            }
+        queued = 0
+        for issue in review.issues:
+            comment_body = self._issue_comment_body(issue)
             
-            severity_emoji = {
-                'info': 'ℹ️',
-                'warning': '⚠️',
-                'error': '🔴'
-            }
-            
-            emoji = emoji_map.get(issue.get('category', ''), '💡')
-            severity = severity_emoji.get(issue.get('severity', 'info'), 'ℹ️')
-            
-            comment_body = f"""{emoji} **{issue['title']}** {severity}
+            # GitHub only accepts inline comments on lines inside the diff, so resolve the line locally
+            target_line = self._snap_to_diff_line(issue.line, line_map) if issue.line_valid else None
+            if target_line:
+                self._pending_review_comments.append(({
+                    'path': file_diff.filename,
+                    'line': target_line,
+                    'side': 'RIGHT',
+                    'body': comment_body
+                }, issue.severity))
+                queued += 1
+            else:
+                note = "Line could not be matched precisely; including in summary instead."
+                self.review_comments.append(ReviewComment(
+                    file=file_diff.filename,
+                    line=issue.line or 0,
+                    comment=comment_body + f"\n_{note}_\n",
+                    severity=issue.severity
+                ))
+        logger.info(f"💬 Queued {queued}/{len(review.issues)} inline comment(s) on {file_diff.filename}")
+    
+    def _issue_comment_body(self, issue: ReviewIssue) -> str:
+        """Markdown body of the inline comment for one review issue"""
+        emoji = _CATEGORY_EMOJI.get(issue.category, '💡')
+        severity = _SEVERITY_EMOJI.get(issue.severity, 'ℹ️')
+        
+        comment_body = f"""{emoji} **{issue.title}** {severity}
 
-**Category**: {issue.get('category', 'general')}
+**Category**: {issue.category}
 
-{issue['description']}
+{issue.description}
 
 **Suggestion**:
-{issue.get('suggestion', 'No specific suggestion provided')}
+{issue.suggestion}
 
 ---
 *🤖 Generated by AI Code Reviewer*
 """
-            snippet = issue.get('code_snippet')
-            if snippet:
-                comment_body += f"\n**Code context:**\n```\n{snippet}\n```\n"
-            
-            # Try to find the specific line in the diff
-            line_number = issue.get('line')
-            line_valid = issue.get('line_valid', False)
-            mapped_line = line_map.get(line_number) if isinstance(line_number, int) else None
-
-            if line_number and line_valid:
-                # Post as inline comment
-                comment_data = {
-                    'body': comment_body,
-                    'commit_id': self.head_sha,
-                    'path': file_diff.filename,
-                    'line': line_number,
-                    'side': 'RIGHT'
-                }
-                
-                try:
-                    response = requests.post(github_api_url, headers=headers, json=comment_data)
-                    if response.status_code == 201:
-                        print(f"✅ Posted comment on {file_diff.filename}:{line_number}")
-                    else:
-                        print(f"⚠️  Failed to post inline comment: {response.status_code}")
-                        # Fall back to storing for summary
-                        self.review_comments.append(ReviewComment(
-                            file=file_diff.filename,
-                            line=line_number or 0,
-                            comment=comment_body,
-                            severity=issue.get('severity', 'info')
-                        ))
-                except Exception as e:
-                    print(f"⚠️  Error posting comment: {str(e)}")
-            else:
-                note = "Line could not be matched precisely; including in summary instead."
-                comment_body += f"\n_{note}_\n"
-                self.review_comments.append(ReviewComment(
-                    file=file_diff.filename,
-                    line=line_number or 0,
-                    comment=comment_body,
-                    severity=issue.get('severity', 'info')
-                ))
+        snippet = issue.code_snippet
+        if snippet:
+            comment_body += f"\n**Code context:**\n```\n{snippet}\n```\n"
+        return comment_body
     
-    def _should_request_changes(self, file_reviews: List[tuple]) -> bool:
-        """Determine if PR should be marked as 'Changes Requested' based on AI final verdict"""
-        if not self.jira_issue:
-            return False
+    def _post_inline_comment(self, comment: Dict, severity: str) -> bool:
+        """Post one queued comment on its own, keeping it for the summary (see run_async) if GitHub rejects it"""
+        github_api_url = f"https://api.github.com/repos/{self.repo_name}/pulls/{self.pr_number}/comments"
+        try:
+            response = self._gh_request('POST', github_api_url, json={**comment, 'commit_id': self.head_sha}, timeout=30)
+            if response.status_code == 201:
+                logger.debug(f"✅ Posted comment on {comment['path']}:{comment['line']}")
+                return True
+            logger.warning(f"⚠️  Failed to post inline comment: {response.status_code}")
+        except Exception as e:
+            logger.warning(f"⚠️  Error posting comment: {str(e)}")
+        
+        # Fall back to storing for summary
+        self.review_comments.append(ReviewComment(
+            file=comment['path'],
+            line=comment['line'],
+            comment=comment['body'],
+            severity=severity
+        ))
+        return False
+    
+    def _compute_digest(self, file_reviews: List[tuple]) -> ComplianceDigest:
+        """Walk the file reviews once, collecting issue counts, JIRA compliance and the review verdict"""
+        severity_counts = Counter()
+        critical_issues = []
+        seen_titles = set()
+        missing_criteria = set()
+        out_of_scope = set()
+        checklist = []
+        subtask_coverage = []
+        final_verdict = None
+        all_compliant = True
+        request_changes = False
         
-        # Check AI's final verdict first (most reliable)
         for _, review in file_reviews:
             if not review:
                 continue
             
-            jira_compliance = review.get('jira_compliance', {})
-            final_verdict = jira_compliance.get('final_verdict', '').lower()
+            for issue in review.issues:
+                severity_counts[issue.severity] += 1
+                if issue.severity == 'error' and issue.category in ('requirement', 'scope'):
+                    request_changes = True
+                    # Deduplicate: skip if we've seen this title before
+                    if issue.title in seen_titles:
+                        continue
+                    seen_titles.add(issue.title)
+                    # Out-of-scope issues have their own section; keep 3 others to avoid repetition
+                    if len(critical_issues) < 3 and 'out-of-scope' not in (issue.title or '').lower():
+                        critical_issues.append(issue)
             
-            # If AI explicitly says "Changes Requested", honor it
-            if 'changes requested' in final_verdict or 'request changes' in final_verdict:
-                return True
+            jira_compliance = review.jira_compliance
+            missing = jira_compliance.missing_criteria
+            file_out_of_scope = jira_compliance.out_of_scope_files
+            verdict = jira_compliance.final_verdict
+            missing_subtasks = any('missing' in st.status.lower() for st in jira_compliance.subtask_coverage)
             
-            # If AI says "Approve", check if there are still issues
-            if 'approve' in final_verdict:
-                # Still check for critical issues
-                missing_criteria = jira_compliance.get('missing_criteria', [])
-                out_of_scope = jira_compliance.get('out_of_scope_files', [])
-                
-                # Check subtask coverage
-                subtask_coverage = jira_compliance.get('subtask_coverage', [])
-                missing_subtasks = [st for st in subtask_coverage if 'missing' in st.get('status', '').lower()]
-                
-                if missing_criteria or out_of_scope or missing_subtasks:
-                    return True
-                
-                # Check for critical requirement issues
-                for issue in review.get('issues', []):
-                    if issue.get('severity') == 'error' and issue.get('category') in ['requirement', 'scope']:
-                        return True
-            else:
-                # No explicit verdict, check traditional indicators
-                missing_criteria = jira_compliance.get('missing_criteria', [])
-                out_of_scope = jira_compliance.get('out_of_scope_files', [])
-                subtask_coverage = jira_compliance.get('subtask_coverage', [])
-                missing_subtasks = [st for st in subtask_coverage if 'missing' in st.get('status', '').lower()]
-                
-                if missing_criteria or out_of_scope or missing_subtasks:
-                    return True
-                
-                # Check for critical requirement issues
-                for issue in review.get('issues', []):
-                    if issue.get('severity') == 'error' and issue.get('category') in ['requirement', 'scope']:
-                        return True
-        
-        return False
+            if not jira_compliance.matches_requirements or missing or file_out_of_scope or missing_subtasks:
+                all_compliant = False
+            
+            # An explicit "Changes Requested" verdict is honored; an "Approve" still needs every criterion,
+            # subtask and file to be in order
+            verdict_lower = verdict.lower()
+            if 'changes requested' in verdict_lower or 'request changes' in verdict_lower:
+                request_changes = True
+            if missing or file_out_of_scope or missing_subtasks:
+                request_changes = True
+            
+            missing_criteria.update(missing)
+            out_of_scope.update(file_out_of_scope)
+            
+            # The first non-empty checklist, subtask coverage and verdict are used
+            if not checklist:
+                checklist = jira_compliance.acceptance_criteria_checklist
+            if not subtask_coverage:
+                subtask_coverage = jira_compliance.subtask_coverage
+            if verdict and not final_verdict:
+                final_verdict = verdict
+        
+        return ComplianceDigest(
+            severity_counts=severity_counts,
+            critical_issues=critical_issues,
+            missing_criteria=missing_criteria,
+            out_of_scope=out_of_scope,
+            filtered_out_of_scope=self._filter_out_of_scope_files(out_of_scope),
+            checklist=checklist,
+            subtask_coverage=subtask_coverage,
+            final_verdict=final_verdict,
+            all_compliant=all_compliant,
+            # Changes are only ever requested against a JIRA ticket
+            should_request_changes=bool(self.jira_issue) and request_changes
+        )
     
-    def _submit_review(self, file_reviews: List[tuple]):
+    def _submit_review(self, digest: ComplianceDigest):
         """Submit PR review with appropriate state"""
-        should_request_changes = self._should_request_changes(file_reviews)
+        should_request_changes = digest.should_request_changes
+        comments = [comment for comment, _ in self._pending_review_comments]
         
-        if not should_request_changes:
-            return  # Don't submit review if no changes needed
+        if not should_request_changes and not comments:
+            return  # Nothing to post
         
         try:
             review_url = f"https://api.github.com/repos/{self.repo_name}/pulls/{self.pr_number}/reviews"
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-            
-            # Get all issues for review body
-            all_issues = []
-            out_of_scope_files = set()
-            for file_diff, review in file_reviews:
-                if review:
-                    all_issues.extend(review.get('issues', []))
-                    # Collect out-of-scope files from jira_compliance
-                    jira_compliance = review.get('jira_compliance', {})
-                    out_of_scope = jira_compliance.get('out_of_scope_files', [])
-                    if out_of_scope:
-                        out_of_scope_files.update(out_of_scope)
-            
-            # Filter critical issues (exclude duplicate out-of-scope messages)
-            critical_issues = []
-            seen_titles = set()
-            for issue in all_issues:
-                if issue.get('severity') == 'error' and issue.get('category') in ['requirement', 'scope']:
-                    title = issue.get('title', '')
-                    # Deduplicate: skip if we've seen this title before
-                    if title not in seen_titles:
-                        seen_titles.add(title)
-                        critical_issues.append(issue)
+            if not should_request_changes:
+                # Submitted reviews cannot be deleted, so each run with inline comments leaves one review entry
+                # (and one notification) behind; the body stays a single line and the report lives in the summary
+                review_body = "🤖 AI Code Review"
+                self._post_review(review_url, review_body, 'COMMENT', comments)
+                return
             
-            review_body = "## ⚠️ Changes Requested\n\n"
-            review_body += "This PR does not fully meet the JIRA ticket requirements:\n\n"
+            body_parts = ["## ⚠️ Changes Requested\n\n", "This PR does not fully meet the JIRA ticket requirements:\n\n"]
             
-            # Filter out-of-scope files to remove false positives
-            filtered_out_of_scope = self._filter_out_of_scope_files(out_of_scope_files)
+            # Out-of-scope files with the false positives already filtered out
+            filtered_out_of_scope = digest.filtered_out_of_scope
             
             # Add out-of-scope files section if any remain after filtering
             if filtered_out_of_scope:
-                review_body += f"**Out-of-scope files detected:** {len(filtered_out_of_scope)} file(s) appear unrelated to the JIRA ticket.\n"
-                review_body += "Please ensure all changes are relevant to the ticket requirements.\n\n"
+                body_parts.append(f"**Out-of-scope files detected:** {len(filtered_out_of_scope)} file(s) appear unrelated to the JIRA ticket.\n")
+                body_parts.append("Please ensure all changes are relevant to the ticket requirements.\n\n")
             
-            # Add other critical issues (limit to 3 to avoid repetition)
-            other_issues = [i for i in critical_issues if 'out-of-scope' not in i.get('title', '').lower()][:3]
-            for issue in other_issues:
-                review_body += f"- **{issue.get('title')}**: {issue.get('description', '')[:200]}\n"
+            # Add other critical issues
+            for issue in digest.critical_issues:
+                body_parts.append(f"- **{issue.title}**: {(issue.description or '')[:200]}\n")
             
-            review_data = {
-                'body': review_body,
-                'event': 'REQUEST_CHANGES',
-                'comments': []  # Inline comments are posted separately
-            }
-            
-            response = requests.post(review_url, headers=headers, json=review_data, timeout=10)
-            
-            if response.status_code == 200:
-                print("📝 Submitted review: Changes Requested")
-            else:
-                print(f"⚠️  Could not submit review: {response.status_code}")
+            self._post_review(review_url, "".join(body_parts), 'REQUEST_CHANGES', comments)
                 
         except Exception as e:
-            print(f"⚠️  Exception submitting review: {str(e)}")
+            logger.warning(f"⚠️  Exception submitting review: {str(e)}")
+    
+    def _post_review(self, review_url: str, review_body: str, event: str, comments: List[Dict]):
+        """Submit one PR review carrying every queued inline comment in a single request"""
+        review_data = {
+            'body': review_body,
+            'event': event,
+            'commit_id': self.head_sha,
+            'comments': comments
+        }
+        
+        response = self._gh_request('POST', review_url, json=review_data, timeout=30)
+        if response.status_code == 200:
+            logger.info(f"📝 Submitted review ({event}) with {len(comments)} inline comment(s)")
+            return
+        if response.status_code != 422 or not comments:
+            logger.warning(f"⚠️  Could not submit review: {response.status_code}")
+            return
+        
+        # GitHub rejects the whole review for one unplaceable comment without saying which,
+        # so submit the verdict alone (a plain COMMENT has none) and post the comments one by one
+        logger.warning("⚠️  Review with inline comments was rejected (422); posting comments individually")
+        if event != 'COMMENT':
+            response = self._gh_request('POST', review_url, json={**review_data, 'comments': []}, timeout=30)
+            if response.status_code != 200:
+                logger.warning(f"⚠️  Could not submit review: {response.status_code}")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            posted = sum(pool.map(lambda queued: self._post_inline_comment(*queued), self._pending_review_comments))
+        logger.info(f"💬 Posted {posted}/{len(comments)} inline comment(s) individually")
     
-    def generate_review_summary(self, file_reviews: List[tuple]):
+    def generate_review_summary(self, file_reviews: List[tuple], digest: ComplianceDigest):
         """Generate a summary of the entire review"""
-        print("📊 Generating review summary...")
+        logger.info("📊 Generating review summary...")
         
         total_files = len(file_reviews)
-        total_issues = sum(len(review.get('issues', [])) for _, review in file_reviews if review)
-        
-        critical_count = sum(
-            1 for _, review in file_reviews if review 
-            for issue in review.get('issues', []) 
-            if issue.get('severity') == 'error'
-        )
-        warning_count = sum(
-            1 for _, review in file_reviews if review 
-            for issue in review.get('issues', []) 
-            if issue.get('severity') == 'warning'
-        )
-        info_count = sum(
-            1 for _, review in file_reviews if review 
-            for issue in review.get('issues', []) 
-            if issue.get('severity') == 'info'
-        )
+        severity_counts = digest.severity_counts
+        total_issues = sum(severity_counts.values())
+        critical_count = severity_counts['error']
+        warning_count = severity_counts['warning']
+        info_count = severity_counts['info']
         
-        summary = f"""# 🤖 AI Code Review Summary"""
+        # Collect the pieces and join once at the end (repeated += is quadratic on a growing string)
+        parts = ["# 🤖 AI Code Review Summary"]
+        append = parts.append
         
         # Add SRS context if available
         if self.srs_context:
-            summary += f"\n## 📚 SRS Context\n\n"
-            summary += f"{self.srs_service.get_srs_summary()}\n\n"
+            append(f"\n## 📚 SRS Context\n\n")
+            append(f"{self.srs_service.get_srs_summary()}\n\n")
         
         # Add JIRA context if available
         if self.jira_issue:
@@ -1291,15 +2022,15 @@ You review code with the same rigor and standards expected from a senior enginee
             if subtasks:
                 subtasks_info = f"\n**Subtasks:** {len(subtasks)} subtask(s)"
             
-            summary += f"""
+            append(f"""
 
 ## 🎫 JIRA Ticket: [{self.jira_key}]({self.jira_issue.get('url', '')})
 
 **Summary:** {self.jira_issue.get('summary', 'N/A')}{subtasks_info}
 
-"""
+""")
         
-        summary += f"""
+        append(f"""
 ## Overview
 - **Files Reviewed**: {total_files}
 - **Total Issues Found**: {total_issues}
@@ -1307,127 +2038,93 @@ You review code with the same rigor and standards expected from a senior enginee
   - ⚠️  Warnings: {warning_count}
   - ℹ️  Info: {info_count}
 
-"""
+""")
         
         # Add JIRA compliance section if available
         if self.jira_issue:
-            summary += "## 📋 JIRA Compliance Check\n\n"
-            
-            # Collect all compliance data across all files (deduplicate)
-            all_compliant = True
-            all_missing = set()
-            all_out_of_scope = set()
-            all_checklists = []
-            all_subtask_coverage = []
-            final_verdict = None
+            append("## 📋 JIRA Compliance Check\n\n")
             
-            for _, review in file_reviews:
-                if not review:
-                    continue
-                
-                jira_compliance = review.get('jira_compliance', {})
-                matches = jira_compliance.get('matches_requirements', False)
-                missing = jira_compliance.get('missing_criteria', [])
-                out_of_scope = jira_compliance.get('out_of_scope_files', [])
-                checklist = jira_compliance.get('acceptance_criteria_checklist', [])
-                subtask_coverage = jira_compliance.get('subtask_coverage', [])
-                verdict = jira_compliance.get('final_verdict', '')
-                
-                if not matches or missing or out_of_scope:
-                    all_compliant = False
-                
-                # Collect unique missing criteria
-                if missing:
-                    all_missing.update(missing)
-                
-                # Collect unique out-of-scope files
-                if out_of_scope:
-                    all_out_of_scope.update(out_of_scope)
-                
-                # Collect checklists (use first non-empty one, or merge)
-                if checklist and not all_checklists:
-                    all_checklists = checklist
-                
-                # Collect subtask coverage (use first non-empty one, or merge)
-                if subtask_coverage and not all_subtask_coverage:
-                    all_subtask_coverage = subtask_coverage
-                
-                # Use first final verdict found
-                if verdict and not final_verdict:
-                    final_verdict = verdict
-                
-                # Check subtask coverage
-                if subtask_coverage:
-                    missing_subtasks = [st for st in subtask_coverage if 'missing' in st.get('status', '').lower()]
-                    if missing_subtasks:
-                        all_compliant = False
+            # Compliance data across all files, deduplicated by _compute_digest
+            all_compliant = digest.all_compliant
+            all_missing = digest.missing_criteria
+            all_out_of_scope = digest.out_of_scope
+            all_checklists = digest.checklist
+            all_subtask_coverage = digest.subtask_coverage
+            final_verdict = digest.final_verdict
             
             # Final verdict section
             if final_verdict:
                 verdict_emoji = "✅" if "approve" in final_verdict.lower() else "❌"
-                summary += f"### 🔚 Final Verdict\n\n"
-                summary += f"{verdict_emoji} **{final_verdict}**\n\n"
+                append(f"### 🔚 Final Verdict\n\n")
+                append(f"{verdict_emoji} **{final_verdict}**\n\n")
             
             # Acceptance Criteria Checklist
             if all_checklists:
-                summary += "### 📋 Acceptance Criteria Checklist\n\n"
+                append("### 📋 Acceptance Criteria Checklist\n\n")
                 for item in all_checklists:
-                    summary += f"{item.get('status', '❓')} {item.get('criteria', 'N/A')}\n"
-                    if item.get('evidence'):
-                        summary += f"   *Evidence: {item.get('evidence')}*\n"
-                summary += "\n"
+                    append(f"{item.status} {item.criteria}\n")
+                    if item.evidence:
+                        append(f"   *Evidence: {item.evidence}*\n")
+                append("\n")
             
             # Subtask Coverage
             if all_subtask_coverage:
-                summary += "### 🧾 Subtask Coverage\n\n"
+                append("### 🧾 Subtask Coverage\n\n")
                 for subtask in all_subtask_coverage:
-                    subtask_key = subtask.get('subtask_key', 'N/A')
-                    subtask_status = subtask.get('status', '❓')
-                    subtask_evidence = subtask.get('evidence', '')
-                    summary += f"{subtask_status} **{subtask_key}**\n"
+                    subtask_key = subtask.subtask_key
+                    subtask_status = subtask.status
+                    subtask_evidence = subtask.evidence
+                    append(f"{subtask_status} **{subtask_key}**\n")
                     if subtask_evidence:
-                        summary += f"   *Evidence: {subtask_evidence}*\n"
-                summary += "\n"
+                        append(f"   *Evidence: {subtask_evidence}*\n")
+                append("\n")
             
             # Missing Acceptance Criteria (deduplicated)
             if all_missing:
-                summary += "### ❌ Missing Acceptance Criteria\n\n"
+                append("### ❌ Missing Acceptance Criteria\n\n")
                 for criteria in sorted(all_missing):
-                    summary += f"- {criteria}\n"
-                summary += "\n"
+                    append(f"- {criteria}\n")
+                append("\n")
             
             # Out-of-Scope Files (deduplicated and filtered)
             if all_out_of_scope:
-                # Filter out files that are clearly related to the JIRA ticket
-                filtered_out_of_scope = self._filter_out_of_scope_files(all_out_of_scope)
+                # Files that are clearly related to the JIRA ticket are already filtered out
+                filtered_out_of_scope = digest.filtered_out_of_scope
                 
                 if filtered_out_of_scope:
-                    summary += "### ⚠️ Out-of-Scope Files\n\n"
-                    summary += f"The following {len(filtered_out_of_scope)} file(s) appear unrelated to JIRA ticket requirements:\n\n"
+                    append("### ⚠️ Out-of-Scope Files\n\n")
+                    append(f"The following {len(filtered_out_of_scope)} file(s) appear unrelated to JIRA ticket requirements:\n\n")
                     for file in sorted(filtered_out_of_scope):
-                        summary += f"- `{file}`\n"
-                    summary += "\n"
+                        append(f"- `{file}`\n")
+                    append("\n")
                 else:
                     # If we filtered out all files, mention that authentication-related files are in scope
-                    summary += "### ℹ️ Scope Note\n\n"
-                    summary += "All changed files appear to be related to the JIRA ticket requirements.\n\n"
+                    append("### ℹ️ Scope Note\n\n")
+                    append("All changed files appear to be related to the JIRA ticket requirements.\n\n")
             
             if all_compliant:
-                summary += "✅ **All JIRA requirements appear to be met!**\n\n"
+                append("✅ **All JIRA requirements appear to be met!**\n\n")
             else:
-                summary += "❌ **Some JIRA requirements are not met. Please review.**\n\n"
+                append("❌ **Some JIRA requirements are not met. Please review.**\n\n")
             
-            summary += "---\n\n"
+            append("---\n\n")
         
-        summary += "\n---\n"
-        summary += "*This review was automatically generated using AI. Please review the suggestions and use your judgment.*\n"
-        summary += "\n**Note to Team Lead**: The AI has performed the initial review. Please focus on the critical and warning items, and verify the suggestions align with your project's standards.\n"
+        # Issues that could not be placed on a diff line, or that GitHub rejected inline
+        if self.review_comments:
+            append(f"## 💬 Comments Not Posted Inline ({len(self.review_comments)})\n\n")
+            for comment in self.review_comments:
+                location = f"{comment.file}:{comment.line}" if comment.line else comment.file
+                append(f"#### `{location}`\n\n{comment.comment}\n")
         
-        # Save summary to file
+        append("\n---\n")
+        append("*This review was automatically generated using AI. Please review the suggestions and use your judgment.*\n")
+        append("\n**Note to Team Lead**: The AI has performed the initial review. Please focus on the critical and warning items, and verify the suggestions align with your project's standards.\n")
+        
+        # Save summary to file, writing the parts through the file buffer instead of joining them first
         with open('review_summary.md', 'w', encoding='utf-8') as f:
-            f.write(summary)
+            f.writelines(parts)
         
-        print("✅ Review summary saved to review_summary.md")
+        logger.info("✅ Review summary saved to review_summary.md")
     
     def _get_pr_info(self):
         """Fetch PR title and branch name from GitHub API if not provided"""
@@ -1436,30 +2133,26 @@ You review code with the same rigor and standards expected from a senior enginee
         
         try:
             pr_url = f"https://api.github.com/repos/{self.repo_name}/pulls/{self.pr_number}"
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-            response = requests.get(pr_url, headers=headers, timeout=10)
+            response = self._gh_request('GET', pr_url)
             
             if response.status_code == 200:
                 pr_data = response.json()
                 self.pr_title = pr_data.get('title', '')
                 self.branch_name = pr_data.get('head', {}).get('ref', '')
-                print(f"📋 PR Title: {self.pr_title}")
-                print(f"🌿 Branch: {self.branch_name}")
+                logger.info(f"📋 PR Title: {self.pr_title}")
+                logger.info(f"🌿 Branch: {self.branch_name}")
         except Exception as e:
-            print(f"⚠️  Could not fetch PR info: {str(e)}")
+            logger.warning(f"⚠️  Could not fetch PR info: {str(e)}")
     
     def _get_commit_messages(self) -> List[str]:
         """Get commit messages from the PR"""
         try:
-            cmd = f"git log {self.base_sha}..{self.head_sha} --pretty=format:%s"
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            commits = [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
-            return commits[:10]  # Limit to last 10 commits
+            # argv list, no shell; git stops after the 10 most recent commits itself
+            cmd = ["git", "log", "-n", "10", f"{self.base_sha}..{self.head_sha}", "--pretty=format:%s"]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            return [line.strip() for line in result.stdout.splitlines() if line.strip()]
         except Exception as e:
-            print(f"⚠️  Could not fetch commit messages: {str(e)}")
+            logger.warning(f"⚠️  Could not fetch commit messages: {str(e)}")
             return []
     
     def _detect_and_fetch_jira_ticket(self) -> bool:
@@ -1470,14 +2163,14 @@ You review code with the same rigor and standards expected from a senior enginee
             True if JIRA ticket found and fetched, False otherwise
         """
         if not self.jira_service.enabled:
-            print("ℹ️  JIRA integration not configured, proceeding with standard review")
+            logger.info("ℹ️  JIRA integration not configured, proceeding with standard review")
             return False
         
         # Get commit messages
         commit_messages = self._get_commit_messages()
         
         # Find JIRA key
-        self.jira_key = self.jira_service.find_jira_key(
+        self.jira_key = JiraService.find_jira_key(
             self.branch_name, 
             self.pr_title, 
             commit_messages
@@ -1492,12 +2185,12 @@ You review code with the same rigor and standards expected from a senior enginee
         self.jira_issue = self.jira_service.fetch_issue(self.jira_key)
         
         if not self.jira_issue:
-            print(f"⚠️  Could not fetch JIRA issue {self.jira_key}, proceeding with standard review")
+            logger.warning(f"⚠️  Could not fetch JIRA issue {self.jira_key}, proceeding with standard review")
             return False
         
-        print(f"✅ JIRA Issue Found: {self.jira_key}")
-        print(f"   Summary: {self.jira_issue.get('summary', 'N/A')}")
-        print(f"   Type: {self.jira_issue.get('issue_type', 'N/A')}")
+        logger.info(f"✅ JIRA Issue Found: {self.jira_key}")
+        logger.info(f"   Summary: {self.jira_issue.get('summary', 'N/A')}")
+        logger.info(f"   Type: {self.jira_issue.get('issue_type', 'N/A')}")
         return True
     
     def _post_missing_jira_comment(self):
@@ -1520,111 +2213,138 @@ Once a valid JIRA ticket is detected, the AI review will evaluate your code agai
         
         try:
             comments_url = f"https://api.github.com/repos/{self.repo_name}/issues/{self.pr_number}/comments"
-            headers = {
-                'Authorization': f'token {self.github_token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-            response = requests.post(comments_url, headers=headers, json={'body': comment_body}, timeout=10)
+            response = self._gh_request('POST', comments_url, json={'body': comment_body})
             
             if response.status_code == 201:
-                print("📝 Posted comment requesting JIRA ticket")
+                logger.info("📝 Posted comment requesting JIRA ticket")
             else:
-                print(f"⚠️  Could not post JIRA request comment: {response.status_code}")
+                logger.warning(f"⚠️  Could not post JIRA request comment: {response.status_code}")
         except Exception as e:
-            print(f"⚠️  Exception posting JIRA request: {str(e)}")
+            logger.warning(f"⚠️  Exception posting JIRA request: {str(e)}")
     
-    def run(self):
+    def run(self, mode: str = 'interactive'):
         """Main execution method"""
-        print("🚀 Starting AI Code Review...")
-        print(f"📦 Repository: {self.repo_name}")
-        print(f"🔀 PR #{self.pr_number}")
-        print(f"📊 Comparing {self.base_sha[:7]} → {self.head_sha[:7]}")
-        print("-" * 60)
+        asyncio.run(self.run_async(mode))
+    
+    async def run_async(self, mode: str = 'interactive'):
+        """Run the review: fetch the diff, review files (concurrently, or via the Batch API) and post comments"""
+        logger.info("🚀 Starting AI Code Review...")
+        logger.info(f"📦 Repository: {self.repo_name}")
+        logger.info(f"🔀 PR #{self.pr_number}")
+        logger.info(f"📊 Comparing {self.base_sha[:7]} → {self.head_sha[:7]}")
+        logger.info("-" * 60)
         
         # Get PR info (title, branch)
         self._get_pr_info()
         
         # Load SRS documents for project context
-        print("📚 Loading SRS documents for project context...")
+        logger.info("📚 Loading SRS documents for project context...")
         self.srs_context = self.srs_service.get_srs_context()
         if self.srs_context:
-            print("✅ SRS context loaded successfully")
+            logger.info("✅ SRS context loaded successfully")
         else:
-            print("ℹ️  No SRS documents found - proceeding without SRS context")
+            logger.info("ℹ️  No SRS documents found - proceeding without SRS context")
         
         # Detect and fetch JIRA ticket
         if self.jira_service.enabled:
-            print("🔍 JIRA integration enabled - checking for JIRA ticket...")
+            logger.info("🔍 JIRA integration enabled - checking for JIRA ticket...")
             jira_available = self._detect_and_fetch_jira_ticket()
             
             if not jira_available:
-                print("⏭️  Skipping AI review - JIRA ticket required")
+                logger.info("⏭️  Skipping AI review - JIRA ticket required")
                 return
             else:
-                print(f"✅ JIRA ticket {self.jira_key} found - proceeding with JIRA-aware review")
+                logger.info(f"✅ JIRA ticket {self.jira_key} found - proceeding with JIRA-aware review")
         else:
-            print("ℹ️  JIRA integration not configured - proceeding with standard review")
+            logger.info("ℹ️  JIRA integration not configured - proceeding with standard review")
         
         # Delete previous AI comments to prevent email spam
-        print("🧹 Cleaning up previous AI comments...")
+        logger.info("🧹 Cleaning up previous AI comments...")
         self._delete_previous_ai_comments()
         self._delete_previous_summary_comment()
         
         # Get PR diff
-        file_diffs = self.get_pr_diff()
+        file_diffs = await self.get_pr_diff()
         
         if not file_diffs:
-            print("ℹ️  No files to review")
+            logger.info("ℹ️  No files to review")
             return
         
-        print(f"📁 Found {len(file_diffs)} file(s) to review")
-        print("-" * 60)
+        logger.info(f"📁 Found {len(file_diffs)} file(s) to review")
+        logger.info("-" * 60)
         
-        # Review each file (with timing for performance monitoring)
+        # Review all files concurrently (with timing for performance monitoring)
         file_reviews = []
         # Store file_diffs for use in prompt building
         self._all_file_diffs = file_diffs
         
-        import time
+        # Generated and import-only diffs stay in the PR context but skip the model call
+        reviewable = []
+        for file_diff in file_diffs:
+            if self._is_low_signal(file_diff):
+                logger.info(f"⏭️  Skipping {file_diff.filename} (generated or low-signal diff)")
+            else:
+                reviewable.append(file_diff)
+        file_diffs = reviewable
+        
         start_time = time.time()
         
-        for idx, file_diff in enumerate(file_diffs, 1):
-            print(f"📝 [{idx}/{len(file_diffs)}] Reviewing {file_diff.filename}...")
-            file_start = time.time()
-            
-            review = self.review_file(file_diff)
-            
-            file_elapsed = time.time() - file_start
-            print(f"✅ [{idx}/{len(file_diffs)}] Completed {file_diff.filename} in {file_elapsed:.1f}s")
+        if mode == 'batch':
+            # Non-interactive runs trade turnaround for the Batch API's lower price and separate rate limits
+            reviews = await self.review_files_via_batch_api(file_diffs)
+            file_reviews = [(file_diff, review) for file_diff, review in zip(file_diffs, reviews) if review]
+        else:
+            # Small files share a request so they share the instruction tokens and the round trip
+            batches = self._pack_review_batches(file_diffs)
+            sem = asyncio.Semaphore(self.max_concurrency)
+            tasks = [self._review_with_sem(sem, idx, len(batches), batch) for idx, batch in enumerate(batches, 1)]
             
-            if review:
-                file_reviews.append((file_diff, review))
-                self.post_review_comments(file_diff, review)
+            # gather returns results in task order, which keeps the summary in diff order
+            for batch, reviews in zip(batches, await asyncio.gather(*tasks)):
+                file_reviews.extend((file_diff, review) for file_diff, review in zip(batch, reviews) if review)
+        
+        # Inline comments are queued here and go out with the review in a single request
+        for file_diff, review in file_reviews:
+            self.post_review_comments(file_diff, review)
         
         total_elapsed = time.time() - start_time
-        print(f"⏱️  Total review time: {total_elapsed:.1f}s ({total_elapsed/60:.1f} minutes)")
+        logger.info(f"⏱️  Total review time: {total_elapsed:.1f}s ({total_elapsed/60:.1f} minutes)")
         
-        # Generate summary
-        self.generate_review_summary(file_reviews)
+        digest = self._compute_digest(file_reviews)
+        
+        # Submit the review (inline comments plus the verdict) before the summary, which lists the comments
+        # that could not go inline
+        self._submit_review(digest)
         
-        # Submit review if changes are requested
-        self._submit_review(file_reviews)
+        # Generate summary
+        self.generate_review_summary(file_reviews, digest)
         
         # Add PR link to JIRA ticket (optional)
         if self.jira_issue and self.jira_key:
             pr_url = f"https://github.com/{self.repo_name}/pull/{self.pr_number}"
             self.jira_service.add_pr_comment(self.jira_key, pr_url, self.pr_title)
         
-        print("-" * 60)
-        print("✅ AI Code Review Complete!")
-        print(f"📝 Reviewed {len(file_reviews)} files")
-        print(f"💬 Check the PR for detailed comments and suggestions")
+        logger.info("-" * 60)
+        logger.info("✅ AI Code Review Complete!")
+        logger.info(f"📝 Reviewed {len(file_reviews)} files")
+        logger.info(f"💬 Check the PR for detailed comments and suggestions")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI code review for a GitHub pull request")
+    parser.add_argument(
+        '--mode',
+        choices=['interactive', 'batch'],
+        default=os.getenv('AI_REVIEW_MODE', 'interactive'),
+        help="'batch' submits all files through the OpenAI Batch API (cheaper, up to 24h) for scheduled runs"
+    )
+    args = parser.parse_args()
+    
+    # Set AI_REVIEW_LOG_LEVEL=WARNING for quiet CI logs, or DEBUG to see every posted comment
+    logging.basicConfig(level=os.getenv('AI_REVIEW_LOG_LEVEL', 'INFO').upper(), format="%(message)s", stream=sys.stderr)
     try:
         reviewer = AICodeReviewer()
-        reviewer.run()
+        reviewer.run(args.mode)
     except Exception as e:
-        print(f"❌ Error: {str(e)}", file=sys.stderr)
+        logger.error(f"❌ Error: {str(e)}")
         sys.exit(1)
 
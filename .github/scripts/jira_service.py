@@ -5,10 +5,29 @@ Uses: http://hrm.matellio.com/api/jira/getissuedetail/{project_id}/{jira_key}
 """
 
 import os
+import logging
 import re
+import time
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bisect import bisect_right
 from typing import Optional, Dict, List
 
+logger = logging.getLogger("ai-review")
+
+
+# Pattern: PROJECT-123 (e.g., H30-22552, PROJ-123, ABC-456)
+_JIRA_KEY_RE = re.compile(r'[A-Z][A-Z0-9]+-[0-9]+', re.IGNORECASE)
+
+# Acceptance criteria section headings, whole words, in priority order: an explicit
+# "Acceptance Criteria" heading wins over an earlier loose "AC" or "Acceptance"
+_AC_PATTERNS = tuple(
+    re.compile(rf'\b{heading}\b[:\s]*(.*?)(?=\n\n|\n[A-Z]|$)', re.IGNORECASE | re.DOTALL)
+    for heading in (r'Acceptance\s*Criteria', 'AC', 'Acceptance')
+)
+
 
 class JiraService:
     """Service for interacting with Internal JIRA Webhook API"""
@@ -17,20 +36,36 @@ class JiraService:
         # Internal API configuration
         self.api_base_url = os.getenv('JIRA_API_BASE_URL', 'http://hrm.matellio.com/api/jira').rstrip('/')
         self.project_id = os.getenv('JIRA_PROJECT_ID', '')
+        
+        # Normalized issues are cached in memory and on disk (shared by pipeline steps) for a short TTL
+        self.cache_ttl = int(os.getenv('JIRA_CACHE_TTL', '300'))
+        self.cache_dir = os.getenv('JIRA_CACHE_DIR', '/tmp/jira_cache')
+        self._cache: Dict[str, tuple] = {}
+        
+        # Pooled session so repeated calls reuse the connection; transient errors are retried
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
         self.api_token = os.getenv('JIRA_API_TOKEN', '')
         
         # Check if configuration is available
         if not self.project_id:
-            print("⚠️  JIRA_PROJECT_ID not configured. JIRA-aware reviews will be skipped.")
+            logger.warning("⚠️  JIRA_PROJECT_ID not configured. JIRA-aware reviews will be skipped.")
             self.enabled = False
         elif not self.api_token:
-            print("⚠️  JIRA_API_TOKEN not configured. JIRA-aware reviews will be skipped.")
+            logger.warning("⚠️  JIRA_API_TOKEN not configured. JIRA-aware reviews will be skipped.")
             self.enabled = False
         else:
             self.enabled = True
-            print(f"✅ JIRA integration enabled - Project ID: {self.project_id}")
+            logger.info(f"✅ JIRA integration enabled - Project ID: {self.project_id}")
     
-    def extract_jira_key(self, text: str) -> Optional[str]:
+    @staticmethod
+    def extract_jira_key(text: str) -> Optional[str]:
         """
         Extract JIRA issue key from text using regex: [A-Z][A-Z0-9]+-[0-9]+
         
@@ -40,16 +75,15 @@ class JiraService:
         Returns:
             First JIRA key found or None
         """
-        # Pattern: PROJECT-123 (e.g., H30-22552, PROJ-123, ABC-456)
-        pattern = r'[A-Z][A-Z0-9]+-[0-9]+'
-        matches = re.findall(pattern, text.upper())
-        
-        if matches:
+        # Case-insensitive search: only the short match is uppercased, not the whole text
+        match = _JIRA_KEY_RE.search(text)
+        if match:
             # Return the first match (most common case)
-            return matches[0]
+            return match.group(0).upper()
         return None
     
-    def find_jira_key(self, branch_name: str, pr_title: str, commit_messages: list) -> Optional[str]:
+    @staticmethod
+    def find_jira_key(branch_name: str, pr_title: str, commit_messages: list) -> Optional[str]:
         """
         Search for JIRA key in branch name, PR title, and commit messages
         
@@ -62,20 +96,28 @@ class JiraService:
             JIRA key if found, None otherwise
         """
         # Priority: PR title > branch name > commit messages
-        sources = [
-            ("PR title", pr_title),
-            ("branch name", branch_name),
-        ]
+        source_names = ["PR title", "branch name"]
+        texts = [pr_title or '', branch_name or '']
         
         # Add commit messages
         for i, msg in enumerate(commit_messages[:5]):  # Check first 5 commits
-            sources.append((f"commit message {i+1}", msg))
+            source_names.append(f"commit message {i+1}")
+            texts.append(msg or '')
         
-        for source_name, text in sources:
-            jira_key = self.extract_jira_key(text)
-            if jira_key:
-                print(f"✅ Found JIRA key {jira_key} in {source_name}")
-                return jira_key
+        # One regex pass over all sources joined by NUL (a key can never span it);
+        # the first match is the highest-priority one, mapped back to its source by offset
+        offsets = []
+        position = 0
+        for text in texts:
+            offsets.append(position)
+            position += len(text) + 1
+        
+        match = _JIRA_KEY_RE.search("\x00".join(texts))
+        if match:
+            jira_key = match.group(0).upper()
+            source_name = source_names[bisect_right(offsets, match.start()) - 1]
+            logger.info(f"✅ Found JIRA key {jira_key} in {source_name}")
+            return jira_key
         
         return None
     
@@ -95,58 +137,114 @@ class JiraService:
         if not self.enabled:
             return None
         
+        cached_issue = self._get_cached_issue(issue_key)
+        if cached_issue is not None:
+            logger.info(f"♻️  Using cached JIRA issue {issue_key}")
+            return cached_issue
+        
         try:
             # Build API URL: http://hrm.matellio.com/api/jira/getissuedetail/{project_id}/{jira_key}
             url = f"{self.api_base_url}/getissuedetail/{self.project_id}/{issue_key}"
             
-            print(f"🔍 Fetching JIRA issue {issue_key} from internal API...")
-            print(f"   URL: {url}")
+            logger.info(f"🔍 Fetching JIRA issue {issue_key} from internal API...")
+            logger.debug(f"   URL: {url}")
             
             # Add authentication token to request
             headers = {}
             if self.api_token:
                 # Use Authorization header with token (API expects token directly, not Bearer format)
                 headers['Authorization'] = self.api_token
-                print(f"   ✅ Token present (length: {len(self.api_token)} chars)")
+                logger.debug(f"   ✅ Token present (length: {len(self.api_token)} chars)")
             else:
-                print(f"   ⚠️  Token is empty or not set!")
+                logger.warning(f"   ⚠️  Token is empty or not set!")
             
-            response = requests.get(url, headers=headers, timeout=15)
+            response = self._session.get(url, headers=headers, timeout=15)
             
             if response.status_code == 200:
-                api_response = response.json()
+                api_response = orjson.loads(response.content)
                 
                 # Check response status
                 if api_response.get('status') == 'error':
                     error_msg = api_response.get('message', 'Unknown error')
-                    print(f"⚠️  JIRA API returned error: {error_msg}")
+                    logger.warning(f"⚠️  JIRA API returned error: {error_msg}")
                     return None
                 
                 # Extract data from success response
                 if api_response.get('status') == 'success' and 'data' in api_response:
                     issue_data = api_response['data']
-                    return self._normalize_issue(issue_data, issue_key)
+                    issue = self._normalize_issue(issue_data, issue_key)
+                    self._store_cached_issue(issue_key, issue)
+                    return issue
                 else:
-                    print(f"⚠️  Unexpected API response format")
+                    logger.warning(f"⚠️  Unexpected API response format")
                     return None
                     
             else:
-                print(f"⚠️  Error fetching JIRA issue: HTTP {response.status_code}")
-                try:
-                    error_data = response.json()
-                    error_msg = error_data.get('message', response.text[:200])
-                    print(f"   Error message: {error_msg}")
-                except:
-                    print(f"   Response: {response.text[:200]}")
+                logger.warning(f"⚠️  Error fetching JIRA issue: HTTP {response.status_code}")
+                # Only JSON error bodies are worth parsing; HTML/plain error pages are just sliced
+                content_type = response.headers.get('Content-Type', '')
+                if 'json' in content_type and response.content:
+                    try:
+                        error_data = orjson.loads(response.content)
+                        error_msg = error_data.get('message', response.text[:200])
+                        logger.warning(f"   Error message: {error_msg}")
+                    except Exception:
+                        logger.warning(f"   Response: {response.text[:200]}")
+                else:
+                    logger.warning(f"   Response: {response.text[:200]}")
                 return None
                 
         except requests.exceptions.Timeout:
-            print(f"⚠️  Timeout fetching JIRA issue {issue_key} (exceeded 15s)")
+            logger.warning(f"⚠️  Timeout fetching JIRA issue {issue_key} (exceeded 15s)")
             return None
         except Exception as e:
-            print(f"⚠️  Exception fetching JIRA issue: {str(e)}")
+            logger.warning(f"⚠️  Exception fetching JIRA issue: {str(e)}")
             return None
     
+    def _cache_path(self, issue_key: str) -> str:
+        """Path of the on-disk cache entry for an issue"""
+        return os.path.join(self.cache_dir, f"{self.project_id}-{issue_key}.json")
+    
+    def _get_cached_issue(self, issue_key: str) -> Optional[Dict]:
+        """
+        Return a cached normalized issue if it is younger than the TTL
+        
+        Args:
+            issue_key: JIRA issue key
+            
+        Returns:
+            Cached issue dictionary or None
+        """
+        now = time.time()
+        entry = self._cache.get(issue_key)
+        if entry and now - entry[0] < self.cache_ttl:
+            return entry[1]
+        
+        # Fall back to the disk cache written by an earlier step, expiring by mtime
+        path = self._cache_path(issue_key)
+        try:
+            cached_at = os.path.getmtime(path)
+            if now - cached_at < self.cache_ttl:
+                with open(path, 'rb') as f:
+                    issue = orjson.loads(f.read())
+                self._cache[issue_key] = (cached_at, issue)
+                return issue
+        except (OSError, ValueError):
+            pass
+        return None
+    
+    def _store_cached_issue(self, issue_key: str, issue: Dict):
+        """Cache a normalized issue in memory and on disk (best effort)"""
+        self._cache[issue_key] = (time.time(), issue)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(issue_key)
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(orjson.dumps(issue))
+            os.replace(f"{path}.tmp", path)
+        except OSError:
+            pass
+    
     def _normalize_issue(self, issue_data: Dict, issue_key: str) -> Dict:
         """
         Normalize internal API response into review-friendly structure
@@ -216,16 +314,8 @@ class JiraService:
         if not description:
             return None
         
-        # Common patterns for acceptance criteria
-        patterns = [
-            r'Acceptance Criteria[:\s]*(.*?)(?=\n\n|\n[A-Z]|$)',
-            r'AC[:\s]*(.*?)(?=\n\n|\n[A-Z]|$)',
-            r'Acceptance[:\s]*(.*?)(?=\n\n|\n[A-Z]|$)',
-            r'Acceptance\s+Criteria[:\s]*(.*?)(?=\n\n|\n#|$)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, description, re.IGNORECASE | re.DOTALL)
+        for pattern in _AC_PATTERNS:
+            match = pattern.search(description)
             if match:
                 return match.group(1).strip()
         
@@ -249,5 +339,5 @@ class JiraService:
             False (feature not available with internal API)
         """
         # Internal API doesn't support writing comments
-        print(f"ℹ️  PR linking to JIRA not available with internal API (read-only)")
+        logger.info(f"ℹ️  PR linking to JIRA not available with internal API (read-only)")
         return False
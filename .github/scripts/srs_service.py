@@ -5,9 +5,12 @@ Reads and provides SRS documents for AI code review context
 """
 
 import os
+import logging
 import glob
 from typing import List, Optional
 
+logger = logging.getLogger("ai-review")
+
 
 class SRSService:
     """Service for reading and providing SRS documents"""
@@ -77,7 +80,7 @@ class SRSService:
                 content = f.read()
                 return content
         except Exception as e:
-            print(f"⚠️  Error reading SRS file {file_path}: {str(e)}")
+            logger.warning(f"⚠️  Error reading SRS file {file_path}: {str(e)}")
             return None
     
     def get_srs_context(self) -> str:
@@ -90,16 +93,16 @@ class SRSService:
         srs_files = self.find_srs_documents()
         
         if not srs_files:
-            print("ℹ️  No SRS documents found in configured paths")
+            logger.info("ℹ️  No SRS documents found in configured paths")
             return ""
         
-        print(f"📚 Found {len(srs_files)} SRS document(s)")
+        logger.info(f"📚 Found {len(srs_files)} SRS document(s)")
         
         srs_contexts = []
         total_length = 0
         
         for srs_file in srs_files:
-            print(f"   📄 Reading: {srs_file}")
+            logger.info(f"   📄 Reading: {srs_file}")
             content = self.read_srs_content(srs_file)
             
             if not content:
@@ -108,11 +111,11 @@ class SRSService:
             # Truncate if too long
             if len(content) > self.max_srs_length:
                 content = content[:self.max_srs_length] + "\n... (truncated)"
-                print(f"   ⚠️  Truncated {srs_file} to {self.max_srs_length} chars")
+                logger.warning(f"   ⚠️  Truncated {srs_file} to {self.max_srs_length} chars")
             
             # Check if adding this would exceed total limit
             if total_length + len(content) > self.max_srs_length:
-                print(f"   ⚠️  SRS content limit reached, skipping remaining files")
+                logger.warning(f"   ⚠️  SRS content limit reached, skipping remaining files")
                 break
             
             # Get relative path for display
@@ -140,7 +143,7 @@ The following SRS documents provide project requirements and specifications:
 **Note:** Code changes should align with the above SRS requirements. Flag any deviations or missing implementations.
 """
         
-        print(f"✅ SRS context prepared ({total_length} chars from {len(srs_contexts)} document(s))")
+        logger.info(f"✅ SRS context prepared ({total_length} chars from {len(srs_contexts)} document(s))")
         return combined_context
     
     def get_srs_summary(self) -> str: